@@ -1,11 +1,17 @@
 ﻿import os
 import time
+import queue
 import argparse
+import threading
 import tkinter as tk
-from typing import List, Tuple
+from typing import Tuple
 
 from binance_client import BinanceClient, BinanceAPIError
 from binance_futures_client import BinanceFuturesClient, BinanceFuturesAPIError
+from plot_series import MinMaxDecimator, RingBuffer
+from market_hub import HubClient, hub_addr
+from market_stream import MarketStream, SPOT_WS_URL, SPOT_WS_TESTNET_URL, FUTURES_WS_URL, FUTURES_WS_TESTNET_URL
+from tick_recorder import TickRecorder
 
 
 def load_env_file(path: str | None) -> None:
@@ -46,6 +52,26 @@ def futures_base_url(args) -> str:
     )
 
 
+def spot_ws_url(args) -> str:
+    if args.ws_base_url:
+        return args.ws_base_url
+    if os.getenv("BINANCE_WS_BASE_URL"):
+        return os.getenv("BINANCE_WS_BASE_URL")
+    return SPOT_WS_TESTNET_URL if args.testnet or truthy(os.getenv("BINANCE_TESTNET")) else SPOT_WS_URL
+
+
+def futures_ws_url(args) -> str:
+    if args.futures_ws_base_url:
+        return args.futures_ws_base_url
+    if os.getenv("BINANCE_FUTURES_WS_BASE_URL"):
+        return os.getenv("BINANCE_FUTURES_WS_BASE_URL")
+    return (
+        FUTURES_WS_TESTNET_URL
+        if args.futures_testnet or truthy(os.getenv("BINANCE_FUTURES_TESTNET"))
+        else FUTURES_WS_URL
+    )
+
+
 def build_spot(args) -> BinanceClient:
     api_key = os.getenv("BINANCE_API_KEY", "")
     api_secret = os.getenv("BINANCE_API_SECRET", "")
@@ -58,17 +84,87 @@ def build_futures(args) -> BinanceFuturesClient:
     return BinanceFuturesClient(api_key=f_key, api_secret=f_sec, base_url=futures_base_url(args))
 
 
+GRID_FRACS = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+
+def positive_float(s: str) -> float:
+    v = float(s)
+    if v <= 0:
+        raise argparse.ArgumentTypeError(f"must be > 0: {s}")
+    return v
+
+
 def compute_basis_bps(spot_price: float, futures_mark: float) -> float:
     if spot_price <= 0:
         return 0.0
     return (futures_mark - spot_price) / spot_price * 10000.0
 
 
+class SampleFeed:
+    """
+    백그라운드 스레드에서 가격을 받아 큐로 넘겨 Tk 메인 루프가 네트워크를 기다리지 않게 합니다.
+
+    - 고정 일정(monotonic 기준 interval 간격)으로 샘플링해 요청 지연만큼 주기가 밀리지 않음. 요청이 주기보다 길면 밀린 회차는 건너뜀
+    - 큐 항목: ("tick", ts_ms, spot, mark, basis) / ("wait", None) / ("error", 메시지)
+    - 기록(--record)도 이 스레드에서 처리
+    """
+
+    def __init__(self, symbol: str, interval: float, spot, fut, stream=None, recorder=None):
+        self.symbol = symbol
+        self.interval = float(interval)
+        self.spot = spot
+        self.fut = fut
+        self.stream = stream
+        self.recorder = recorder
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "SampleFeed":
+        self._thread = threading.Thread(target=self._run, name="plot-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _sample(self) -> tuple:
+        if self.stream is not None:
+            snap = self.stream.snapshot()
+            if snap is None:
+                return ("wait", None)
+            s, m, ts_ms = snap
+        else:
+            s = self.spot.get_price(self.symbol)
+            m = self.fut.get_mark_price(self.symbol)
+            ts_ms = int(time.time() * 1000)
+        b = compute_basis_bps(s, m)
+        if self.recorder is not None:
+            self.recorder.append(self.symbol, ts_ms, s, m, b)
+        return ("tick", ts_ms, s, m, b)
+
+    def _run(self) -> None:
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                item = self._sample()
+            except (BinanceAPIError, BinanceFuturesAPIError) as e:
+                item = ("error", f"에러: {e}")
+            except Exception as e:
+                item = ("error", f"예상치 못한 에러: {e}")
+            self.queue.put(item)
+            next_at += self.interval
+            now = time.monotonic()
+            if next_at < now:
+                next_at = now
+            self._stop.wait(next_at - now)
+
+
 class BasisPlot:
     def __init__(self, args):
         self.args = args
         self.symbol = args.symbol
-        self.interval_ms = int(args.interval * 1000)
+        self.frame_ms = max(1, int(1000 / args.fps))
         self.history = int(args.history)
         self.ymin = args.y_min
         self.ymax = args.y_max
@@ -79,9 +175,17 @@ class BasisPlot:
         # Build clients
         self.spot = build_spot(args)
         self.fut = build_futures(args)
-
-        # Data buffers
-        self.values: List[float] = []
+        self.stream = None
+        if args.feed == "ws":
+            self.stream = MarketStream(self.symbol, spot_ws_url(args), futures_ws_url(args)).start()
+        elif args.feed == "local":
+            self.stream = HubClient([self.symbol], hub_addr(args.hub)).start()
+        self.recorder = TickRecorder(args.record) if args.record else None
+        self.feed = SampleFeed(self.symbol, args.interval, self.spot, self.fut, self.stream, self.recorder)
+
+        # Data buffers: 고정 크기 링 버퍼 + 화면 열 수에 맞춘 min/max 축약
+        self.values = RingBuffer(self.history)
+        self.decimator = MinMaxDecimator(self.values, args.width)
         self.last_spot = 0.0
         self.last_mark = 0.0
 
@@ -99,96 +203,127 @@ class BasisPlot:
         self.gridc = gridc
         self.bg = bg
 
+        self.items: dict[str, int] = {}
+        self._create_items()
+        # 새 샘플이 없어도 창 크기가 바뀌면 새 크기로 다시 배치
+        self.canvas.bind("<Configure>", lambda _e: self.draw())
+
         # Info label
         self.info = tk.Label(self.root, text="", fg=fg, bg=bg, anchor="w", font=("Consolas", 10))
         self.info.pack(fill=tk.X)
 
         # Start loop
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.feed.start()
         self.schedule_update()
         self.root.mainloop()
 
+    def close(self):
+        self.feed.stop()
+        if self.stream is not None:
+            self.stream.stop()
+        self.root.destroy()
+
     def schedule_update(self):
-        self.root.after(self.interval_ms, self.update_once)
+        self.root.after(self.frame_ms, self.update_once)
 
     def update_once(self):
-        try:
-            s = self.spot.get_price(self.symbol)
-            m = self.fut.get_mark_price(self.symbol)
-            b = compute_basis_bps(s, m)
-            self.last_spot, self.last_mark = s, m
-            self.values.append(b)
-            if len(self.values) > self.history:
-                self.values = self.values[-self.history:]
-        except (BinanceAPIError, BinanceFuturesAPIError) as e:
-            self.info.configure(text=f"에러: {e}")
-        except Exception as e:
-            self.info.configure(text=f"예상치 못한 에러: {e}")
-
-        self.draw()
+        """화면 주기마다 큐에 쌓인 샘플을 모두 반영하고, 새 값이 있을 때만 다시 그립니다."""
+        changed = False
+        notice = None  # 마지막 항목이 대기/에러면 그 메시지를 정보줄에 남김
+        while True:
+            try:
+                item = self.feed.queue.get_nowait()
+            except queue.Empty:
+                break
+            kind = item[0]
+            if kind == "tick":
+                _, _, s, m, b = item
+                self.last_spot, self.last_mark = s, m
+                self.decimator.push(self.values.append(b), b)
+                changed, notice = True, None
+            elif kind == "wait":
+                notice = f"{self.symbol} {'허브' if self.args.feed == 'local' else 'WebSocket'} 연결 대기 중…"
+            else:
+                notice = item[1]
+        if changed:
+            self.draw()
+        if notice is not None:
+            self.info.configure(text=notice)
         self.schedule_update()
 
     def _y_bounds(self) -> Tuple[float, float]:
-        if not self.values:
+        bounds = self.decimator.bounds() if self.auto_scale else None
+        if bounds is None:
             return (self.ymin, self.ymax) if not self.auto_scale else (-5, 5)
-        if self.auto_scale:
-            lo = min(self.values)
-            hi = max(self.values)
-            if lo == hi:
-                lo -= 1
-                hi += 1
-            pad = max(0.5, (hi - lo) * 0.2)
-            return (lo - pad, hi + pad)
-        return (self.ymin, self.ymax)
+        lo, hi = bounds
+        if lo == hi:
+            lo -= 1
+            hi += 1
+        pad = max(0.5, (hi - lo) * 0.2)
+        return (lo - pad, hi + pad)
+
+    def _create_items(self):
+        """캔버스 항목을 한 번만 만들고, draw()는 coords/itemconfigure로 위치와 글자만 바꿉니다."""
+        c = self.canvas
+        self.items["frame"] = c.create_rectangle(0, 0, 0, 0, outline=self.gridc)
+        for i in range(len(GRID_FRACS)):
+            self.items[f"grid{i}"] = c.create_line(0, 0, 0, 0, fill=self.gridc)
+            self.items[f"label{i}"] = c.create_text(0, 0, text="", fill=self.fg, anchor="w", font=("Consolas", 9))
+        # 기준선은 값이 지정된 경우에만 만듦
+        if self.entry_bps is not None:
+            self.items["entry"] = c.create_line(0, 0, 0, 0, fill="#2ecc71")
+        if self.exit_bps is not None:
+            self.items["exit"] = c.create_line(0, 0, 0, 0, fill="#e67e22")
+        self.items["line"] = c.create_line(0, 0, 0, 0, fill="#3498db", width=2, state="hidden")
+        self.items["dot"] = c.create_oval(0, 0, 0, 0, fill="#3498db", outline="", state="hidden")
 
     def draw(self):
-        w = int(self.canvas.winfo_width())
-        h = int(self.canvas.winfo_height())
-        self.canvas.delete("all")
+        c, items = self.canvas, self.items
+        w = int(c.winfo_width())
+        h = int(c.winfo_height())
 
         # Axes and grid
         margin = 30
         x0, y0 = margin, margin
         x1, y1 = w - margin, h - margin
-        self.canvas.create_rectangle(x0, y0, x1, y1, outline=self.gridc)
+        c.coords(items["frame"], x0, y0, x1, y1)
+        self.decimator.set_columns(x1 - x0)
 
         # Grid lines
         y_min, y_max = self._y_bounds()
-        for frac in [0.0, 0.25, 0.5, 0.75, 1.0]:
+        for i, frac in enumerate(GRID_FRACS):
             y = y1 - (y1 - y0) * frac
-            self.canvas.create_line(x0, y, x1, y, fill=self.gridc)
-            val = y_min + (y_max - y_min) * frac
-            self.canvas.create_text(x0 + 5, y, text=f"{val:.2f}", fill=self.fg, anchor="w", font=("Consolas", 9))
+            c.coords(items[f"grid{i}"], x0, y, x1, y)
+            c.coords(items[f"label{i}"], x0 + 5, y)
+            c.itemconfigure(items[f"label{i}"], text=f"{y_min + (y_max - y_min) * frac:.2f}")
 
         # Threshold lines
-        if self.entry_bps is not None:
-            yy = self._map_y(self.entry_bps, y_min, y_max, y0, y1)
-            self.canvas.create_line(x0, yy, x1, yy, fill="#2ecc71")
-        if self.exit_bps is not None:
-            yy = self._map_y(self.exit_bps, y_min, y_max, y0, y1)
-            self.canvas.create_line(x0, yy, x1, yy, fill="#e67e22")
-
-        # Plot line
-        if self.values:
-            # 2개 이상일 때만 선을 그림. 1개일 때는 점만 표시.
-            if len(self.values) >= 2:
-                coords = []
-                denom = max(1, len(self.values) - 1)
-                for i, v in enumerate(self.values):
-                    x = x0 + (x1 - x0) * (i / denom)
-                    y = self._map_y(v, y_min, y_max, y0, y1)
-                    coords.extend([x, y])
-                try:
-                    (self.canvas.create_line(*coords, fill="#3498db", width=2) if len(coords) >= 4 else None)
-                except Exception:
-                    pass
-            else:
-                # 단일 포인트는 작은 원으로 표시
-                x = x0 + (x1 - x0) * 1.0
-                y = self._map_y(self.values[-1], y_min, y_max, y0, y1)
-                r = 2
-                self.canvas.create_oval(x-r, y-r, x+r, y+r, fill="#3498db", outline="")
+        for key, bps in (("entry", self.entry_bps), ("exit", self.exit_bps)):
+            if bps is not None:
+                yy = self._map_y(bps, y_min, y_max, y0, y1)
+                c.coords(items[key], x0, yy, x1, yy)
+
+        # Plot line: 축약된 점만 좌표로 변환 (history 크기와 무관하게 약 2*열 수)
+        n = len(self.values)
+        if n >= 2:
+            start = self.values.start
+            denom = n - 1
+            coords = []
+            for idx, v in self.decimator.points():
+                coords.append(x0 + (x1 - x0) * ((idx - start) / denom))
+                coords.append(self._map_y(v, y_min, y_max, y0, y1))
+            c.coords(items["line"], coords)
+            c.itemconfigure(items["line"], state="normal")
+            c.itemconfigure(items["dot"], state="hidden")
+        elif n == 1:
+            # 단일 포인트는 작은 원으로 표시
+            y = self._map_y(self.values.last(), y_min, y_max, y0, y1)
+            r = 2
+            c.coords(items["dot"], x1 - r, y - r, x1 + r, y + r)
+            c.itemconfigure(items["dot"], state="normal")
         # Info text
-        self.info.configure(text=f"{self.symbol}  spot={self.last_spot:.2f}  mark={self.last_mark:.2f}  basis={self.values[-1]:.2f} bps" if self.values else f"{self.symbol} 데이터 로드 중…")
+        self.info.configure(text=f"{self.symbol}  spot={self.last_spot:.2f}  mark={self.last_mark:.2f}  basis={self.values.last():.2f} bps" if n else f"{self.symbol} 데이터 로드 중…")
 
     @staticmethod
     def _map_y(val: float, lo: float, hi: float, y0: int, y1: int) -> float:
@@ -207,6 +342,12 @@ def main():
 
     ap.add_argument("--symbol", default="BTCUSDT", help="대상 심볼")
     ap.add_argument("--interval", type=float, default=1.5, help="폴링 간격(초)")
+    ap.add_argument("--fps", type=positive_float, default=30.0, help="화면 갱신 주기(초당 프레임). 샘플링은 --interval로 백그라운드에서")
+    ap.add_argument("--feed", choices=["rest", "ws", "local"], default="rest", help="시세 소스: rest(폴링), ws(WebSocket) 또는 local(market_hub.py 구독)")
+    ap.add_argument("--hub", help="--feed local 허브 주소: 소켓 경로 또는 host:port")
+    ap.add_argument("--ws-base-url", help="스팟 WebSocket 베이스 URL 수동 지정")
+    ap.add_argument("--futures-ws-base-url", help="선물 WebSocket 베이스 URL 수동 지정")
+    ap.add_argument("--record", metavar="DIR", help="표시한 틱을 DIR/<SYMBOL>/ 세그먼트 파일로 기록")
     ap.add_argument("--history", type=int, default=300, help="표시할 최근 포인트 수")
     ap.add_argument("--entry-bps", type=float, help="진입 기준선(bps) 수평선 표시")
     ap.add_argument("--exit-bps", type=float, help="청산 기준선(bps) 수평선 표시")
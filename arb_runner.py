@@ -1,11 +1,48 @@
 ﻿import os
 import time
 import json
+import asyncio
 import argparse
-from dataclasses import dataclass
+import threading
+from array import array
+from dataclasses import dataclass, replace
+from typing import Callable
 
-from binance_client import BinanceClient, BinanceAPIError
-from binance_futures_client import BinanceFuturesClient, BinanceFuturesAPIError
+from candles import TIMEFRAMES, CandleSeries
+from binance_client import AsyncBinanceClient, BinanceClient, BinanceAPIError
+from binance_futures_client import (
+    AsyncBinanceFuturesClient,
+    BinanceFuturesClient,
+    BinanceFuturesAPIError,
+    PremiumIndex,
+)
+from market_hub import HubClient, hub_addr
+from market_stream import (
+    MarketStream,
+    SPOT_WS_URL,
+    SPOT_WS_TESTNET_URL,
+    FUTURES_WS_URL,
+    FUTURES_WS_TESTNET_URL,
+)
+from order_book import LocalOrderBook
+from order_gateway import (
+    FUTURES_WS_API_TESTNET_URL,
+    FUTURES_WS_API_URL,
+    SPOT_WS_API_TESTNET_URL,
+    SPOT_WS_API_URL,
+    OrderGateway,
+)
+from pair_executor import Leg, PairExecutor, PairExecutionError, client_order_id, filled_legs
+from rate_limit import futures_weight, spot_weight
+from request_signer import build_signer
+from tick_recorder import TickRecorder
+from time_sync import TimeSync
+from user_stream import UserDataStream
+from strategy_engine import StrategyEngine
+from state_journal import StateJournal, migrate_legacy_json
+from depth_sizing import DepthSizer
+from endpoint_manager import FUTURES_PROBE_PATH, SPOT_API_HOSTS, SPOT_PROBE_PATH, EndpointTransport
+from metrics import CLOCK_OFFSET_MS, LOOP_STAGE_SECONDS, USED_WEIGHT, start_metrics_server, timed
 
 
 # --- 간단 .env 로더 ---
@@ -52,21 +89,113 @@ def futures_base_url(args) -> str:
     )
 
 
-def build_spot(args) -> BinanceClient:
+def spot_ws_url(args) -> str:
+    if getattr(args, "ws_base_url", None):
+        return args.ws_base_url
+    if os.getenv("BINANCE_WS_BASE_URL"):
+        return os.getenv("BINANCE_WS_BASE_URL")
+    return (
+        SPOT_WS_TESTNET_URL
+        if args.testnet or truthy(os.getenv("BINANCE_TESTNET"))
+        else SPOT_WS_URL
+    )
+
+
+def futures_ws_url(args) -> str:
+    if getattr(args, "futures_ws_base_url", None):
+        return args.futures_ws_base_url
+    if os.getenv("BINANCE_FUTURES_WS_BASE_URL"):
+        return os.getenv("BINANCE_FUTURES_WS_BASE_URL")
+    return (
+        FUTURES_WS_TESTNET_URL
+        if args.futures_testnet or truthy(os.getenv("BINANCE_FUTURES_TESTNET"))
+        else FUTURES_WS_URL
+    )
+
+
+def spot_ws_api_url(args) -> str:
+    if getattr(args, "ws_api_url", None):
+        return args.ws_api_url
+    if os.getenv("BINANCE_WS_API_URL"):
+        return os.getenv("BINANCE_WS_API_URL")
+    return (
+        SPOT_WS_API_TESTNET_URL
+        if args.testnet or truthy(os.getenv("BINANCE_TESTNET"))
+        else SPOT_WS_API_URL
+    )
+
+
+def futures_ws_api_url(args) -> str:
+    if getattr(args, "futures_ws_api_url", None):
+        return args.futures_ws_api_url
+    if os.getenv("BINANCE_FUTURES_WS_API_URL"):
+        return os.getenv("BINANCE_FUTURES_WS_API_URL")
+    return (
+        FUTURES_WS_API_TESTNET_URL
+        if args.futures_testnet or truthy(os.getenv("BINANCE_FUTURES_TESTNET"))
+        else FUTURES_WS_API_URL
+    )
+
+
+def _host_list(spec: str | None) -> list[str]:
+    return [h.strip().rstrip("/") for h in (spec or "").split(",") if h.strip()]
+
+
+def build_transport(args) -> EndpointTransport | None:
+    """
+    --fast-endpoints / --hedge: 두 클라이언트가 공유하는 EndpointTransport를 만듭니다. 러너가 한 번 만들어 build_spot/build_futures에 넘기고 수명을 관리합니다.
+    스팟 대체 호스트는 --spot-hosts, 없으면 기본 URL이 api.binance.com일 때만 공식 호스트 목록(api-gcp, api1~4)을 씁니다.
+    """
+    fast = getattr(args, "fast_endpoints", False)
+    hedge = getattr(args, "hedge", False)
+    if not fast and not hedge:
+        return None
+    t = EndpointTransport(hedge=hedge)
+    spot_url = spot_base_url(args).rstrip("/")
+    spot_hosts = _host_list(getattr(args, "spot_hosts", None))
+    if not spot_hosts:
+        spot_hosts = list(SPOT_API_HOSTS) if fast and spot_url == SPOT_API_HOSTS[0] else []
+    t.add_group([spot_url] + [h for h in spot_hosts if h != spot_url], SPOT_PROBE_PATH)
+    fut_url = futures_base_url(args).rstrip("/")
+    fut_hosts = _host_list(getattr(args, "futures_hosts", None))
+    t.add_group([fut_url] + [h for h in fut_hosts if h != fut_url], FUTURES_PROBE_PATH)
+    # 헤지만 켜도 프로브를 돌려야 비정상으로 표시된 호스트가 다시 정상으로 돌아옴
+    t.start()
+    return t
+
+
+def build_spot(args, transport: EndpointTransport | None = None) -> BinanceClient:
     api_key = os.getenv("BINANCE_API_KEY", "")
     api_secret = os.getenv("BINANCE_API_SECRET", "")
+    # Ed25519/RSA API 키: PEM 개인키 경로가 있으면 HMAC 대신 사용
+    signer = build_signer(
+        api_secret, os.getenv("BINANCE_PRIVATE_KEY_PATH"), os.getenv("BINANCE_PRIVATE_KEY_PASSWORD")
+    )
     return BinanceClient(
-        api_key=api_key, api_secret=api_secret, base_url=spot_base_url(args)
+        api_key=api_key,
+        api_secret=api_secret,
+        base_url=spot_base_url(args),
+        signer=signer,
+        transport=transport,
     )
 
 
-def build_futures(args) -> BinanceFuturesClient:
+def build_futures(args, transport: EndpointTransport | None = None) -> BinanceFuturesClient:
     f_key = os.getenv("BINANCE_FUTURES_API_KEY") or os.getenv("BINANCE_API_KEY", "")
     f_sec = os.getenv("BINANCE_FUTURES_API_SECRET") or os.getenv(
         "BINANCE_API_SECRET", ""
     )
+    signer = build_signer(
+        f_sec,
+        os.getenv("BINANCE_FUTURES_PRIVATE_KEY_PATH") or os.getenv("BINANCE_PRIVATE_KEY_PATH"),
+        os.getenv("BINANCE_FUTURES_PRIVATE_KEY_PASSWORD") or os.getenv("BINANCE_PRIVATE_KEY_PASSWORD"),
+    )
     return BinanceFuturesClient(
-        api_key=f_key, api_secret=f_sec, base_url=futures_base_url(args)
+        api_key=f_key,
+        api_secret=f_sec,
+        base_url=futures_base_url(args),
+        signer=signer,
+        transport=transport,
     )
 
 
@@ -80,24 +209,30 @@ class Params:
     leverage: int
     isolated: bool
     dry_run: bool
+    exec_mode: str = "sequential"  # sequential | concurrent
+    leg_retries: int = 1
+    funding_horizon: float = 0.0  # 판단에 넣을 예상 펀딩 정산 횟수 (0이면 펀딩 무시)
+    reentry_delay: float = 0.0  # 청산 후 다음 진입까지 최소 대기(초)
 
 
-STATE_FILE = "arb_state.json"
+# 모든 심볼의 상태를 담는 추가 전용 저널 (스냅샷: arb_state.snapshot)
+STATE_FILE = "arb_state.journal"
+# 이전 버전의 JSON 상태 파일 (저널이 비어 있으면 한 번 가져옴)
+LEGACY_STATE_FILE = "arb_state.json"
+LEGACY_MULTI_STATE_FILE = "arb_state_multi.json"
+# WebSocket 피드 값이 이보다 오래되면(초) 판단에 쓰지 않음 (markPrice@1s 기준 여유)
+WS_STALE_SEC = 5.0
 
 
-def read_state() -> dict:
-    if not os.path.exists(STATE_FILE):
-        return {}
-    with open(STATE_FILE, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return {}
+STAGE_FETCH = LOOP_STAGE_SECONDS.labels("fetch")
+STAGE_DECIDE = LOOP_STAGE_SECONDS.labels("decide")
+STAGE_PERSIST = LOOP_STAGE_SECONDS.labels("persist")
 
 
-def write_state(d: dict) -> None:
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(d, f, indent=2)
+def open_state_journal(default_key: str) -> StateJournal:
+    journal = StateJournal(STATE_FILE)
+    migrate_legacy_json(journal, LEGACY_STATE_FILE, LEGACY_MULTI_STATE_FILE, default_key)
+    return journal
 
 
 # --- 핵심 로직 ---
@@ -120,6 +255,87 @@ def compute_basis_bps(spot_price: float, futures_mark: float) -> float:
     return (futures_mark - spot_price) / spot_price * 10000.0
 
 
+def compute_basis_vector(spot_prices: array, futures_marks: array) -> array:
+    """심볼 배열 전체의 베이시스(bps)를 한 번에 계산합니다 (spot<=0 이면 0)."""
+    return array(
+        "d",
+        [
+            (m - s) / s * 10000.0 if s > 0 else 0.0
+            for s, m in zip(spot_prices, futures_marks)
+        ],
+    )
+
+
+def entry_direction(mode: str, basis_bps: float, entry_bps: float) -> str | None:
+    """미보유 상태에서 진입할 방향("carry"/"reverse"), 없으면 None. 라이브 러너와 백테스트가 공유합니다."""
+    if mode in ("carry", "auto") and basis_bps > entry_bps:
+        return "carry"
+    if mode in ("reverse", "auto") and basis_bps < -entry_bps:
+        return "reverse"
+    return None
+
+
+def should_exit(direction: str, basis_bps: float, exit_bps: float) -> bool:
+    """보유 방향별 청산 조건: carry는 basis < exit, reverse는 basis > -exit."""
+    if direction == "carry":
+        return basis_bps < exit_bps
+    return basis_bps > -exit_bps
+
+
+def funding_adjusted_bps(basis_bps: float, funding_rate: float, horizon: float) -> float:
+    """
+    예상 펀딩을 더한 판단용 베이시스(bps). 펀딩비가 양수면 선물 숏(carry)이 받으므로 carry 쪽으로, 음수면 reverse 쪽으로 기웁니다.
+    entry_direction/should_exit에 그대로 넣으면 carry는 basis + funding, reverse는 -(basis + funding)을 기대 수익으로 보는 셈입니다.
+    """
+    return basis_bps + funding_rate * 10000.0 * horizon
+
+
+class FundingCache:
+    """
+    심볼별 최근 premiumIndex. 시세 요청(premiumIndex)의 응답으로 갱신되므로 REST 피드에서는 추가 요청이 없고,
+    값이 없거나 다음 펀딩 시각이 지난 경우(WebSocket/로컬 피드)에만 펀딩 주기당 한 번 조회합니다.
+    """
+
+    def __init__(self, fut: BinanceFuturesClient, retry_min: float = 5.0, retry_max: float = 300.0):
+        self.fut = fut
+        self.retry_min = float(retry_min)
+        self.retry_max = float(retry_max)
+        self.snaps: dict[str, PremiumIndex] = {}
+        # 조회 실패 후 다음 시도까지: symbol -> (monotonic 시각, 연속 실패 수)
+        self._retry_at: dict[str, tuple[float, int]] = {}
+
+    def update(self, pi: PremiumIndex) -> None:
+        self.snaps[pi.symbol] = pi
+        self._retry_at.pop(pi.symbol, None)
+
+    def rate(self, symbol: str, now_ms: int) -> float:
+        """실패 후에는 백오프(retry_min부터 두 배씩, retry_max까지)가 끝날 때까지 조회하지 않고 기존 값을 씁니다."""
+        pi = self.snaps.get(symbol)
+        if pi is None or now_ms >= pi.next_funding_time:
+            at, failures = self._retry_at.get(symbol, (0.0, 0))
+            if time.monotonic() >= at:
+                try:
+                    pi = self.fut.get_premium_index(symbol)
+                    self.update(pi)
+                except (BinanceFuturesAPIError, ConnectionError) as e:
+                    delay = min(self.retry_max, self.retry_min * 2**failures)
+                    self._retry_at[symbol] = (time.monotonic() + delay, failures + 1)
+                    print(f"warn: funding refresh failed: {e}; retry in {delay:.0f}s")
+        return pi.last_funding_rate if pi is not None else 0.0
+
+
+def build_funding(p: Params, fut: BinanceFuturesClient) -> FundingCache | None:
+    return FundingCache(fut) if p.funding_horizon > 0 else None
+
+
+def reentry_wait(p: Params, ls: "LoopState", ts_ms: int) -> float:
+    """마지막 청산 후 reentry_delay가 지나지 않았으면 남은 시간(초), 아니면 0."""
+    last = ls.state.get("last_close_ts_ms")
+    if not p.reentry_delay or not last:
+        return 0.0
+    return max(0.0, p.reentry_delay - (ts_ms - int(last)) / 1000.0)
+
+
 def size_from_notional(
     spot: BinanceClient, symbol: str, notional: float, spot_price: float
 ) -> float:
@@ -128,13 +344,27 @@ def size_from_notional(
     return qty
 
 
+def order_leg(name: str, client, symbol: str, unwind: Callable[[], dict | None] | None = None, **order) -> Leg:
+    """newClientOrderId를 붙인 레그. 결과를 알 수 없으면 executor가 같은 id로 주문을 조회합니다."""
+    cid = client_order_id()
+    return Leg(
+        name,
+        lambda: client.place_order(symbol=symbol, newClientOrderId=cid, **order),
+        unwind=unwind,
+        query=lambda: client.get_order(symbol, orig_client_order_id=cid),
+    )
+
+
 def open_pair(
     spot: BinanceClient,
     fut: BinanceFuturesClient,
     symbol: str,
     qty: float,
     dry_run: bool = False,
-) -> dict:
+    price: float | None = None,
+    executor: PairExecutor | None = None,
+) -> dict | None:
+    """주문을 보내지 않고 건너뛰면(수량 0, 사전 검증 실패) None을 반환합니다."""
     # 스팟/선물 양쪽 스텝(stepSize)에 맞춰 보정하고, 더 엄격한 수량 사용
     spot_qty = spot.clamp_quantity(symbol, qty)
     fut_qty = fut.clamp_quantity(symbol, qty)
@@ -157,15 +387,44 @@ def open_pair(
             )
         except Exception:
             print("skip: clamped qty is 0; increase notional.")
-        return actions
+        return None
 
-    actions["spot_buy"] = spot.place_order(
-        symbol=symbol, side="BUY", type="MARKET", quantity=use_qty, test=False
+    reason = spot.check_order(symbol, use_qty, price) or fut.check_order(
+        symbol, use_qty, price
     )
-    actions["futures_short"] = fut.place_order(
-        symbol=symbol, side="SELL", type="MARKET", quantity=use_qty
+    if reason:
+        print(f"skip: pre-trade check failed: {reason}")
+        return None
+
+    return (executor or PairExecutor()).execute(
+        order_leg(
+            "spot_buy",
+            spot,
+            symbol,
+            side="BUY",
+            type="MARKET",
+            quantity=use_qty,
+            test=False,
+            unwind=lambda: spot.place_order(
+                symbol=symbol, side="SELL", type="MARKET", quantity=use_qty, test=False
+            ),
+        ),
+        order_leg(
+            "futures_short",
+            fut,
+            symbol,
+            side="SELL",
+            type="MARKET",
+            quantity=use_qty,
+            unwind=lambda: fut.place_order(
+                symbol=symbol,
+                side="BUY",
+                type="MARKET",
+                quantity=use_qty,
+                reduce_only=True,
+            ),
+        ),
     )
-    return actions
 
 
 def close_pair(
@@ -174,19 +433,23 @@ def close_pair(
     symbol: str,
     qty: float,
     dry_run: bool = False,
+    executor: PairExecutor | None = None,
+    skip: list[str] | tuple[str, ...] = (),
 ) -> dict:
+    """skip: 이전 청산 시도에서 이미 체결된 레그 이름 (이번에는 나머지만 보냄)."""
     actions = {"futures_close": None, "spot_sell": None}
     if dry_run:
         print(f"DRY: futures BUY(reduceOnly) {symbol} qty={qty}")
         print(f"DRY: spot SELL {symbol} qty={qty}")
         return actions
-    actions["futures_close"] = fut.place_order(
-        symbol=symbol, side="BUY", type="MARKET", quantity=qty, reduce_only=True
-    )
-    actions["spot_sell"] = spot.place_order(
-        symbol=symbol, side="SELL", type="MARKET", quantity=qty, test=False
-    )
-    return actions
+    # 청산은 되돌리지 않음. 재시도 후에도 실패한 레그는 on_prices가 기록해 다음 틱에 그 레그만 다시 보냄
+    legs = [
+        order_leg(
+            "futures_close", fut, symbol, side="BUY", type="MARKET", quantity=qty, reduce_only=True
+        ),
+        order_leg("spot_sell", spot, symbol, side="SELL", type="MARKET", quantity=qty, test=False),
+    ]
+    return (executor or PairExecutor()).execute(*(leg for leg in legs if leg.name not in skip))
 
 
 def base_asset_from_symbol(symbol: str) -> str:
@@ -201,7 +464,10 @@ def open_pair_reverse(
     symbol: str,
     qty: float,
     dry_run: bool = False,
-) -> dict:
+    price: float | None = None,
+    executor: PairExecutor | None = None,
+) -> dict | None:
+    """주문을 보내지 않고 건너뛰면(수량 0, 사전 검증 실패) None을 반환합니다."""
     # 스팟/선물 양쪽 스텝(stepSize)에 맞춰 보정하고, 더 엄격한 수량 사용
     spot_qty = spot.clamp_quantity(symbol, qty)
     fut_qty = fut.clamp_quantity(symbol, qty)
@@ -223,15 +489,44 @@ def open_pair_reverse(
             )
         except Exception:
             print("skip: clamped qty is 0; increase notional.")
-        return actions
+        return None
 
-    actions["spot_sell"] = spot.place_order(
-        symbol=symbol, side="SELL", type="MARKET", quantity=use_qty, test=False
+    reason = spot.check_order(symbol, use_qty, price) or fut.check_order(
+        symbol, use_qty, price
     )
-    actions["futures_long"] = fut.place_order(
-        symbol=symbol, side="BUY", type="MARKET", quantity=use_qty
+    if reason:
+        print(f"skip: pre-trade check failed: {reason}")
+        return None
+
+    return (executor or PairExecutor()).execute(
+        order_leg(
+            "spot_sell",
+            spot,
+            symbol,
+            side="SELL",
+            type="MARKET",
+            quantity=use_qty,
+            test=False,
+            unwind=lambda: spot.place_order(
+                symbol=symbol, side="BUY", type="MARKET", quantity=use_qty, test=False
+            ),
+        ),
+        order_leg(
+            "futures_long",
+            fut,
+            symbol,
+            side="BUY",
+            type="MARKET",
+            quantity=use_qty,
+            unwind=lambda: fut.place_order(
+                symbol=symbol,
+                side="SELL",
+                type="MARKET",
+                quantity=use_qty,
+                reduce_only=True,
+            ),
+        ),
     )
-    return actions
 
 
 def close_pair_reverse(
@@ -240,132 +535,726 @@ def close_pair_reverse(
     symbol: str,
     qty: float,
     dry_run: bool = False,
+    executor: PairExecutor | None = None,
+    skip: list[str] | tuple[str, ...] = (),
 ) -> dict:
+    """skip: 이전 청산 시도에서 이미 체결된 레그 이름 (이번에는 나머지만 보냄)."""
     actions = {"futures_close": None, "spot_buy": None}
     if dry_run:
         print(f"DRY: futures SELL(reduceOnly) {symbol} qty={qty}")
         print(f"DRY: spot BUY {symbol} qty={qty}")
         return actions
-    actions["futures_close"] = fut.place_order(
-        symbol=symbol, side="SELL", type="MARKET", quantity=qty, reduce_only=True
-    )
-    actions["spot_buy"] = spot.place_order(
-        symbol=symbol, side="BUY", type="MARKET", quantity=qty, test=False
+    legs = [
+        order_leg(
+            "futures_close", fut, symbol, side="SELL", type="MARKET", quantity=qty, reduce_only=True
+        ),
+        order_leg("spot_buy", spot, symbol, side="BUY", type="MARKET", quantity=qty, test=False),
+    ]
+    return (executor or PairExecutor()).execute(*(leg for leg in legs if leg.name not in skip))
+
+
+def format_leg_skew(actions: dict) -> str:
+    """레그별 send/ack 타임스탬프로 두 레그 간 전송 시차(skew)와 응답 시간을 요약합니다."""
+    legs = actions.get("legs") or {}
+    if len(legs) != 2:
+        return ""
+    (n1, a), (n2, b) = legs.items()
+    skew = abs(a["sent_ms"] - b["sent_ms"])
+    return f" skew={skew}ms {n1}={a['ack_ms'] - a['sent_ms']}ms {n2}={b['ack_ms'] - b['sent_ms']}ms"
+
+
+def log_leg_failure(e: Exception) -> None:
+    if isinstance(e, PairExecutionError):
+        print(f"legs: {json.dumps(e.actions.get('legs'), ensure_ascii=False)}")
+
+
+def record_leg_failure(ls: "LoopState", symbol: str, e: Exception, closing: bool) -> None:
+    """
+    실패한 진입/청산 결과를 상태에 남깁니다.\n    - 청산: 체결된 레그를 closed_legs에 누적해 다음 시도에서 나머지 레그만 보냄\n    - 체결 여부를 모르거나 되돌리기가 실패하면 review를 기록하고 --clear-review 전까지 그 심볼은 거래하지 않음
+    """
+    if not isinstance(e, PairExecutionError):
+        return
+    changed = False
+    if closing:
+        done = filled_legs(e.actions)
+        if done:
+            ls.state["closed_legs"] = sorted(set(ls.state.get("closed_legs", [])) | set(done))
+            print(f"partial close: {', '.join(done)} filled; only the remaining legs will be resent")
+            changed = True
+    if e.needs_review:
+        ls.state["review"] = f"{'close' if closing else 'open'}: {e}"
+        print(f"{symbol} needs manual review; trading paused (restart with --clear-review after checking positions)")
+        changed = True
+    if changed:
+        ls.persist(ls.state)
+
+
+@dataclass
+class LoopState:
+    state: dict
+    open_flag: bool
+    open_qty: float
+    persist: Callable[[dict], None]
+
+
+def load_loop_state(journal: StateJournal, symbol: str, clear_review: bool = False) -> LoopState:
+    state = journal.get(symbol)
+    if state.get("review"):
+        if clear_review:
+            print(f"{symbol}: cleared review mark ({state.pop('review')})")
+            _persist(journal, symbol, state)
+        else:
+            print(f"warn: {symbol} needs manual review: {state['review']}")
+    return LoopState(
+        state=state,
+        open_flag=bool(state.get("open", False)),
+        open_qty=float(state.get("qty", 0.0)),
+        persist=lambda st: _persist(journal, symbol, st),
     )
-    return actions
 
 
-def run_loop(args, p: Params):
-    spot = build_spot(args)
-    fut = build_futures(args)
-    ensure_futures_setup(fut, p.symbol, p.leverage, p.isolated)
+def _persist(journal: StateJournal, symbol: str, st: dict) -> None:
+    with timed(STAGE_PERSIST):
+        journal.put(symbol, st)
 
-    state = read_state()
-    open_flag = bool(state.get("open", False))
-    open_qty = float(state.get("qty", 0.0))
 
-    while True:
+def start_time_sync(args, spot: BinanceClient, fut: BinanceFuturesClient) -> None:
+    """서버 시계 오프셋을 한 번 맞춘 뒤 백그라운드로 유지합니다 (--time-sync-interval 0 이면 사용 안 함)."""
+    interval = getattr(args, "time_sync_interval", 60.0)
+    if not interval:
+        return
+    for c, name in ((spot, "spot"), (fut, "futures")):
+        ts = TimeSync(c.get_server_time, interval=interval, name=name)
         try:
-            s_price = spot.get_price(p.symbol)
-            f_mark = fut.get_mark_price(p.symbol)
-        except (BinanceAPIError, BinanceFuturesAPIError) as e:
-            print(f"data error: {e}")
-            time.sleep(max(1.0, p.interval * 2))
+            ts.sync()
+            print(ts.describe())
+        except (BinanceAPIError, BinanceFuturesAPIError, ConnectionError) as e:
+            print(f"warn: initial {name} time sync failed: {e}")
+        c.time_sync = ts.start()
+        CLOCK_OFFSET_MS.labels(name).set_function(lambda ts=ts: ts.offset_ms)
+
+
+def start_order_gateway(args, p: Params, spot: BinanceClient, fut: BinanceFuturesClient) -> OrderGateway | None:
+    """--ws-orders: 주문/취소를 WebSocket API 세션으로 보냅니다 (연결이 없을 때는 REST로 대체)."""
+    if not getattr(args, "ws_orders", False) or p.dry_run:
+        return None
+    gw = OrderGateway(spot, fut, spot_ws_api_url(args), futures_ws_api_url(args)).start()
+    print(f"ws orders: spot={gw.spot.url} futures={gw.futures.url}")
+    return gw
+
+
+def start_user_streams(args, p: Params, spot: BinanceClient, fut: BinanceFuturesClient) -> list[UserDataStream]:
+    """--user-stream: 잔고/포지션/주문 상태를 user data stream으로 받아 캐시 (진입 전 잔고 확인이 REST 대신 캐시를 읽음)."""
+    if not getattr(args, "user_stream", False) or p.dry_run:
+        return []
+    streams = [
+        UserDataStream(spot, spot_ws_url(args)).start(),
+        UserDataStream(fut, futures_ws_url(args), futures=True).start(),
+    ]
+    print(f"user data stream: spot={streams[0].ws_base_url} futures={streams[1].ws_base_url}")
+    return streams
+
+
+def prepare_clients(args, p: Params) -> tuple[BinanceClient, BinanceFuturesClient]:
+    transport = build_transport(args)
+    spot = build_spot(args, transport)
+    fut = build_futures(args, transport)
+    start_metrics(args, spot, fut)
+    start_time_sync(args, spot, fut)
+    ensure_futures_setup(fut, p.symbol, p.leverage, p.isolated)
+    # 진입 경로에서 exchangeInfo 요청이 나가지 않도록 필터를 미리 적재하고 주기적으로 갱신
+    for c in (spot, fut):
+        c.symbols.load()
+        c.symbols.start_refresh()
+    start_order_gateway(args, p, spot, fut)
+    start_user_streams(args, p, spot, fut)
+    return spot, fut
+
+
+def build_executor(p: Params) -> PairExecutor:
+    return PairExecutor(concurrent=p.exec_mode == "concurrent", retries=p.leg_retries)
+
+
+def build_sizer(
+    args, p: Params, spot: BinanceClient, fut: BinanceFuturesClient, books: tuple | None = None
+) -> DepthSizer | None:
+    """--depth-sizing 이면 진입 수량을 호가 VWAP/수수료 기준으로 정하는 sizer를 만듭니다."""
+    if not getattr(args, "depth_sizing", False):
+        return None
+    return DepthSizer(
+        spot,
+        fut,
+        p.symbol,
+        books=books,
+        limit=args.depth_limit,
+        spot_fee_bps=args.spot_fee_bps,
+        futures_fee_bps=args.futures_fee_bps,
+    )
+
+
+def depth_limited_qty(spot: BinanceClient, p: Params, sizer: DepthSizer, direction: str, qty: float) -> float:
+    """qty(명목가 기준 상한)를 넘지 않으면서 VWAP 체결 후에도 entry_bps를 넘는 최대 수량. 없으면 0."""
+    try:
+        res = sizer.size(direction, qty, p.entry_bps)
+    except (BinanceAPIError, BinanceFuturesAPIError, ConnectionError) as e:
+        print(f"sizing error: {e}")
+        return 0.0
+    print(res.describe())
+    sized = spot.clamp_quantity(p.symbol, res.qty)
+    # clamp가 최소 수량까지 올려 잡았다면 그 수량은 임계값을 넘지 못함
+    return sized if sized <= res.qty + 1e-12 else 0.0
+
+
+def start_metrics(args, spot: BinanceClient, fut: BinanceFuturesClient) -> None:
+    """--metrics-port 가 있으면 127.0.0.1:<port>/metrics 로 Prometheus 텍스트를 제공합니다."""
+    port = getattr(args, "metrics_port", None)
+    if not port:
+        return
+    USED_WEIGHT.labels("spot").set_function(lambda: spot.limiter.used_weight)
+    USED_WEIGHT.labels("futures").set_function(lambda: fut.limiter.used_weight)
+    start_metrics_server(port)
+    print(f"metrics: http://127.0.0.1:{port}/metrics")
+
+
+def build_recorder(args) -> TickRecorder | None:
+    """--record DIR 이 주어지면 틱(ts, spot, mark, basis)을 세그먼트 파일로 기록합니다."""
+    root = getattr(args, "record", None)
+    return TickRecorder(root) if root else None
+
+
+def build_bars(args) -> CandleSeries | None:
+    """--signal-bar 1s|1m|1h 이 주어지면 틱을 봉으로 접어 봉이 닫힐 때만 판단합니다."""
+    tf = getattr(args, "signal_bar", None)
+    return CandleSeries(TIMEFRAMES[tf]) if tf else None
+
+
+def bar_close(bars: CandleSeries | None, s_price: float, f_mark: float, ts_ms: int) -> tuple[float, float, int] | None:
+    """봉 모드가 아니면 틱 그대로, 봉 모드면 봉이 닫힌 틱에서만 그 봉의 (스팟 종가, 마크 종가, 종료 시각)을 반환합니다."""
+    if bars is None:
+        return s_price, f_mark, ts_ms
+    c = bars.update(ts_ms, s_price, f_mark, compute_basis_bps(s_price, f_mark))
+    if c is None:
+        return None
+    return c.spot[3], c.mark[3], c.end_ms
+
+
+def tick_interval(p: Params, spot: BinanceClient, fut: BinanceFuturesClient, spot_w: int, fut_w: int) -> float:
+    """--interval 0 이면 두 호스트의 가중치 한도 안에서 가능한 가장 짧은 간격을 씁니다."""
+    if p.interval > 0:
+        return p.interval
+    return max(spot.limiter.min_interval(spot_w), fut.limiter.min_interval(fut_w))
+
+
+def data_error_backoff(e: Exception, p: Params) -> float:
+    """429/418은 limiter가 Retry-After까지 다음 요청을 붙잡으므로 추가 대기하지 않습니다."""
+    if getattr(e, "status", None) in (418, 429):
+        return 0.0
+    return max(1.0, p.interval * 2)
+
+
+def start_books(
+    args, spot: BinanceClient, fut: BinanceFuturesClient, symbol: str
+) -> tuple[LocalOrderBook, LocalOrderBook]:
+    """스팟/선물 로컬 오더북을 띄웁니다 (스냅샷 1회 후 증분 스트림으로 유지)."""
+    spot_book = LocalOrderBook(spot, symbol, spot_ws_url(args)).start()
+    fut_book = LocalOrderBook(fut, symbol, futures_ws_url(args), futures=True).start()
+    for b in (spot_book, fut_book):
+        if not b.wait_synced(15):
+            print(f"warn: {'futures' if b.futures else 'spot'} order book not synced yet")
+    return spot_book, fut_book
+
+
+def format_books(spot_book: LocalOrderBook, fut_book: LocalOrderBook) -> str:
+    parts = []
+    for name, b in (("spot", spot_book), ("fut", fut_book)):
+        bid, ask = b.best_bid(), b.best_ask()
+        if not b.synced or not bid or not ask:
+            parts.append(f"{name}=syncing")
             continue
+        bq, aq = b.depth_within_bps(5)
+        parts.append(f"{name}={bid[0]:.2f}/{ask[0]:.2f} depth5bps={bq:.4f}/{aq:.4f}")
+    return "book " + " ".join(parts)
 
-        basis_bps = compute_basis_bps(s_price, f_mark)
-        print(
-            f"spot={s_price:.2f} mark={f_mark:.2f} basis_bps={basis_bps:.2f} open={open_flag} qty={open_qty}"
-        )
 
-        mode = getattr(args, "mode", "carry")
+def on_prices(
+    spot: BinanceClient,
+    fut: BinanceFuturesClient,
+    args,
+    p: Params,
+    ls: LoopState,
+    s_price: float,
+    f_mark: float,
+    ts_ms: int,
+    executor: PairExecutor | None = None,
+    sizer: DepthSizer | None = None,
+    funding: FundingCache | None = None,
+) -> None:
+    """한 틱의 가격(스팟, 마크)으로 진입/청산을 판단하고 주문을 실행합니다."""
+    basis_bps = compute_basis_bps(s_price, f_mark)
+    signal_bps = basis_bps
+    funding_note = ""
+    if funding is not None:
+        rate = funding.rate(p.symbol, ts_ms)
+        signal_bps = funding_adjusted_bps(basis_bps, rate, p.funding_horizon)
+        funding_note = f" funding={rate * 10000.0:.2f}bps signal_bps={signal_bps:.2f}"
+    print(
+        f"spot={s_price:.2f} mark={f_mark:.2f} basis_bps={basis_bps:.2f}{funding_note} open={ls.open_flag} qty={ls.open_qty}"
+    )
+    if ls.state.get("review"):
+        print(f"skip {p.symbol}: needs manual review ({ls.state['review']})")
+        return
+    t0 = time.perf_counter()
+
+    mode = getattr(args, "mode", "carry")
 
-        if not open_flag:
-            if mode in ("carry", "auto") and basis_bps > p.entry_bps:
-                qty = size_from_notional(spot, p.symbol, p.notional, s_price)
+    if not ls.open_flag:
+        direction = entry_direction(mode, signal_bps, p.entry_bps)
+        wait_s = reentry_wait(p, ls, ts_ms) if direction else 0.0
+        if wait_s > 0:
+            print(f"skip {direction} open: re-entry delay ({wait_s:.1f}s left)")
+            direction = None
+        qty = size_from_notional(spot, p.symbol, p.notional, s_price) if direction else 0.0
+        if direction and sizer is not None:
+            qty = depth_limited_qty(spot, p, sizer, direction, qty)
+        STAGE_DECIDE.observe(time.perf_counter() - t0)
+        if direction and qty <= 0:
+            print(f"skip {direction} open: no size clears entry_bps after slippage and fees")
+        elif direction == "carry":
+            try:
+                acts = open_pair(
+                    spot,
+                    fut,
+                    p.symbol,
+                    qty,
+                    dry_run=p.dry_run,
+                    price=s_price,
+                    executor=executor,
+                )
+                if acts is None:
+                    return  # 주문을 보내지 않음: 포지션 상태를 바꾸지 않음
+                ls.open_flag = True
+                ls.open_qty = qty
+                ls.state.update(
+                    {
+                        "open": True,
+                        "dir": "carry",
+                        "qty": qty,
+                        "symbol": p.symbol,
+                        "last_open_basis_bps": basis_bps,
+                        "last_open_ts_ms": ts_ms,
+                        "actions": acts,
+                    }
+                )
+                ls.persist(ls.state)
+                print(f"OPENED carry qty={qty}{format_leg_skew(acts)}")
+            except (BinanceAPIError, BinanceFuturesAPIError, PairExecutionError) as e:
+                print(f"open error: {e}")
+                log_leg_failure(e)
+                record_leg_failure(ls, p.symbol, e, closing=False)
+        elif direction == "reverse":
+            base = base_asset_from_symbol(p.symbol)
+            free, _ = spot.get_balance(base)
+            qty = min(qty, free)
+            qty = spot.clamp_quantity(p.symbol, qty)
+            if qty <= 0:
+                print("skip reverse open: insufficient spot inventory to sell")
+            else:
                 try:
-                    acts = open_pair(spot, fut, p.symbol, qty, dry_run=p.dry_run)
-                    open_flag = True
-                    open_qty = qty
-                    state.update(
+                    acts = open_pair_reverse(
+                        spot,
+                        fut,
+                        p.symbol,
+                        qty,
+                        dry_run=p.dry_run,
+                        price=s_price,
+                        executor=executor,
+                    )
+                    if acts is None:
+                        return  # 주문을 보내지 않음: 포지션 상태를 바꾸지 않음
+                    ls.open_flag = True
+                    ls.open_qty = qty
+                    ls.state.update(
                         {
                             "open": True,
-                            "dir": "carry",
+                            "dir": "reverse",
                             "qty": qty,
                             "symbol": p.symbol,
                             "last_open_basis_bps": basis_bps,
+                            "last_open_ts_ms": ts_ms,
                             "actions": acts,
                         }
                     )
-                    write_state(state)
-                    print(f"OPENED carry qty={qty}")
-                except (BinanceAPIError, BinanceFuturesAPIError) as e:
+                    ls.persist(ls.state)
+                    print(f"OPENED reverse qty={qty}{format_leg_skew(acts)}")
+                except (BinanceAPIError, BinanceFuturesAPIError, PairExecutionError) as e:
                     print(f"open error: {e}")
-            elif mode in ("reverse", "auto") and basis_bps < -p.entry_bps:
-                qty = size_from_notional(spot, p.symbol, p.notional, s_price)
-                base = base_asset_from_symbol(p.symbol)
-                free, _ = spot.get_balance(base)
-                qty = min(qty, free)
-                qty = spot.clamp_quantity(p.symbol, qty)
-                if qty <= 0:
-                    print("skip reverse open: insufficient spot inventory to sell")
-                else:
-                    try:
-                        acts = open_pair_reverse(
-                            spot, fut, p.symbol, qty, dry_run=p.dry_run
-                        )
-                        open_flag = True
-                        open_qty = qty
-                        state.update(
-                            {
-                                "open": True,
-                                "dir": "reverse",
-                                "qty": qty,
-                                "symbol": p.symbol,
-                                "last_open_basis_bps": basis_bps,
-                                "actions": acts,
-                            }
-                        )
-                        write_state(state)
-                        print(f"OPENED reverse qty={qty}")
-                    except (BinanceAPIError, BinanceFuturesAPIError) as e:
-                        print(f"open error: {e}")
+                    log_leg_failure(e)
+                    record_leg_failure(ls, p.symbol, e, closing=False)
+    else:
+        direction = ls.state.get("dir", "carry")
+        exit_now = should_exit(direction, signal_bps, p.exit_bps)
+        STAGE_DECIDE.observe(time.perf_counter() - t0)
+        if direction == "carry" and exit_now:
+            try:
+                acts = close_pair(
+                    spot,
+                    fut,
+                    p.symbol,
+                    ls.open_qty,
+                    dry_run=p.dry_run,
+                    executor=executor,
+                    skip=ls.state.get("closed_legs", ()),
+                )
+                ls.open_flag = False
+                ls.state.pop("closed_legs", None)
+                ls.state.update(
+                    {
+                        "open": False,
+                        "last_close_basis_bps": basis_bps,
+                        "last_close_ts_ms": ts_ms,
+                        "actions": acts,
+                    }
+                )
+                ls.persist(ls.state)
+                print(f"CLOSED carry{format_leg_skew(acts)}")
+            except (BinanceAPIError, BinanceFuturesAPIError, PairExecutionError) as e:
+                print(f"close error: {e}")
+                log_leg_failure(e)
+                record_leg_failure(ls, p.symbol, e, closing=True)
+        elif direction == "reverse" and exit_now:
+            try:
+                acts = close_pair_reverse(
+                    spot,
+                    fut,
+                    p.symbol,
+                    ls.open_qty,
+                    dry_run=p.dry_run,
+                    executor=executor,
+                    skip=ls.state.get("closed_legs", ()),
+                )
+                ls.open_flag = False
+                ls.state.pop("closed_legs", None)
+                ls.state.update(
+                    {
+                        "open": False,
+                        "last_close_basis_bps": basis_bps,
+                        "last_close_ts_ms": ts_ms,
+                        "actions": acts,
+                    }
+                )
+                ls.persist(ls.state)
+                print(f"CLOSED reverse{format_leg_skew(acts)}")
+            except (BinanceAPIError, BinanceFuturesAPIError, PairExecutionError) as e:
+                print(f"close error: {e}")
+                log_leg_failure(e)
+                record_leg_failure(ls, p.symbol, e, closing=True)
+
+
+def run_loop(args, p: Params):
+    spot, fut = prepare_clients(args, p)
+    ls = load_loop_state(open_state_journal(p.symbol), p.symbol, args.clear_review)
+    executor = build_executor(p)
+    funding = build_funding(p, fut)
+
+    stream = None
+    feed = getattr(args, "feed", "rest")
+    if feed == "ws":
+        stream = MarketStream(p.symbol, spot_ws_url(args), futures_ws_url(args)).start()
+    elif feed == "local":
+        stream = HubClient([p.symbol], hub_addr(args.hub)).start()
+    books = start_books(args, spot, fut, p.symbol) if getattr(args, "book", False) else None
+    recorder = build_recorder(args)
+    bars = build_bars(args)
+    sizer = build_sizer(args, p, spot, fut, books)
+    interval = tick_interval(
+        p,
+        spot,
+        fut,
+        spot_weight("GET", "/api/v3/ticker/price", {"symbol": p.symbol}),
+        futures_weight("GET", "/fapi/v1/premiumIndex", {"symbol": p.symbol}),
+    )
+
+    while True:
+        if stream is not None:
+            # 스트림이 최신 값을 유지하므로 REST 요청 없이 읽기만 함
+            with timed(STAGE_FETCH):
+                snap = stream.snapshot(max_age=WS_STALE_SEC)
+            if snap is None:
+                print(f"data error: {feed} feed not ready or stale")
+                time.sleep(max(1.0, interval))
+                continue
+            s_price, f_mark, ts_ms = snap
         else:
-            direction = state.get("dir", "carry")
-            if direction == "carry" and basis_bps < p.exit_bps:
-                try:
-                    acts = close_pair(spot, fut, p.symbol, open_qty, dry_run=p.dry_run)
-                    open_flag = False
-                    state.update(
-                        {
-                            "open": False,
-                            "last_close_basis_bps": basis_bps,
-                            "actions": acts,
-                        }
-                    )
-                    write_state(state)
-                    print("CLOSED carry")
-                except (BinanceAPIError, BinanceFuturesAPIError) as e:
-                    print(f"close error: {e}")
-            elif direction == "reverse" and basis_bps > -p.exit_bps:
-                try:
-                    acts = close_pair_reverse(
-                        spot, fut, p.symbol, open_qty, dry_run=p.dry_run
-                    )
-                    open_flag = False
-                    state.update(
-                        {
-                            "open": False,
-                            "last_close_basis_bps": basis_bps,
-                            "actions": acts,
-                        }
-                    )
-                    write_state(state)
-                    print("CLOSED reverse")
-                except (BinanceAPIError, BinanceFuturesAPIError) as e:
-                    print(f"close error: {e}")
+            try:
+                with timed(STAGE_FETCH):
+                    s_price = spot.get_price(p.symbol)
+                    if funding is not None:
+                        # 같은 premiumIndex 응답에서 펀딩비도 함께 받음
+                        pi = fut.get_premium_index(p.symbol)
+                        funding.update(pi)
+                        f_mark = pi.mark_price
+                    else:
+                        f_mark = fut.get_mark_price(p.symbol)
+            except (BinanceAPIError, BinanceFuturesAPIError) as e:
+                print(f"data error: {e}")
+                time.sleep(data_error_backoff(e, p))
+                continue
+            ts_ms = int(time.time() * 1000)
+
+        if recorder is not None:
+            recorder.append(p.symbol, ts_ms, s_price, f_mark, compute_basis_bps(s_price, f_mark))
+        if books is not None:
+            print(format_books(*books))
+        closed = bar_close(bars, s_price, f_mark, ts_ms)
+        if closed is not None:
+            on_prices(spot, fut, args, p, ls, *closed, executor, sizer, funding)
+        time.sleep(interval)
+
+
+def start_rest_feed(
+    p: Params,
+    spot: BinanceClient,
+    fut: BinanceFuturesClient,
+    funding: FundingCache | None,
+    interval: float,
+    submit: Callable[[float, float, int], None],
+) -> threading.Thread:
+    """--feed rest 를 이벤트 엔진에 연결합니다: 폴링 스레드가 응답을 받는 즉시 submit (판단은 다음 폴링을 기다리지 않음)."""
+
+    def poll() -> None:
+        while True:
+            try:
+                with timed(STAGE_FETCH):
+                    s_price = spot.get_price(p.symbol)
+                    if funding is not None:
+                        pi = fut.get_premium_index(p.symbol)
+                        funding.update(pi)
+                        f_mark = pi.mark_price
+                    else:
+                        f_mark = fut.get_mark_price(p.symbol)
+            except (BinanceAPIError, BinanceFuturesAPIError, ConnectionError) as e:
+                print(f"data error: {e}")
+                time.sleep(data_error_backoff(e, p))
+                continue
+            submit(s_price, f_mark, int(time.time() * 1000))
+            time.sleep(interval)
+
+    t = threading.Thread(target=poll, name="rest-feed", daemon=True)
+    t.start()
+    return t
+
+
+def run_event_loop(args, p: Params):
+    """
+    --event-driven: 스팟/마크 갱신이 도착할 때마다 진입/청산을 판단합니다 (StrategyEngine).\n    ws/local 피드는 스트림 콜백이, rest 피드는 폴링 스레드가 갱신을 넣으므로 --interval 은 rest 폴링 주기에만 쓰입니다.
+    """
+    spot, fut = prepare_clients(args, p)
+    ls = load_loop_state(open_state_journal(p.symbol), p.symbol, args.clear_review)
+    executor = build_executor(p)
+    funding = build_funding(p, fut)
+    books = start_books(args, spot, fut, p.symbol) if getattr(args, "book", False) else None
+    recorder = build_recorder(args)
+    bars = build_bars(args)
+    sizer = build_sizer(args, p, spot, fut, books)
+
+    def on_tick(s_price: float, f_mark: float, ts_ms: int) -> tuple[float, float, int] | None:
+        # 기록과 봉 집계는 합쳐지기 전 모든 틱에 적용
+        if recorder is not None:
+            recorder.append(p.symbol, ts_ms, s_price, f_mark, compute_basis_bps(s_price, f_mark))
+        return bar_close(bars, s_price, f_mark, ts_ms)
+
+    def decide(s_price: float, f_mark: float, ts_ms: int) -> None:
+        if books is not None:
+            print(format_books(*books))
+        on_prices(spot, fut, args, p, ls, s_price, f_mark, ts_ms, executor, sizer, funding)
+
+    feed = getattr(args, "feed", "rest")
+    engine = StrategyEngine(
+        decide, on_tick, debounce=args.debounce_ms / 1000.0, stale_after=WS_STALE_SEC, name=f"{feed} feed"
+    )
+    if feed == "ws":
+        MarketStream(p.symbol, spot_ws_url(args), futures_ws_url(args), on_update=engine.submit).start()
+    elif feed == "local":
+        HubClient([p.symbol], hub_addr(args.hub), on_update=lambda sym, s, m, t: engine.submit(s, m, t)).start()
+    else:
+        interval = tick_interval(
+            p,
+            spot,
+            fut,
+            spot_weight("GET", "/api/v3/ticker/price", {"symbol": p.symbol}),
+            futures_weight("GET", "/fapi/v1/premiumIndex", {"symbol": p.symbol}),
+        )
+        start_rest_feed(p, spot, fut, funding, interval, engine.submit)
+    print(f"event-driven: feed={feed} debounce={args.debounce_ms:g}ms reentry_delay={p.reentry_delay:g}s")
+    try:
+        engine.run()
+    finally:
+        print(engine.describe())
+
+
+def resolve_symbols(spec: str, spot: BinanceClient, fut: BinanceFuturesClient) -> list[str]:
+    """'BTCUSDT,ETHUSDT' 또는 'ALL'(스팟에도 상장된 USDT 무기한 전체)을 심볼 목록으로 변환합니다."""
+    spot_symbols = set(spot.symbols.symbols())
+    if spec.strip().upper() == "ALL":
+        return sorted(s for s in fut.get_usdt_perpetuals() if s in spot_symbols)
+    return [s.strip().upper() for s in spec.split(",") if s.strip()]
+
+
+def run_multi_loop(args, p: Params):
+    """여러 심볼을 틱당 2회 요청(전체 현재가 + 전체 premiumIndex)으로 감시합니다."""
+    transport = build_transport(args)
+    spot = build_spot(args, transport)
+    fut = build_futures(args, transport)
+    start_metrics(args, spot, fut)
+    start_time_sync(args, spot, fut)
+    for c in (spot, fut):
+        c.symbols.load()
+        c.symbols.start_refresh()
+    symbols = resolve_symbols(args.symbols, spot, fut)
+    if not symbols:
+        raise SystemExit("no symbols to trade")
+    print(f"multi: {len(symbols)} symbols")
+    if not p.dry_run:
+        for sym in symbols:
+            ensure_futures_setup(fut, sym, p.leverage, p.isolated)
+    start_order_gateway(args, p, spot, fut)
+    start_user_streams(args, p, spot, fut)
+    executor = build_executor(p)
+    recorder = build_recorder(args)
+    funding = build_funding(p, fut)
+
+    journal = open_state_journal(p.symbol)
+    loops: dict[str, LoopState] = {}
+    params: dict[str, Params] = {}
+    sizers: dict[str, DepthSizer | None] = {}
+    bars: dict[str, CandleSeries | None] = {}
+    for sym in symbols:
+        bars[sym] = build_bars(args)
+        loops[sym] = load_loop_state(journal, sym, args.clear_review)
+        params[sym] = replace(p, symbol=sym)
+        sizers[sym] = build_sizer(args, params[sym], spot, fut)
+    mode = getattr(args, "mode", "carry")
+    lo = -p.entry_bps if mode in ("reverse", "auto") else float("-inf")
+    hi = p.entry_bps if mode in ("carry", "auto") else float("inf")
+    interval = tick_interval(
+        p,
+        spot,
+        fut,
+        spot_weight("GET", "/api/v3/ticker/price", None),
+        futures_weight("GET", "/fapi/v1/premiumIndex", None),
+    )
+
+    hub = HubClient(symbols, hub_addr(args.hub)).start() if getattr(args, "feed", "rest") == "local" else None
+
+    while True:
+        if hub is not None:
+            with timed(STAGE_FETCH):
+                ticks = hub.snapshot_all(max_age=WS_STALE_SEC)
+            if not ticks:
+                print("data error: local feed not ready or stale")
+                time.sleep(max(1.0, interval))
+                continue
+            prices = {s: t[0] for s, t in ticks.items()}
+            marks = {s: t[1] for s, t in ticks.items()}
+        else:
+            try:
+                with timed(STAGE_FETCH):
+                    prices = spot.get_all_prices()
+                    if funding is not None:
+                        index = fut.get_all_premium_index()
+                        for pi in index.values():
+                            funding.update(pi)
+                        marks = {sym: pi.mark_price for sym, pi in index.items()}
+                    else:
+                        marks = fut.get_all_mark_prices()
+            except (BinanceAPIError, BinanceFuturesAPIError) as e:
+                print(f"data error: {e}")
+                time.sleep(data_error_backoff(e, p))
+                continue
+        ts_ms = int(time.time() * 1000)
+
+        live = [s for s in symbols if s in prices and s in marks]
+        spots = array("d", [prices[s] for s in live])
+        futs = array("d", [marks[s] for s in live])
+        basis = compute_basis_vector(spots, futs)
+        if recorder is not None:
+            for i, sym in enumerate(live):
+                recorder.append(sym, ts_ms, spots[i], futs[i], basis[i])
+        if basis:
+            i_max = max(range(len(basis)), key=basis.__getitem__)
+            i_min = min(range(len(basis)), key=basis.__getitem__)
+            n_open = sum(1 for s in live if loops[s].open_flag)
+            print(
+                f"multi n={len(live)} open={n_open} max={live[i_max]}:{basis[i_max]:.2f} min={live[i_min]}:{basis[i_min]:.2f}"
+            )
+
+        # 진입 후보(임계값 돌파)와 보유 중인 심볼만 개별 판단
+        for i, sym in enumerate(live):
+            b = basis[i]
+            closed = bar_close(bars[sym], spots[i], futs[i], ts_ms)
+            if closed is None:
+                continue
+            if bars[sym] is not None:
+                b = compute_basis_bps(closed[0], closed[1])
+            if funding is not None:
+                b = funding_adjusted_bps(b, funding.rate(sym, closed[2]), p.funding_horizon)
+            if loops[sym].open_flag or b > hi or b < lo:
+                on_prices(
+                    spot,
+                    fut,
+                    args,
+                    params[sym],
+                    loops[sym],
+                    *closed,
+                    executor,
+                    sizers[sym],
+                    funding,
+                )
+
+        time.sleep(interval)
 
-        time.sleep(p.interval)
+
+async def run_loop_async(args, p: Params):
+    """두 레그 가격을 동시에 요청해 틱 지연을 줄이고 같은 시점의 값으로 베이시스를 계산합니다."""
+    spot, fut = prepare_clients(args, p)
+    aspot = AsyncBinanceClient(client=spot)
+    afut = AsyncBinanceFuturesClient(client=fut)
+    ls = load_loop_state(open_state_journal(p.symbol), p.symbol, args.clear_review)
+    executor = build_executor(p)
+    recorder = build_recorder(args)
+    bars = build_bars(args)
+    sizer = build_sizer(args, p, spot, fut)
+    funding = build_funding(p, fut)
+    interval = tick_interval(
+        p,
+        spot,
+        fut,
+        spot_weight("GET", "/api/v3/ticker/price", {"symbol": p.symbol}),
+        futures_weight("GET", "/fapi/v1/premiumIndex", {"symbol": p.symbol}),
+    )
+
+    while True:
+        t0 = time.time()
+        try:
+            with timed(STAGE_FETCH):
+                s_price, pi = await asyncio.gather(aspot.get_price(p.symbol), afut.get_premium_index(p.symbol))
+            f_mark = pi.mark_price
+            if funding is not None:
+                funding.update(pi)
+        except (BinanceAPIError, BinanceFuturesAPIError) as e:
+            print(f"data error: {e}")
+            await asyncio.sleep(data_error_backoff(e, p))
+            continue
+        # 두 응답의 공통 타임스탬프: 요청 구간의 중앙값
+        ts_ms = int((t0 + time.time()) / 2 * 1000)
+        if recorder is not None:
+            recorder.append(p.symbol, ts_ms, s_price, f_mark, compute_basis_bps(s_price, f_mark))
+
+        # 주문은 동기 호출 (이 루프에서 다른 작업이 없으므로 블로킹되어도 무방)
+        closed = bar_close(bars, s_price, f_mark, ts_ms)
+        if closed is not None:
+            on_prices(spot, fut, args, p, ls, *closed, executor, sizer, funding)
+        await asyncio.sleep(interval)
 
 
 def main():
@@ -381,6 +1270,10 @@ def main():
     ap.add_argument("--futures-base-url", help="선물 베이스 URL 수동 지정")
 
     ap.add_argument("--symbol", default="BTCUSDT")
+    ap.add_argument(
+        "--symbols",
+        help="멀티 심볼 모드: 'BTCUSDT,ETHUSDT' 또는 'ALL'(USDT 무기한 전체). 틱당 일괄 시세 2회 요청",
+    )
     ap.add_argument(
         "--notional", type=float, default=50.0, help="스팟 측 USDT 명목가(수량 산출용)"
     )
@@ -397,13 +1290,131 @@ def main():
         help="청산 임계값(bps). 모드에 따라 부호 적용",
     )
     ap.add_argument(
-        "--interval", type=float, default=2.0, help="폴링 간격(초)"
+        "--interval",
+        type=float,
+        default=2.0,
+        help="폴링 간격(초). 0이면 요청 가중치 한도 안에서 가능한 최소 간격 자동 사용",
     )
     ap.add_argument("--leverage", type=int, default=2)
     ap.add_argument(
         "--isolated", action="store_true", help="선물 격리 마진 사용"
     )
     ap.add_argument("--dry-run", action="store_true", help="주문 미발송(시뮬레이션)")
+    ap.add_argument(
+        "--feed",
+        choices=["rest", "ws", "local"],
+        default="rest",
+        help="시세 소스: rest(폴링), ws(WebSocket 스트림) 또는 local(market_hub.py 구독). ws/local에서 --interval 은 판단 주기",
+    )
+    ap.add_argument("--hub", help="--feed local 허브 주소: 소켓 경로 또는 host:port (기본: BINANCE_HUB_ADDR 또는 /tmp/binance-market-hub.sock)")
+    ap.add_argument(
+        "--fast-endpoints",
+        action="store_true",
+        help="스팟 대체 호스트(api-gcp, api1~4 또는 --spot-hosts)를 주기적으로 프로브해 가장 빠른 정상 호스트로 요청",
+    )
+    ap.add_argument("--spot-hosts", help="스팟 대체 호스트 목록 (쉼표 구분 URL)")
+    ap.add_argument("--futures-hosts", help="선물 대체 호스트 목록 (쉼표 구분 URL)")
+    ap.add_argument(
+        "--hedge",
+        action="store_true",
+        help="시세 GET이 호스트 p95 안에 응답하지 않으면 다른 호스트(없으면 다른 연결)로 한 번 더 보내 먼저 온 응답 사용",
+    )
+    ap.add_argument(
+        "--funding-horizon",
+        type=float,
+        default=0.0,
+        metavar="N",
+        help="예상 펀딩비 N회분(bps)을 베이시스에 더해 진입/청산 판단 (premiumIndex 응답 재사용, 0이면 미사용)",
+    )
+    ap.add_argument(
+        "--signal-bar",
+        choices=list(TIMEFRAMES),
+        help="틱 대신 이 주기의 봉(candles.py)이 닫힐 때 봉 종가로 진입/청산 판단",
+    )
+    ap.add_argument(
+        "--clear-review",
+        action="store_true",
+        help="체결 여부 불명/되돌리기 실패로 거래를 멈춘 심볼의 review 표시를 지우고 재개 (포지션을 직접 확인한 뒤 사용)",
+    )
+    ap.add_argument(
+        "--event-driven",
+        action="store_true",
+        help="고정 주기 대신 스팟/마크 갱신이 도착할 때마다 판단 (단일 심볼; --interval 은 rest 폴링 주기)",
+    )
+    ap.add_argument(
+        "--debounce-ms",
+        type=float,
+        default=50.0,
+        help="--event-driven 판단 최소 간격(ms). 그 사이 갱신은 최신 값 하나로 합쳐 창이 끝날 때 판단",
+    )
+    ap.add_argument(
+        "--reentry-delay",
+        type=float,
+        default=0.0,
+        help="청산 후 다음 진입까지 최소 대기(초). 갱신마다 판단할 때 청산 직후 재진입 반복 방지",
+    )
+    ap.add_argument(
+        "--book",
+        action="store_true",
+        help="로컬 오더북(@depth@100ms) 유지 및 호가/깊이 로그 출력",
+    )
+    ap.add_argument(
+        "--depth-sizing",
+        action="store_true",
+        help="진입 전 양쪽 호가를 걸어 VWAP·수수료 반영 후에도 entry-bps를 넘는 최대 수량으로 진입 (--notional 이 상한)",
+    )
+    ap.add_argument("--depth-limit", type=int, default=100, help="--depth-sizing 이 읽는 호가 레벨 수")
+    ap.add_argument("--spot-fee-bps", type=float, default=10.0, help="--depth-sizing 스팟 체결 수수료(bps)")
+    ap.add_argument("--futures-fee-bps", type=float, default=5.0, help="--depth-sizing 선물 체결 수수료(bps)")
+    ap.add_argument(
+        "--time-sync-interval",
+        type=float,
+        default=60.0,
+        help="서버 시계 재동기화 주기(초). 서명 요청 timestamp를 보정하고 품질이 좋으면 recvWindow를 줄임 (0: 로컬 시계 사용)",
+    )
+    ap.add_argument(
+        "--metrics-port",
+        type=int,
+        help="127.0.0.1:<port>/metrics 에 Prometheus 텍스트 메트릭 제공 (요청 단계별 지연, 루프 단계, 에러 코드)",
+    )
+    ap.add_argument(
+        "--record",
+        metavar="DIR",
+        help="틱(ts, spot, mark, basis)을 DIR/<SYMBOL>/ 아래 열 지향 세그먼트 파일로 기록",
+    )
+    ap.add_argument("--ws-base-url", help="스팟 WebSocket 베이스 URL 수동 지정")
+    ap.add_argument("--futures-ws-base-url", help="선물 WebSocket 베이스 URL 수동 지정")
+    ap.add_argument(
+        "--ws-orders",
+        action="store_true",
+        help="주문/취소를 WebSocket API(order.place/order.cancel) 세션으로 전송 (연결 끊김 시 REST)",
+    )
+    ap.add_argument("--ws-api-url", help="스팟 WebSocket API URL 수동 지정")
+    ap.add_argument("--futures-ws-api-url", help="선물 WebSocket API URL 수동 지정")
+    ap.add_argument(
+        "--user-stream",
+        action="store_true",
+        help="listenKey user data stream으로 잔고/포지션/주문 상태를 메모리에 유지 (실거래 모드 전용)",
+    )
+    ap.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="asyncio 모드: 스팟/선물 가격을 동시에 요청 (--feed rest 전용)",
+    )
+    ap.add_argument(
+        "--exec",
+        dest="exec_mode",
+        choices=["sequential", "concurrent"],
+        default="sequential",
+        help="두 레그 주문 방식: sequential(순차) 또는 concurrent(동시 전송)",
+    )
+    ap.add_argument(
+        "--leg-retries",
+        type=int,
+        default=1,
+        help="거절된 레그 즉시 재전송 횟수 (그래도 실패하면 성공한 레그를 되돌림)",
+    )
     ap.add_argument(
         "--mode",
         choices=["carry", "reverse", "auto"],
@@ -428,9 +1439,22 @@ def main():
         leverage=args.leverage,
         isolated=args.isolated,
         dry_run=args.dry_run,
+        exec_mode=args.exec_mode,
+        leg_retries=args.leg_retries,
+        funding_horizon=args.funding_horizon,
+        reentry_delay=args.reentry_delay,
     )
 
-    run_loop(args, params)
+    if args.symbols and args.event_driven:
+        raise SystemExit("--event-driven is single-symbol only; use --symbol instead of --symbols")
+    if args.symbols:
+        run_multi_loop(args, params)
+    elif args.event_driven:
+        run_event_loop(args, params)
+    elif args.use_async and args.feed == "rest":
+        asyncio.run(run_loop_async(args, params))
+    else:
+        run_loop(args, params)
 
 
 if __name__ == "__main__":
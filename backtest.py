@@ -0,0 +1,215 @@
+﻿import os
+import csv
+import time
+import argparse
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from itertools import compress, repeat
+from operator import gt, lt, mul, sub, truediv
+
+from arb_runner import entry_direction
+from tick_recorder import read_columns
+
+
+@dataclass
+class Trade:
+    direction: str  # "carry" 또는 "reverse"
+    entry_i: int
+    exit_i: int
+    entry_ts_ms: int
+    exit_ts_ms: int
+    entry_bps: float
+    exit_bps: float
+    qty: float
+    pnl: float  # 수수료 차감 전 (USDT)
+    fees: float
+    open: bool = False  # 데이터 끝까지 청산되지 않음 (마지막 틱 가격으로 평가)
+
+    @property
+    def net(self) -> float:
+        return self.pnl - self.fees
+
+    @property
+    def held_ms(self) -> int:
+        return self.exit_ts_ms - self.entry_ts_ms
+
+
+@dataclass
+class BacktestResult:
+    mode: str
+    entry_bps: float
+    exit_bps: float
+    ticks: int
+    span_ms: int
+    trades: list[Trade] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def gross(self) -> float:
+        return sum(t.pnl for t in self.trades)
+
+    @property
+    def fees(self) -> float:
+        return sum(t.fees for t in self.trades)
+
+    @property
+    def net(self) -> float:
+        return self.gross - self.fees
+
+    @property
+    def time_in_position_ms(self) -> int:
+        return sum(t.held_ms for t in self.trades)
+
+    def summary(self) -> str:
+        wins = sum(1 for t in self.trades if t.net > 0)
+        pct = self.time_in_position_ms / self.span_ms * 100 if self.span_ms else 0.0
+        return (
+            f"mode={self.mode} entry={self.entry_bps:g} exit={self.exit_bps:g} ticks={self.ticks} "
+            f"trades={len(self.trades)} wins={wins} gross={self.gross:.4f} fees={self.fees:.4f} "
+            f"net={self.net:.4f} in_position={pct:.1f}% ({self.elapsed * 1000:.1f}ms)"
+        )
+
+
+def load_series_csv(path: str) -> tuple[array, array, array]:
+    """ts_ms,spot,mark 열을 가진 CSV(헤더 필수)를 (ts_ms, spot, mark) 배열로 읽습니다. spot<=0 행은 건너뜁니다."""
+    ts, spot, mark = array("q"), array("d"), array("d")
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            s = float(row["spot"])
+            if s <= 0:
+                continue
+            ts.append(int(float(row["ts_ms"])))
+            spot.append(s)
+            mark.append(float(row["mark"]))
+    return ts, spot, mark
+
+
+def _next_index(indices: list[int], start: int) -> int | None:
+    k = bisect_left(indices, start)
+    return indices[k] if k < len(indices) else None
+
+
+class Backtester:
+    """
+    기록된 스팟/마크 시계열을 라이브 러너와 같은 진입/청산 규칙(entry_direction / should_exit 와 같은 부등호)으로 재생합니다.\n\n    틱마다 상태를 갱신하는 대신, 베이시스 배열에서 진입/청산 후보 인덱스 목록을 한 번에 뽑고\n    bisect로 "다음 진입 → 그 이후 첫 청산"을 건너뛰며 진행하므로 비용은 O(틱 수 + 거래 수·log 틱 수)입니다.\n    reverse 방향은 스팟 재고가 충분하다고 가정합니다 (라이브에서는 잔고만큼만 매도).
+    """
+
+    def __init__(self, ts_ms: array, spot: array, mark: array):
+        if not (len(ts_ms) == len(spot) == len(mark)):
+            raise ValueError("series length mismatch")
+        # 가격이 0 이하인 행(기록 누락 등)은 베이시스/수량 계산에서 0으로 나누게 되므로 건너뜀
+        if min(spot, default=1.0) <= 0 or min(mark, default=1.0) <= 0:
+            valid = [s > 0 and m > 0 for s, m in zip(spot, mark)]
+            self.skipped = len(valid) - sum(valid)
+            ts_ms = array(ts_ms.typecode, compress(ts_ms, valid))
+            spot = array("d", compress(spot, valid))
+            mark = array("d", compress(mark, valid))
+        else:
+            self.skipped = 0
+        self.ts_ms = ts_ms
+        self.spot = spot
+        self.mark = mark
+        # compute_basis_bps 와 같은 연산 순서: (m - s) / s * 10000
+        self.basis = array("d", map(mul, map(truediv, map(sub, mark, spot), spot), repeat(10000.0)))
+
+    def _indices(self, op, threshold: float) -> list[int]:
+        return list(compress(range(len(self.basis)), map(op, self.basis, repeat(threshold))))
+
+    def run(
+        self,
+        mode: str = "carry",
+        entry_bps: float = 2.0,
+        exit_bps: float = 0.2,
+        notional: float = 50.0,
+        spot_fee_bps: float = 10.0,
+        futures_fee_bps: float = 5.0,
+    ) -> BacktestResult:
+        t0 = time.perf_counter()
+        n = len(self.basis)
+        res = BacktestResult(mode, entry_bps, exit_bps, n, (self.ts_ms[-1] - self.ts_ms[0]) if n else 0)
+        if n == 0:
+            return res
+        use_carry = mode in ("carry", "auto")
+        use_reverse = mode in ("reverse", "auto")
+        entries = {
+            "carry": self._indices(gt, entry_bps) if use_carry else [],
+            "reverse": self._indices(lt, -entry_bps) if use_reverse else [],
+        }
+        exits = {
+            "carry": self._indices(lt, exit_bps) if use_carry else [],
+            "reverse": self._indices(gt, -exit_bps) if use_reverse else [],
+        }
+        sf, ff = spot_fee_bps / 10000.0, futures_fee_bps / 10000.0
+        spot, mark, basis, ts = self.spot, self.mark, self.basis, self.ts_ms
+
+        pos = 0
+        while pos < n:
+            nxt = (_next_index(entries["carry"], pos), _next_index(entries["reverse"], pos))
+            cands = [i for i in nxt if i is not None]
+            if not cands:
+                break
+            i = min(cands)
+            direction = entry_direction(mode, basis[i], entry_bps)
+            j = _next_index(exits[direction], i + 1)
+            still_open = j is None
+            if still_open:
+                j = n - 1
+            qty = notional / spot[i]
+            if direction == "carry":  # 스팟 매수 + 선물 숏
+                pnl = qty * (spot[j] - spot[i]) + qty * (mark[i] - mark[j])
+            else:  # 스팟 매도 + 선물 롱
+                pnl = qty * (spot[i] - spot[j]) + qty * (mark[j] - mark[i])
+            fees = qty * (spot[i] * sf + mark[i] * ff)
+            if not still_open:  # 미청산 포지션은 청산 수수료가 아직 없음
+                fees += qty * (spot[j] * sf + mark[j] * ff)
+            res.trades.append(
+                Trade(direction, i, j, ts[i], ts[j], basis[i], basis[j], qty, pnl, fees, open=still_open)
+            )
+            pos = j + 1
+        res.elapsed = time.perf_counter() - t0
+        return res
+
+
+def _floats(spec: str) -> list[float]:
+    return [float(x) for x in spec.split(",") if x.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="현·선물 베이시스 전략 백테스트 (기록된 spot/mark 시계열 재생)")
+    ap.add_argument("csv", help="ts_ms,spot,mark 열을 가진 CSV 파일 또는 틱 레코더(--record) 디렉터리")
+    ap.add_argument("--symbol", default="BTCUSDT", help="틱 레코더 디렉터리에서 읽을 심볼")
+    ap.add_argument("--mode", choices=["carry", "reverse", "auto"], default="carry")
+    ap.add_argument("--entry-bps", default="2.0", help="진입 임계값(bps). 쉼표로 여러 값을 주면 조합별로 실행")
+    ap.add_argument("--exit-bps", default="0.2", help="청산 임계값(bps). 쉼표로 여러 값 가능")
+    ap.add_argument("--notional", type=float, default=50.0, help="거래당 스팟 측 USDT 명목가")
+    ap.add_argument("--spot-fee-bps", type=float, default=10.0, help="스팟 체결 수수료(bps, 한 번 체결 기준)")
+    ap.add_argument("--futures-fee-bps", type=float, default=5.0, help="선물 체결 수수료(bps, 한 번 체결 기준)")
+    ap.add_argument("--trades", action="store_true", help="개별 거래 내역 출력")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if os.path.isdir(args.csv):
+        cols = read_columns(args.csv, args.symbol)
+        bt = Backtester(cols["ts_ms"], cols["spot"], cols["mark"])
+    else:
+        bt = Backtester(*load_series_csv(args.csv))
+    print(f"loaded {len(bt.basis)} ticks in {time.perf_counter() - t0:.2f}s")
+    if bt.skipped:
+        print(f"skipped {bt.skipped} rows with non-positive prices")
+
+    for entry in _floats(args.entry_bps):
+        for exit_ in _floats(args.exit_bps):
+            res = bt.run(args.mode, entry, exit_, args.notional, args.spot_fee_bps, args.futures_fee_bps)
+            print(res.summary())
+            if args.trades:
+                for t in res.trades:
+                    print(
+                        f"  {t.direction} {t.entry_ts_ms}->{t.exit_ts_ms} basis {t.entry_bps:.2f}->{t.exit_bps:.2f} "
+                        f"qty={t.qty:.6f} pnl={t.pnl:.4f} fees={t.fees:.4f} net={t.net:.4f}{' (open)' if t.open else ''}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+﻿import hmac
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+def _filters(tick: str, step: str, min_notional: str, futures: bool) -> list[dict]:
+    out = [
+        {"filterType": "PRICE_FILTER", "minPrice": tick, "maxPrice": "1000000", "tickSize": tick},
+        {"filterType": "LOT_SIZE", "minQty": step, "maxQty": "9000", "stepSize": step},
+    ]
+    if futures:
+        out.append({"filterType": "MIN_NOTIONAL", "notional": min_notional})
+    else:
+        out.append({"filterType": "NOTIONAL", "minNotional": min_notional})
+    return out
+
+
+class MockExchange:
+    """
+    벤치마크용 가짜 거래소 상태입니다. 심볼별 스팟 가격 랜덤워크 + 고정 베이시스, 주문 번호, 잔고를 가집니다.\n    secret을 주면 서명(HMAC SHA256)을 실제로 검증해 서버 쪽 비용도 실제와 비슷하게 만듭니다.
+    """
+
+    def __init__(
+        self,
+        symbols: tuple = ("BTCUSDT", "ETHUSDT"),
+        start_price: float = 60000.0,
+        basis_bps: float = 3.0,
+        vol_bps: float = 0.5,
+        depth_levels: int = 100,
+        secret: str = "",
+    ):
+        self.prices = {s: start_price / (20 ** i) for i, s in enumerate(symbols)}
+        self.basis = basis_bps / 10000.0
+        self.vol = vol_bps / 10000.0
+        self.depth_levels = depth_levels
+        self.secret = secret.encode("utf-8")
+        self._order_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def price(self, symbol: str) -> float:
+        with self._lock:
+            p = self.prices[symbol] * (1 + random.gauss(0, self.vol))
+            self.prices[symbol] = p
+            return p
+
+    def mark(self, symbol: str) -> float:
+        return self.prices[symbol] * (1 + self.basis)
+
+    def exchange_info(self, futures: bool) -> dict:
+        syms = []
+        for s in self.prices:
+            info = {
+                "symbol": s,
+                "status": "TRADING",
+                "baseAsset": s[:-4],
+                "quoteAsset": "USDT",
+                "filters": _filters("0.01", "0.001" if futures else "0.00001", "5", futures),
+            }
+            if futures:
+                info["contractType"] = "PERPETUAL"
+            syms.append(info)
+        return {"timezone": "UTC", "serverTime": int(time.time() * 1000), "symbols": syms}
+
+    def depth(self, symbol: str, limit: int) -> dict:
+        mid = self.prices[symbol]
+        n = min(limit, self.depth_levels)
+        return {
+            "lastUpdateId": next(self._order_ids),
+            "bids": [[f"{mid - 0.5 - i * 0.5:.2f}", "0.50000"] for i in range(n)],
+            "asks": [[f"{mid + 0.5 + i * 0.5:.2f}", "0.50000"] for i in range(n)],
+        }
+
+    def order(self, params: dict, test: bool) -> dict:
+        if test:
+            return {}
+        symbol = params.get("symbol", "")
+        qty = params.get("quantity", "0")
+        price = self.prices.get(symbol, 0.0)
+        return {
+            "symbol": symbol,
+            "orderId": next(self._order_ids),
+            "clientOrderId": params.get("newClientOrderId", ""),
+            "transactTime": int(time.time() * 1000),
+            "side": params.get("side"),
+            "type": params.get("type"),
+            "status": "FILLED",
+            "origQty": qty,
+            "executedQty": qty,
+            "cummulativeQuoteQty": f"{float(qty) * price:.8f}",
+            "avgPrice": f"{price:.2f}",
+        }
+
+    def check_signature(self, query: str) -> bool:
+        if not self.secret:
+            return True
+        body, sep, sig = query.rpartition("&signature=")
+        if not sep:
+            return False
+        return hmac.compare_digest(hmac.new(self.secret, body.encode("utf-8"), hashlib.sha256).hexdigest(), sig)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: 클라이언트 연결 풀 재사용
+    # 헤더/본문을 따로 write하므로 Nagle을 끄지 않으면 지연 ACK(~40ms)가 측정값을 덮어버림
+    disable_nagle_algorithm = True
+    exchange: MockExchange
+    latency = 0.0
+    jitter = 0.0
+
+    def _send(self, obj, status: int = 200) -> None:
+        body = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, code: int, msg: str) -> None:
+        self._send({"code": code, "msg": msg}, status)
+
+    def _handle(self) -> None:
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        u = urlsplit(self.path)
+        query = u.query
+        n = int(self.headers.get("Content-Length") or 0)
+        if n:
+            query = self.rfile.read(n).decode("utf-8")
+        params = dict(parse_qsl(query))
+        if "signature" in params and not self.exchange.check_signature(query):
+            self._error(400, -1022, "Signature for this request is not valid.")
+            return
+        try:
+            self._route(self.command, u.path, params)
+        except KeyError as e:
+            self._error(400, -1121, f"Invalid symbol. {e}")
+
+    def _route(self, method: str, path: str, params: dict) -> None:
+        ex = self.exchange
+        futures = path.startswith("/fapi")
+        sym = params.get("symbol")
+        if path in ("/api/v3/ticker/price", "/fapi/v1/ticker/price"):
+            if sym:
+                self._send({"symbol": sym, "price": f"{ex.price(sym):.2f}"})
+            else:
+                self._send([{"symbol": s, "price": f"{ex.price(s):.2f}"} for s in ex.prices])
+        elif path == "/fapi/v1/premiumIndex":
+            now = int(time.time() * 1000)
+
+            def one(s: str) -> dict:
+                return {
+                    "symbol": s,
+                    "markPrice": f"{ex.mark(s):.2f}",
+                    "indexPrice": f"{ex.prices[s]:.2f}",
+                    "lastFundingRate": "0.00010000",
+                    "nextFundingTime": (now // 28_800_000 + 1) * 28_800_000,
+                    "interestRate": "0.00010000",
+                    "time": now,
+                }
+
+            self._send(one(sym) if sym else [one(s) for s in ex.prices])
+        elif path in ("/api/v3/depth", "/fapi/v1/depth"):
+            self._send(ex.depth(sym, int(params.get("limit", 100))))
+        elif path in ("/api/v3/exchangeInfo", "/fapi/v1/exchangeInfo"):
+            self._send(ex.exchange_info(futures))
+        elif path in ("/api/v3/time", "/fapi/v1/time"):
+            self._send({"serverTime": int(time.time() * 1000)})
+        elif path in ("/api/v3/ping", "/fapi/v1/ping"):
+            self._send({})
+        elif path in ("/api/v3/order", "/api/v3/order/test", "/fapi/v1/order") and method == "POST":
+            self._send(ex.order(params, test=path.endswith("/test")))
+        elif path == "/api/v3/account":
+            self._send(
+                {
+                    "balances": [{"asset": s[:-4], "free": "1.00000000", "locked": "0"} for s in ex.prices]
+                    + [{"asset": "USDT", "free": "100000.00", "locked": "0"}]
+                }
+            )
+        elif path == "/fapi/v2/account":
+            self._send(
+                {
+                    "availableBalance": "100000.00",
+                    "positions": [{"symbol": s, "positionAmt": "0", "entryPrice": "0"} for s in ex.prices],
+                }
+            )
+        elif path == "/fapi/v2/balance":
+            self._send([{"asset": "USDT", "balance": "100000.00", "availableBalance": "100000.00"}])
+        elif path in ("/fapi/v1/leverage", "/fapi/v1/marginType"):
+            self._send({"code": 200, "msg": "success", "symbol": sym, "leverage": params.get("leverage")})
+        elif path in ("/api/v3/userDataStream", "/fapi/v1/listenKey"):
+            self._send({"listenKey": "mock-listen-key"} if method == "POST" else {})
+        else:
+            self._error(404, -1000, f"unknown endpoint {method} {path}")
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, exchange: MockExchange, latency_ms: float, jitter_ms: float):
+        handler = type(
+            "MockHandler",
+            (_Handler,),
+            {"exchange": exchange, "latency": latency_ms / 1000.0, "jitter": jitter_ms / 1000.0},
+        )
+        super().__init__((host, port), handler)
+        self.exchange = exchange
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    **kwargs,
+) -> MockServer:
+    """백그라운드 스레드에서 스팟(/api/v3)과 선물(/fapi) 엔드포인트를 한 포트로 제공합니다."""
+    srv = MockServer(host, port, MockExchange(**kwargs), latency_ms, jitter_ms)
+    threading.Thread(target=srv.serve_forever, name="bench-mock", daemon=True).start()
+    return srv
+
+
+def main():
+    ap = argparse.ArgumentParser(description="벤치마크용 로컬 바이낸스 REST 모의 서버")
+    ap.add_argument("--port", type=int, default=18080)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="응답마다 추가할 고정 지연(ms)")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="0~jitter 범위 균등 분포 추가 지연(ms)")
+    ap.add_argument("--secret", default="", help="지정하면 서명을 이 secret으로 검증")
+    args = ap.parse_args()
+    srv = start_mock(port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, secret=args.secret)
+    print(f"mock binance REST on {srv.base_url} (spot /api/v3, futures /fapi)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+﻿import io
+import hmac
+import os
+import sys
+import json
+import hashlib
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from arb_runner import LoopState, Params, close_pair, load_loop_state, on_prices, open_pair
+from binance_client import BinanceClient
+from binance_futures_client import BinanceFuturesClient
+from bench.mock_server import start_mock
+from pair_executor import PairExecutor
+from rate_limit import RateLimiter
+from request_signer import Ed25519Signer, HmacSigner, RsaSigner, encode_query
+from state_journal import StateJournal
+
+SCHEMA = 1
+BENCH_KEY = "bench-key"
+BENCH_SECRET = "bench-secret"
+
+
+def summarize(samples: list[float], wall: float | None = None) -> dict:
+    """지연 샘플(초) 목록의 요약. 값은 ms 단위, ops_per_sec는 wall(없으면 샘플 합) 기준."""
+    xs = sorted(samples)
+    n = len(xs)
+    if n == 0:
+        return {"n": 0}
+
+    def pct(q: float) -> float:
+        return xs[min(n - 1, int(q * n))] * 1000.0
+
+    total = wall if wall is not None else sum(xs)
+    return {
+        "n": n,
+        "mean_ms": sum(xs) / n * 1000.0,
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "max_ms": xs[-1] * 1000.0,
+        "ops_per_sec": n / total if total > 0 else 0.0,
+    }
+
+
+def _timed_calls(fn, n: int) -> list[float]:
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def build_clients(base_url: str, pool_size: int) -> tuple[BinanceClient, BinanceFuturesClient]:
+    # 벤치마크는 로컬 서버 대상이므로 가중치 한도가 측정을 막지 않게 사실상 무제한으로 둠
+    spot = BinanceClient(
+        BENCH_KEY,
+        BENCH_SECRET,
+        base_url=base_url,
+        pool_size=pool_size,
+        rate_limiter=RateLimiter(weight_limit=10**9, order_limit_10s=10**9),
+    )
+    fut = BinanceFuturesClient(
+        BENCH_KEY,
+        BENCH_SECRET,
+        base_url=base_url,
+        pool_size=pool_size,
+        rate_limiter=RateLimiter(weight_limit=10**9, order_limit_10s=10**9),
+    )
+    for c in (spot, fut):
+        c.symbols.load()
+    return spot, fut
+
+
+# ---------- 개별 벤치마크 ----------
+def bench_throughput(spot: BinanceClient, symbol: str, n: int, threads: int) -> dict:
+    """GET ticker/price: 순차 지연과 threads개 동시 요청 처리량."""
+    seq = _timed_calls(lambda: spot.get_price(symbol), n)
+    out = {"sequential": summarize(seq)}
+    if threads > 1:
+        per = max(1, n // threads)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            parts = list(pool.map(lambda _: _timed_calls(lambda: spot.get_price(symbol), per), range(threads)))
+        wall = time.perf_counter() - t0
+        out[f"concurrent_{threads}"] = summarize([x for part in parts for x in part], wall)
+    return out
+
+
+def _per_op(fn, n: int) -> dict:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    wall = time.perf_counter() - t0
+    return {"n": n, "us_per_op": wall / n * 1e6, "ops_per_sec": n / wall}
+
+
+def _key_signers() -> dict:
+    """cryptography가 있으면 메모리에서 만든 Ed25519/RSA(2048) 키 서명기, 없으면 빈 dict."""
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+    except ImportError:
+        return {}
+    return {
+        "ed25519": Ed25519Signer(ed25519.Ed25519PrivateKey.generate()),
+        "rsa": RsaSigner(rsa.generate_private_key(public_exponent=65537, key_size=2048)),
+    }
+
+
+def bench_signing(symbol: str, n: int) -> dict:
+    """주문 한 건 분량 파라미터의 인코딩+서명 비용 (네트워크 없음). hmac_legacy는 매번 키로 HMAC을 새로 만들고 두 번 인코딩하던 이전 방식."""
+    params = {
+        "symbol": symbol,
+        "side": "BUY",
+        "type": "MARKET",
+        "quantity": 0.001,
+        "recvWindow": 5000,
+        "timestamp": int(time.time() * 1000),
+    }
+    secret = BENCH_SECRET
+
+    def legacy():
+        sig = hmac.new(secret.encode("utf-8"), urlencode(params, doseq=True).encode("utf-8"), hashlib.sha256).hexdigest()
+        return urlencode({**params, "signature": sig}, doseq=True)
+
+    def fast(signer):
+        def one():
+            query = encode_query(params)
+            return f"{query}&signature={signer.sign(query)}"
+
+        return one
+
+    out = {"hmac_legacy": _per_op(legacy, n), "hmac": _per_op(fast(HmacSigner(secret)), n)}
+    for name, signer in _key_signers().items():
+        # 비대칭 서명은 수백 배 느리므로 반복 수를 줄임
+        out[name] = _per_op(fast(signer), max(1, n // 20))
+    return out
+
+
+def bench_loop_iteration(spot: BinanceClient, fut: BinanceFuturesClient, symbol: str, n: int, workdir: str) -> dict:
+    """run_loop 한 바퀴(두 가격 조회 + on_prices 판단/상태 기록, dry-run)에서 sleep을 뺀 지연."""
+    p = Params(symbol, 100.0, 2.0, 0.2, 0.0, 1, True, True)
+    args = argparse.Namespace(mode="carry")
+    journal = StateJournal(os.path.join(workdir, "bench_state.journal"))
+    ls: LoopState = load_loop_state(journal, symbol)
+
+    def one():
+        s_price = spot.get_price(symbol)
+        f_mark = fut.get_mark_price(symbol)
+        on_prices(spot, fut, args, p, ls, s_price, f_mark, int(time.time() * 1000))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        samples = _timed_calls(one, n)
+    journal.close()
+    return summarize(samples)
+
+
+def bench_orders(spot: BinanceClient, fut: BinanceFuturesClient, symbol: str, n: int, price: float) -> dict:
+    """단일 주문 왕복과 두 레그 진입/청산(PairExecutor 순차/동시) 왕복."""
+    qty = spot.clamp_quantity(symbol, 100.0 / price)
+    out = {
+        "spot_order": summarize(
+            _timed_calls(lambda: spot.place_order(symbol=symbol, side="BUY", type="MARKET", quantity=qty), n)
+        ),
+        "futures_order": summarize(
+            _timed_calls(lambda: fut.place_order(symbol=symbol, side="SELL", type="MARKET", quantity=qty), n)
+        ),
+    }
+    for mode in ("sequential", "concurrent"):
+        executor = PairExecutor(concurrent=mode == "concurrent")
+        samples = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(n):
+                t0 = time.perf_counter()
+                open_pair(spot, fut, symbol, qty, price=price, executor=executor)
+                close_pair(spot, fut, symbol, qty, executor=executor)
+                samples.append(time.perf_counter() - t0)
+        out[f"pair_open_close_{mode}"] = summarize(samples)
+    return out
+
+
+# ---------- 결과/비교 ----------
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _flatten(results: dict, prefix: str = "") -> dict[str, dict]:
+    """{"a": {"b": {..p50_ms..}}} → {"a.b": {...}} (비교용)."""
+    out = {}
+    for k, v in results.items():
+        if not isinstance(v, dict):
+            continue
+        name = f"{prefix}{k}"
+        if "p50_ms" in v or "us_per_op" in v:
+            out[name] = v
+        else:
+            out.update(_flatten(v, name + "."))
+    return out
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """기준 결과 대비 p50(서명은 us_per_op)이 tolerance 비율 이상 느려진 항목 목록."""
+    regressions = []
+    cur, base = _flatten(current["results"]), _flatten(baseline.get("results", {}))
+    for name, b in base.items():
+        c = cur.get(name)
+        if c is None:
+            continue
+        key = "p50_ms" if "p50_ms" in b else "us_per_op"
+        if key not in c or not b[key]:
+            continue
+        ratio = c[key] / b[key]
+        line = f"{name}: {key} {b[key]:.4f} -> {c[key]:.4f} ({(ratio - 1) * 100:+.1f}%)"
+        print(line, file=sys.stderr)
+        if ratio > 1 + tolerance:
+            regressions.append(line)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="클라이언트/러너 성능 벤치마크 (로컬 모의 REST 서버 대상, 결과는 JSON)")
+    ap.add_argument("--url", help="이미 실행 중인 모의 서버 주소 (없으면 프로세스 내에서 시작)")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="내장 모의 서버 응답 지연(ms)")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="내장 모의 서버 지연 지터(ms)")
+    ap.add_argument("--symbol", default="BTCUSDT")
+    ap.add_argument("-n", "--requests", type=int, default=500, help="요청 벤치마크 반복 수")
+    ap.add_argument("--threads", type=int, default=4, help="동시 처리량 측정 스레드 수 (연결 풀 크기와 같게)")
+    ap.add_argument("--sign-iterations", type=int, default=20000)
+    ap.add_argument("--loop-iterations", type=int, default=200)
+    ap.add_argument("--order-iterations", type=int, default=100)
+    ap.add_argument(
+        "--only",
+        default="throughput,signing,loop,orders",
+        help="실행할 벤치마크 (쉼표 구분: throughput,signing,loop,orders)",
+    )
+    ap.add_argument("-o", "--output", help="결과 JSON 파일 (기본: stdout)")
+    ap.add_argument("--baseline", help="이전 결과 JSON과 비교해 회귀를 stderr로 보고")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="회귀로 볼 느려짐 비율 (기본 0.2 = 20%%)")
+    args = ap.parse_args()
+
+    srv = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        srv = start_mock(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, secret=BENCH_SECRET)
+        base_url = srv.base_url
+    spot, fut = build_clients(base_url, args.threads)
+    only = {x.strip() for x in args.only.split(",") if x.strip()}
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        if "throughput" in only:
+            results["throughput"] = bench_throughput(spot, args.symbol, args.requests, args.threads)
+        if "signing" in only:
+            results["signing"] = bench_signing(args.symbol, args.sign_iterations)
+        if "loop" in only:
+            results["loop_iteration"] = bench_loop_iteration(spot, fut, args.symbol, args.loop_iterations, workdir)
+        if "orders" in only:
+            price = spot.get_price(args.symbol)
+            results["orders"] = bench_orders(spot, fut, args.symbol, args.order_iterations, price)
+
+    report = {
+        "schema": SCHEMA,
+        "timestamp": int(time.time()),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "url": args.url or "in-process",
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "symbol": args.symbol,
+            "requests": args.requests,
+            "threads": args.threads,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    spot.close()
+    fut.close()
+    if srv is not None:
+        srv.shutdown()
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
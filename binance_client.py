@@ -1,10 +1,12 @@
 ﻿import time
-import hmac
-import hashlib
+import asyncio
 import json
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
+
+from http_transport import HTTPTransport
+from metrics import API_ERRORS_TOTAL, HTTP_PHASE_SECONDS
+from rate_limit import PRIORITY_ACCOUNT, PRIORITY_MARKET, PRIORITY_ORDER, RateLimiter, spot_weight
+from request_signer import build_signer, encode_query
+from symbol_registry import SymbolRegistry
 
 
 class BinanceAPIError(Exception):
@@ -20,81 +22,162 @@ class BinanceClient:
     외부 의존성 없이 동작하는 최소한의 바이낸스 스팟 REST 클라이언트입니다.\n\n    제공 기능:\n      - 공개: 티커 가격, 오더북\n      - 서명(개인): 계정 잔고 조회, 주문(테스트 주문 포함)\n\n    개인(서명) 엔드포인트는 API Key/Secret과 HMAC SHA256 서명이 필요합니다.
     """
 
-    def __init__(self, api_key=None, api_secret=None, base_url="https://api.binance.com", recv_window=5000, timeout=10):
+    def __init__(
+        self,
+        api_key=None,
+        api_secret=None,
+        base_url="https://api.binance.com",
+        recv_window=5000,
+        timeout=10,
+        transport=None,
+        pool_size=4,
+        symbols_ttl=3600.0,
+        rate_limiter=None,
+        signer=None,
+        time_sync=None,
+    ):
         self.api_key = api_key or ""
         self.api_secret = api_secret or ""
+        # signer.sign(query) -> 쿼리에 바로 붙일 서명 문자열 (HMAC 기본, Ed25519/RSA 키는 request_signer 참고)
+        self.signer = signer or build_signer(self.api_secret)
+        # time_sync: TimeSync (서버 시계 보정). 없으면 로컬 시계와 고정 recv_window 사용
+        self.time_sync = time_sync
+        # ws_orders: order_gateway.WsApiSession. 연결돼 있으면 주문/취소를 WebSocket API로 보냄 (아니면 REST)
+        self.ws_orders = None
+        # user_stream: user_stream.UserDataStream. 준비돼 있으면 잔고/포지션 조회를 메모리 캐시에서 읽음
+        self.user_stream = None
         self.base_url = base_url.rstrip("/")
         self.recv_window = int(recv_window)
         self.timeout = timeout
+        # transport: request(method, url, body, headers, timeout) -> HTTPResponse 를 제공하는 객체
+        self.transport = transport or HTTPTransport(pool_size=pool_size)
+        # 넘겨받은 transport는 다른 클라이언트와 공유될 수 있으므로 만든 쪽이 닫음
+        self._owns_transport = transport is None
+        # 호스트(IP) 단위 가중치/주문 한도: 같은 transport를 쓰는 클라이언트끼리 공유
+        self.limiter = self.transport.register_limiter(
+            self.base_url, rate_limiter or RateLimiter(weight_limit=6000, order_limit_10s=100)
+        )
+        # exchangeInfo 필터 캐시 (최초 사용 시 전체 심볼 일괄 로드)
+        self.symbols = SymbolRegistry(self, ttl=symbols_ttl)
 
     # ---------- 저수준 HTTP 헬퍼 ----------
     def _sign(self, params: dict) -> str:
-        query = urlencode(params, doseq=True)
-        signature = hmac.new(self.api_secret.encode("utf-8"), query.encode("utf-8"), hashlib.sha256).hexdigest()
-        return signature
+        return self.signer.sign(encode_query(params))
 
-    def _request(self, method: str, path: str, params: dict | None = None, signed: bool = False):
+    def _request(self, method: str, path: str, params: dict | None = None, signed: bool = False, keyed: bool = False):
         params = params.copy() if params else {}
         headers = {
             "Content-Type": "application/x-www-form-urlencoded",
         }
 
+        if keyed and not signed:
+            # USER_STREAM 보안 유형: API Key 헤더만 필요 (서명 없음)
+            if not self.api_key:
+                raise ValueError("User stream endpoint requires api_key")
+            headers["X-MBX-APIKEY"] = self.api_key
         if signed:
-            if not self.api_key or not self.api_secret:
-                raise ValueError("Signed endpoint requires api_key and api_secret")
+            if not self.api_key or self.signer is None:
+                raise ValueError("Signed endpoint requires api_key and api_secret (or a private key)")
             headers["X-MBX-APIKEY"] = self.api_key
-            params.setdefault("recvWindow", self.recv_window)
-            params["timestamp"] = int(time.time() * 1000)
-            params["signature"] = self._sign(params)
+            ts = self.time_sync
+            params.setdefault("recvWindow", ts.recv_window(self.recv_window) if ts else self.recv_window)
+            params["timestamp"] = ts.now_ms() if ts else int(time.time() * 1000)
+
+        # 한 번 인코딩한 문자열을 그대로 서명하고 전송 (signature는 항상 마지막)
+        query = encode_query(params)
+        if signed:
+            query = f"{query}&signature={self.signer.sign(query)}"
 
         url = f"{self.base_url}{path}"
         data_bytes = None
 
         if method.upper() in ("GET", "DELETE"):
             if params:
-                url = f"{url}?{urlencode(params, doseq=True)}"
+                url = f"{url}?{query}"
         else:
             # POST/PUT 요청은 폼 바디로 전송
-            data_bytes = urlencode(params, doseq=True).encode("utf-8")
+            data_bytes = query.encode("utf-8")
 
-        req = Request(url=url, data=data_bytes, method=method.upper(), headers=headers)
+        is_order = method.upper() == "POST" and path.startswith("/api/v3/order")
+        priority = PRIORITY_ORDER if is_order else (PRIORITY_ACCOUNT if signed else PRIORITY_MARKET)
+        # 네트워크 오류는 transport가 ConnectionError로 올림 (rate limit 대기는 transport가 처리)
+        resp = self.transport.request(
+            method.upper(),
+            url,
+            body=data_bytes,
+            headers=headers,
+            timeout=self.timeout,
+            weight=spot_weight(method, path, params),
+            priority=priority,
+            is_order=is_order and path == "/api/v3/order",
+        )
 
-        try:
-            with urlopen(req, timeout=self.timeout) as resp:
-                raw = resp.read().decode("utf-8")
-                if not raw:
-                    return None
-                return json.loads(raw)
-        except HTTPError as e:
+        if resp.status >= 400:
             try:
-                payload = e.read().decode("utf-8")
+                payload = resp.body.decode("utf-8")
                 data = json.loads(payload) if payload else {}
                 code = data.get("code", "unknown")
-                msg = data.get("msg", str(e))
+                msg = data.get("msg", f"HTTP Error {resp.status}")
             except Exception:
                 code = "unknown"
-                msg = str(e)
-            raise BinanceAPIError(e.code, code, msg)
-        except URLError as e:
-            raise ConnectionError(f"Network error: {e}")
+                msg = f"HTTP Error {resp.status}"
+            API_ERRORS_TOTAL.labels("spot", code).inc()
+            if code == -1021 and self.time_sync is not None:
+                self.time_sync.invalidate()  # 다음 요청 전에 오프셋 재추정
+            raise BinanceAPIError(resp.status, code, msg)
+
+        t0 = time.perf_counter()
+        raw = resp.body.decode("utf-8")
+        if not raw:
+            return None
+        data = json.loads(raw)
+        HTTP_PHASE_SECONDS.labels(path, "parse").observe(time.perf_counter() - t0)
+        return data
+
+    def close(self) -> None:
+        if self._owns_transport:
+            self.transport.close()
 
     # ---------- 공개 엔드포인트 ----------
+    def get_server_time(self) -> int:
+        return int(self._request("GET", "/api/v3/time")["serverTime"])
+
     def get_price(self, symbol: str = "BTCUSDT") -> float:
         data = self._request("GET", "/api/v3/ticker/price", {"symbol": symbol})
         return float(data["price"])  # type: ignore[index]
 
+    def get_all_prices(self) -> dict[str, float]:
+        """전체 심볼 현재가를 한 번의 요청으로 조회합니다. {symbol: price}"""
+        data = self._request("GET", "/api/v3/ticker/price")
+        return {d["symbol"]: float(d["price"]) for d in data}
+
     def get_order_book(self, symbol: str = "BTCUSDT", limit: int = 10) -> dict:
         limit = max(5, min(int(limit), 5000))
         return self._request("GET", "/api/v3/depth", {"symbol": symbol, "limit": limit})
 
-    def get_exchange_info(self, symbol: str) -> dict:
-        return self._request("GET", "/api/v3/exchangeInfo", {"symbol": symbol})
+    def get_exchange_info(self, symbol: str | None = None) -> dict:
+        params = {"symbol": symbol} if symbol else None
+        return self._request("GET", "/api/v3/exchangeInfo", params)
 
     # ---------- 서명(프라이빗) 엔드포인트 ----------
     def get_account(self) -> dict:
         return self._request("GET", "/api/v3/account", signed=True)
 
+    # ---------- user data stream (listenKey) ----------
+    def create_listen_key(self) -> str:
+        return self._request("POST", "/api/v3/userDataStream", keyed=True)["listenKey"]
+
+    def keepalive_listen_key(self, listen_key: str) -> None:
+        self._request("PUT", "/api/v3/userDataStream", {"listenKey": listen_key}, keyed=True)
+
+    def close_listen_key(self, listen_key: str) -> None:
+        self._request("DELETE", "/api/v3/userDataStream", {"listenKey": listen_key}, keyed=True)
+
     def get_balance(self, asset: str) -> tuple[float, float]:
+        us = self.user_stream
+        if us is not None and us.ready:
+            b = us.cache.balance(asset)
+            return b["free"], b["locked"]
         acc = self.get_account()
         for b in acc.get("balances", []):
             if b.get("asset") == asset:
@@ -132,30 +215,101 @@ class BinanceClient:
         # 추가 파라미터 전달 (예: LIMIT 주문의 timeInForce, price 등)
         payload.update(extra)
 
+        if not test and self.ws_orders is not None and self.ws_orders.connected:
+            return self.ws_orders.place_order(payload)
         path = "/api/v3/order/test" if test else "/api/v3/order"
         return self._request("POST", path, payload, signed=True)
 
+    def cancel_order(self, symbol: str, order_id: int | None = None, orig_client_order_id: str | None = None) -> dict:
+        payload: dict[str, str | int] = {"symbol": symbol}
+        if order_id is not None:
+            payload["orderId"] = order_id
+        if orig_client_order_id is not None:
+            payload["origClientOrderId"] = orig_client_order_id
+        if self.ws_orders is not None and self.ws_orders.connected:
+            return self.ws_orders.cancel_order(payload)
+        return self._request("DELETE", "/api/v3/order", payload, signed=True)
+
+    def get_order(self, symbol: str, order_id: int | None = None, orig_client_order_id: str | None = None) -> dict:
+        """주문 상태 조회 (결과를 알 수 없는 주문 확인용). 없으면 BinanceAPIError(code -2013)."""
+        payload: dict[str, str | int] = {"symbol": symbol}
+        if order_id is not None:
+            payload["orderId"] = order_id
+        if orig_client_order_id is not None:
+            payload["origClientOrderId"] = orig_client_order_id
+        return self._request("GET", "/api/v3/order", payload, signed=True)
+
     # ---------- 헬퍼 ----------
     def get_symbol_filters(self, symbol: str) -> dict:
-        info = self.get_exchange_info(symbol)
-        symbols = info.get("symbols", [])
-        if not symbols:
-            return {}
-        return {f["filterType"]: f for f in symbols[0].get("filters", [])}
+        f = self.symbols.get(symbol)
+        return dict(f.raw) if f else {}
 
     def clamp_quantity(self, symbol: str, qty: float) -> float:
-        filters = self.get_symbol_filters(symbol)
-        lot = filters.get("LOT_SIZE") or {}
-        step_size = float(lot.get("stepSize", 0))
-        min_qty = float(lot.get("minQty", 0))
-        max_qty = float(lot.get("maxQty", 0)) or float("inf")
+        f = self.symbols.get(symbol)
+        if f is None:
+            return max(0.0, qty)
+        return f.clamp_quantity(qty)
+
+    def check_order(self, symbol: str, qty: float, price: float | None = None) -> str | None:
+        """LOT_SIZE/MIN_NOTIONAL 사전 검증. 문제가 있으면 사유 문자열, 없으면 None."""
+        f = self.symbols.get(symbol)
+        if f is None:
+            return f"unknown symbol {symbol}"
+        return f.check(qty, price)
+
+
+class AsyncBinanceClient:
+    """
+    BinanceClient의 asyncio 버전입니다. 메서드 구성은 동일하며 모두 코루틴입니다.
+    블로킹 호출은 asyncio.to_thread로 실행되고 연결 풀(HTTPTransport)을 공유하므로
+    asyncio.gather로 여러 요청을 동시에 보낼 수 있습니다.
+    """
+
+    def __init__(self, *args, client: BinanceClient | None = None, **kwargs):
+        self.sync = client or BinanceClient(*args, **kwargs)
+
+    @property
+    def symbols(self):
+        return self.sync.symbols
+
+    async def get_server_time(self) -> int:
+        return await asyncio.to_thread(self.sync.get_server_time)
+
+    async def get_price(self, symbol: str = "BTCUSDT") -> float:
+        return await asyncio.to_thread(self.sync.get_price, symbol)
+
+    async def get_all_prices(self) -> dict[str, float]:
+        return await asyncio.to_thread(self.sync.get_all_prices)
+
+    async def get_order_book(self, symbol: str = "BTCUSDT", limit: int = 10) -> dict:
+        return await asyncio.to_thread(self.sync.get_order_book, symbol, limit)
+
+    async def get_exchange_info(self, symbol: str | None = None) -> dict:
+        return await asyncio.to_thread(self.sync.get_exchange_info, symbol)
+
+    async def get_account(self) -> dict:
+        return await asyncio.to_thread(self.sync.get_account)
+
+    async def get_balance(self, asset: str) -> tuple[float, float]:
+        return await asyncio.to_thread(self.sync.get_balance, asset)
+
+    async def place_order(self, **kwargs) -> dict | None:
+        return await asyncio.to_thread(self.sync.place_order, **kwargs)
+
+    async def cancel_order(self, symbol: str, order_id: int | None = None, orig_client_order_id: str | None = None) -> dict:
+        return await asyncio.to_thread(self.sync.cancel_order, symbol, order_id, orig_client_order_id)
+
+    async def get_order(self, symbol: str, order_id: int | None = None, orig_client_order_id: str | None = None) -> dict:
+        return await asyncio.to_thread(self.sync.get_order, symbol, order_id, orig_client_order_id)
+
+    async def get_symbol_filters(self, symbol: str) -> dict:
+        return await asyncio.to_thread(self.sync.get_symbol_filters, symbol)
 
-        if step_size > 0:
-            s = f"{step_size:.16f}".rstrip("0")
-            precision = len(s.split(".")[1]) if "." in s else 0
-            factor = 10 ** precision if precision > 0 else 1
-            qty = int(qty * factor) / factor
+    async def clamp_quantity(self, symbol: str, qty: float) -> float:
+        return await asyncio.to_thread(self.sync.clamp_quantity, symbol, qty)
 
-        qty = max(min_qty, min(qty, max_qty))
-        return qty
+    async def check_order(self, symbol: str, qty: float, price: float | None = None) -> str | None:
+        return await asyncio.to_thread(self.sync.check_order, symbol, qty, price)
 
+    def close(self) -> None:
+        self.sync.close()
@@ -1,10 +1,13 @@
 ﻿import time
-import hmac
-import hashlib
+import asyncio
 import json
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
+from dataclasses import dataclass
+
+from http_transport import HTTPTransport
+from metrics import API_ERRORS_TOTAL, HTTP_PHASE_SECONDS
+from rate_limit import PRIORITY_ACCOUNT, PRIORITY_MARKET, PRIORITY_ORDER, RateLimiter, futures_weight
+from request_signer import build_signer, encode_query
+from symbol_registry import SymbolRegistry
 
 
 class BinanceFuturesAPIError(Exception):
@@ -15,6 +18,33 @@ class BinanceFuturesAPIError(Exception):
         self.msg = msg
 
 
+@dataclass(frozen=True)
+class PremiumIndex:
+    """/fapi/v1/premiumIndex 응답 한 건. 마크/인덱스 가격과 이번 주기 예상 펀딩비를 함께 담습니다."""
+
+    symbol: str
+    mark_price: float
+    index_price: float
+    estimated_settle_price: float
+    last_funding_rate: float  # 다음 정산(next_funding_time)에 적용될 예상 펀딩비 (소수, 0.0001 = 1bp)
+    interest_rate: float
+    next_funding_time: int  # ms
+    time: int  # ms
+
+    @classmethod
+    def from_json(cls, d: dict) -> "PremiumIndex":
+        return cls(
+            symbol=d["symbol"],
+            mark_price=float(d["markPrice"]),
+            index_price=float(d.get("indexPrice") or 0.0),
+            estimated_settle_price=float(d.get("estimatedSettlePrice") or 0.0),
+            last_funding_rate=float(d.get("lastFundingRate") or 0.0),
+            interest_rate=float(d.get("interestRate") or 0.0),
+            next_funding_time=int(d.get("nextFundingTime") or 0),
+            time=int(d.get("time") or 0),
+        )
+
+
 class BinanceFuturesClient:
     """
     외부 의존성 없이 동작하는 최소한의 바이낸스 USDT-M 선물 클라이언트(REST)입니다.\n    기본 base_url: 프로덕션 https://fapi.binance.com\n    테스트넷: https://testnet.binancefuture.com
@@ -27,65 +57,117 @@ class BinanceFuturesClient:
         base_url="https://fapi.binance.com",
         recv_window=5000,
         timeout=10,
+        transport=None,
+        pool_size=4,
+        symbols_ttl=3600.0,
+        rate_limiter=None,
+        signer=None,
+        time_sync=None,
     ):
         self.api_key = api_key or ""
         self.api_secret = api_secret or ""
+        # signer.sign(query) -> 쿼리에 바로 붙일 서명 문자열 (HMAC 기본, Ed25519/RSA 키는 request_signer 참고)
+        self.signer = signer or build_signer(self.api_secret)
+        # time_sync: TimeSync (서버 시계 보정). 없으면 로컬 시계와 고정 recv_window 사용
+        self.time_sync = time_sync
+        # ws_orders: order_gateway.WsApiSession. 연결돼 있으면 주문/취소를 WebSocket API로 보냄 (아니면 REST)
+        self.ws_orders = None
+        # user_stream: user_stream.UserDataStream. 준비돼 있으면 잔고/포지션 조회를 메모리 캐시에서 읽음
+        self.user_stream = None
         self.base_url = base_url.rstrip("/")
         self.recv_window = int(recv_window)
         self.timeout = timeout
+        # transport: request(method, url, body, headers, timeout) -> HTTPResponse 를 제공하는 객체
+        self.transport = transport or HTTPTransport(pool_size=pool_size)
+        # 넘겨받은 transport는 다른 클라이언트와 공유될 수 있으므로 만든 쪽이 닫음
+        self._owns_transport = transport is None
+        # 호스트(IP) 단위 가중치/주문 한도: 같은 transport를 쓰는 클라이언트끼리 공유
+        self.limiter = self.transport.register_limiter(
+            self.base_url, rate_limiter or RateLimiter(weight_limit=2400, order_limit_10s=300)
+        )
+        # exchangeInfo 필터 캐시 (최초 사용 시 전체 심볼 일괄 로드)
+        self.symbols = SymbolRegistry(self, ttl=symbols_ttl)
 
     # ---------- 저수준 HTTP 헬퍼 ----------
     def _sign(self, params: dict) -> str:
-        query = urlencode(params, doseq=True)
-        signature = hmac.new(
-            self.api_secret.encode("utf-8"), query.encode("utf-8"), hashlib.sha256
-        ).hexdigest()
-        return signature
+        return self.signer.sign(encode_query(params))
 
     def _request(
-        self, method: str, path: str, params: dict | None = None, signed: bool = False
+        self, method: str, path: str, params: dict | None = None, signed: bool = False, keyed: bool = False
     ):
         params = params.copy() if params else {}
         headers = {
             "Content-Type": "application/x-www-form-urlencoded",
         }
+        if keyed and not signed:
+            # USER_STREAM 보안 유형: API Key 헤더만 필요 (서명 없음)
+            if not self.api_key:
+                raise ValueError("User stream endpoint requires api_key")
+            headers["X-MBX-APIKEY"] = self.api_key
         if signed:
-            if not self.api_key or not self.api_secret:
-                raise ValueError("Signed endpoint requires api_key and api_secret")
+            if not self.api_key or self.signer is None:
+                raise ValueError("Signed endpoint requires api_key and api_secret (or a private key)")
             headers["X-MBX-APIKEY"] = self.api_key
-            params.setdefault("recvWindow", self.recv_window)
-            params["timestamp"] = int(time.time() * 1000)
-            params["signature"] = self._sign(params)
+            ts = self.time_sync
+            params.setdefault("recvWindow", ts.recv_window(self.recv_window) if ts else self.recv_window)
+            params["timestamp"] = ts.now_ms() if ts else int(time.time() * 1000)
+
+        # 한 번 인코딩한 문자열을 그대로 서명하고 전송 (signature는 항상 마지막)
+        query = encode_query(params)
+        if signed:
+            query = f"{query}&signature={self.signer.sign(query)}"
 
         url = f"{self.base_url}{path}"
         data_bytes = None
         if method.upper() in ("GET", "DELETE"):
             if params:
-                url = f"{url}?{urlencode(params, doseq=True)}"
+                url = f"{url}?{query}"
         else:
-            data_bytes = urlencode(params, doseq=True).encode("utf-8")
+            data_bytes = query.encode("utf-8")
 
-        req = Request(url=url, data=data_bytes, method=method.upper(), headers=headers)
-        try:
-            with urlopen(req, timeout=self.timeout) as resp:
-                raw = resp.read().decode("utf-8")
-                if not raw:
-                    return None
-                return json.loads(raw)
-        except HTTPError as e:
+        is_order = method.upper() == "POST" and path == "/fapi/v1/order"
+        priority = PRIORITY_ORDER if is_order else (PRIORITY_ACCOUNT if signed else PRIORITY_MARKET)
+        # 네트워크 오류는 transport가 ConnectionError로 올림 (rate limit 대기는 transport가 처리)
+        resp = self.transport.request(
+            method.upper(),
+            url,
+            body=data_bytes,
+            headers=headers,
+            timeout=self.timeout,
+            weight=futures_weight(method, path, params),
+            priority=priority,
+            is_order=is_order,
+        )
+        if resp.status >= 400:
             try:
-                payload = e.read().decode("utf-8")
+                payload = resp.body.decode("utf-8")
                 data = json.loads(payload) if payload else {}
                 code = data.get("code", "unknown")
-                msg = data.get("msg", str(e))
+                msg = data.get("msg", f"HTTP Error {resp.status}")
             except Exception:
                 code = "unknown"
-                msg = str(e)
-            raise BinanceFuturesAPIError(e.code, code, msg)
-        except URLError as e:
-            raise ConnectionError(f"Network error: {e}")
+                msg = f"HTTP Error {resp.status}"
+            API_ERRORS_TOTAL.labels("futures", code).inc()
+            if code == -1021 and self.time_sync is not None:
+                self.time_sync.invalidate()  # 다음 요청 전에 오프셋 재추정
+            raise BinanceFuturesAPIError(resp.status, code, msg)
+
+        t0 = time.perf_counter()
+        raw = resp.body.decode("utf-8")
+        if not raw:
+            return None
+        data = json.loads(raw)
+        HTTP_PHASE_SECONDS.labels(path, "parse").observe(time.perf_counter() - t0)
+        return data
+
+    def close(self) -> None:
+        if self._owns_transport:
+            self.transport.close()
 
     # ---------- 공개 엔드포인트 ----------
+    def get_server_time(self) -> int:
+        return int(self._request("GET", "/fapi/v1/time")["serverTime"])
+
     def get_price(self, symbol: str = "BTCUSDT") -> float:
         data = self._request("GET", "/fapi/v1/ticker/price", {"symbol": symbol})
         return float(data["price"])  # type: ignore[index]
@@ -96,9 +178,33 @@ class BinanceFuturesClient:
             "GET", "/fapi/v1/depth", {"symbol": symbol, "limit": limit}
         )
 
+    def get_premium_index(self, symbol: str = "BTCUSDT") -> PremiumIndex:
+        """마크/인덱스 가격과 예상 펀딩비를 한 번에 조회합니다 (get_mark_price와 같은 요청)."""
+        return PremiumIndex.from_json(self._request("GET", "/fapi/v1/premiumIndex", {"symbol": symbol}))
+
+    def get_all_premium_index(self) -> dict[str, PremiumIndex]:
+        """전체 심볼 premiumIndex를 한 번의 요청으로 조회합니다. {symbol: PremiumIndex}"""
+        data = self._request("GET", "/fapi/v1/premiumIndex")
+        return {d["symbol"]: PremiumIndex.from_json(d) for d in data}
+
     def get_mark_price(self, symbol: str = "BTCUSDT") -> float:
-        data = self._request("GET", "/fapi/v1/premiumIndex", {"symbol": symbol})
-        return float(data.get("markPrice"))
+        return self.get_premium_index(symbol).mark_price
+
+    def get_all_mark_prices(self) -> dict[str, float]:
+        """전체 심볼 마크 가격을 한 번의 요청으로 조회합니다. {symbol: markPrice}"""
+        data = self._request("GET", "/fapi/v1/premiumIndex")
+        return {d["symbol"]: float(d["markPrice"]) for d in data}
+
+    def get_usdt_perpetuals(self) -> list[str]:
+        """거래 중인 USDT 마진 무기한(PERPETUAL) 심볼 목록."""
+        info = self.get_exchange_info()
+        return [
+            s["symbol"]
+            for s in info.get("symbols", [])
+            if s.get("contractType") == "PERPETUAL"
+            and s.get("quoteAsset") == "USDT"
+            and s.get("status") == "TRADING"
+        ]
 
     def get_exchange_info(self, symbol: str | None = None) -> dict:
         params = {"symbol": symbol} if symbol else None
@@ -118,7 +224,21 @@ class BinanceFuturesClient:
                 return float(b.get("balance", 0)), float(b.get("withdrawAvailable", 0))
         return 0.0, 0.0
 
+    # ---------- user data stream (listenKey) ----------
+    def create_listen_key(self) -> str:
+        return self._request("POST", "/fapi/v1/listenKey", keyed=True)["listenKey"]
+
+    def keepalive_listen_key(self, listen_key: str) -> None:
+        # 선물은 계정당 키가 하나라 파라미터 없이 현재 키를 연장
+        self._request("PUT", "/fapi/v1/listenKey", keyed=True)
+
+    def close_listen_key(self, listen_key: str) -> None:
+        self._request("DELETE", "/fapi/v1/listenKey", keyed=True)
+
     def get_position(self, symbol: str) -> dict:
+        us = self.user_stream
+        if us is not None and us.ready:
+            return us.cache.position(symbol)
         acc = self.get_account()
         for p in acc.get("positions", []):
             if p.get("symbol") == symbol:
@@ -176,26 +296,125 @@ class BinanceFuturesClient:
             payload["positionSide"] = position_side
 
         payload.update(extra)
+        if self.ws_orders is not None and self.ws_orders.connected:
+            return self.ws_orders.place_order(payload)
         return self._request("POST", "/fapi/v1/order", payload, signed=True)
 
+    def cancel_order(self, symbol: str, order_id: int | None = None, orig_client_order_id: str | None = None) -> dict:
+        payload: dict[str, str | int] = {"symbol": symbol}
+        if order_id is not None:
+            payload["orderId"] = order_id
+        if orig_client_order_id is not None:
+            payload["origClientOrderId"] = orig_client_order_id
+        if self.ws_orders is not None and self.ws_orders.connected:
+            return self.ws_orders.cancel_order(payload)
+        return self._request("DELETE", "/fapi/v1/order", payload, signed=True)
+
+    def get_order(self, symbol: str, order_id: int | None = None, orig_client_order_id: str | None = None) -> dict:
+        """주문 상태 조회 (결과를 알 수 없는 주문 확인용). 없으면 BinanceFuturesAPIError(code -2013)."""
+        payload: dict[str, str | int] = {"symbol": symbol}
+        if order_id is not None:
+            payload["orderId"] = order_id
+        if orig_client_order_id is not None:
+            payload["origClientOrderId"] = orig_client_order_id
+        return self._request("GET", "/fapi/v1/order", payload, signed=True)
+
     # ---------- helpers ----------
     def get_symbol_filters(self, symbol: str) -> dict:
-        info = self.get_exchange_info(symbol)
-        symbols = info.get("symbols", [])
-        if not symbols:
-            return {}
-        return {f["filterType"]: f for f in symbols[0].get("filters", [])}
+        f = self.symbols.get(symbol)
+        return dict(f.raw) if f else {}
 
     def clamp_quantity(self, symbol: str, qty: float) -> float:
-        filters = self.get_symbol_filters(symbol)
-        lot = filters.get("LOT_SIZE") or {}
-        step_size = float(lot.get("stepSize", 0))
-        min_qty = float(lot.get("minQty", 0))
-        max_qty = float(lot.get("maxQty", 0)) or float("inf")
-        if step_size > 0:
-            s = f"{step_size:.16f}".rstrip("0")
-            precision = len(s.split(".")[1]) if "." in s else 0
-            factor = 10**precision if precision > 0 else 1
-            qty = int(qty * factor) / factor
-        qty = max(min_qty, min(qty, max_qty))
-        return qty
+        f = self.symbols.get(symbol)
+        if f is None:
+            return max(0.0, qty)
+        return f.clamp_quantity(qty)
+
+    def check_order(self, symbol: str, qty: float, price: float | None = None) -> str | None:
+        """LOT_SIZE/MIN_NOTIONAL 사전 검증. 문제가 있으면 사유 문자열, 없으면 None."""
+        f = self.symbols.get(symbol)
+        if f is None:
+            return f"unknown symbol {symbol}"
+        return f.check(qty, price)
+
+
+class AsyncBinanceFuturesClient:
+    """
+    BinanceFuturesClient의 asyncio 버전입니다. 메서드 구성은 동일하며 모두 코루틴입니다.
+    블로킹 호출은 asyncio.to_thread로 실행되고 연결 풀(HTTPTransport)을 공유합니다.
+    """
+
+    def __init__(self, *args, client: BinanceFuturesClient | None = None, **kwargs):
+        self.sync = client or BinanceFuturesClient(*args, **kwargs)
+
+    @property
+    def symbols(self):
+        return self.sync.symbols
+
+    async def get_server_time(self) -> int:
+        return await asyncio.to_thread(self.sync.get_server_time)
+
+    async def get_price(self, symbol: str = "BTCUSDT") -> float:
+        return await asyncio.to_thread(self.sync.get_price, symbol)
+
+    async def get_order_book(self, symbol: str = "BTCUSDT", limit: int = 10) -> dict:
+        return await asyncio.to_thread(self.sync.get_order_book, symbol, limit)
+
+    async def get_mark_price(self, symbol: str = "BTCUSDT") -> float:
+        return await asyncio.to_thread(self.sync.get_mark_price, symbol)
+
+    async def get_all_mark_prices(self) -> dict[str, float]:
+        return await asyncio.to_thread(self.sync.get_all_mark_prices)
+
+    async def get_premium_index(self, symbol: str = "BTCUSDT") -> PremiumIndex:
+        return await asyncio.to_thread(self.sync.get_premium_index, symbol)
+
+    async def get_all_premium_index(self) -> dict[str, PremiumIndex]:
+        return await asyncio.to_thread(self.sync.get_all_premium_index)
+
+    async def get_usdt_perpetuals(self) -> list[str]:
+        return await asyncio.to_thread(self.sync.get_usdt_perpetuals)
+
+    async def get_exchange_info(self, symbol: str | None = None) -> dict:
+        return await asyncio.to_thread(self.sync.get_exchange_info, symbol)
+
+    async def get_account(self) -> dict:
+        return await asyncio.to_thread(self.sync.get_account)
+
+    async def get_balances(self) -> list[dict]:
+        return await asyncio.to_thread(self.sync.get_balances)
+
+    async def get_balance(self, asset: str) -> tuple[float, float]:
+        return await asyncio.to_thread(self.sync.get_balance, asset)
+
+    async def get_position(self, symbol: str) -> dict:
+        return await asyncio.to_thread(self.sync.get_position, symbol)
+
+    async def set_margin_type(self, symbol: str, isolated: bool = True):
+        return await asyncio.to_thread(self.sync.set_margin_type, symbol, isolated)
+
+    async def set_leverage(self, symbol: str, leverage: int = 2):
+        return await asyncio.to_thread(self.sync.set_leverage, symbol, leverage)
+
+    async def place_order(self, **kwargs) -> dict | None:
+        return await asyncio.to_thread(self.sync.place_order, **kwargs)
+
+    async def cancel_order(self, symbol: str, order_id: int | None = None, orig_client_order_id: str | None = None) -> dict:
+        return await asyncio.to_thread(self.sync.cancel_order, symbol, order_id, orig_client_order_id)
+
+    async def get_order(self, symbol: str, order_id: int | None = None, orig_client_order_id: str | None = None) -> dict:
+        return await asyncio.to_thread(self.sync.get_order, symbol, order_id, orig_client_order_id)
+
+    async def get_symbol_filters(self, symbol: str) -> dict:
+        return await asyncio.to_thread(self.sync.get_symbol_filters, symbol)
+
+    async def clamp_quantity(self, symbol: str, qty: float) -> float:
+        return await asyncio.to_thread(self.sync.clamp_quantity, symbol, qty)
+
+    async def check_order(
+        self, symbol: str, qty: float, price: float | None = None
+    ) -> str | None:
+        return await asyncio.to_thread(self.sync.check_order, symbol, qty, price)
+
+    def close(self) -> None:
+        self.sync.close()
@@ -0,0 +1,192 @@
+﻿import csv
+import sys
+import argparse
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from tick_recorder import read_columns
+
+CANDLE_TYPES = ("basis", "spot", "mark")  # candles_1s.type 허용 값과 같은 순서
+TIMEFRAMES = {"1s": 1, "1m": 60, "1h": 3600}
+CSV_HEADER = ("symbol", "ts_s", "type", "open", "high", "low", "close")
+
+# web/server/src/basis/service.ts 의 업서트와 같은 충돌 처리 (psycopg 형식 자리표시자)
+CANDLES_1S_UPSERT = (
+    "INSERT INTO candles_1s(symbol, ts_s, type, open, high, low, close) VALUES (%s,%s,%s,%s,%s,%s,%s) "
+    "ON CONFLICT (symbol, ts_s, type) DO UPDATE SET high=GREATEST(EXCLUDED.high, candles_1s.high), "
+    "low=LEAST(EXCLUDED.low, candles_1s.low), close=EXCLUDED.close"
+)
+
+
+@dataclass
+class Candle:
+    """봉 하나. basis/spot/mark는 각각 (open, high, low, close)."""
+
+    ts_s: int  # 봉 시작 시각(초), candles_1s.ts_s와 같은 기준
+    seconds: int
+    basis: tuple[float, float, float, float]
+    spot: tuple[float, float, float, float]
+    mark: tuple[float, float, float, float]
+    ticks: int = 0
+
+    @property
+    def end_ms(self) -> int:
+        return (self.ts_s + self.seconds) * 1000
+
+
+class CandleSeries:
+    """
+    한 주기(seconds)의 스팟/마크/베이시스 OHLC 봉을 틱마다 O(1)로 갱신합니다.\n\n    - 진행 중인 봉은 스칼라 12개(3종 x OHLC)로 유지하고, 다음 주기의 틱이 오면 완성된 봉을 열 배열 링(capacity개)에 넣음\n    - 이미 닫힌 봉보다 이른 틱(지연 도착)은 반영하지 않고 late로 셈
+    """
+
+    def __init__(self, seconds: int, capacity: int = 3600):
+        self.seconds = int(seconds)
+        self.capacity = max(1, int(capacity))
+        self.ts = array("q", bytes(8 * self.capacity))
+        # 열 순서: basis_o, basis_h, basis_l, basis_c, spot_o, ..., mark_c
+        self.cols = [array("d", bytes(8 * self.capacity)) for _ in range(4 * len(CANDLE_TYPES))]
+        self.ticks = array("q", bytes(8 * self.capacity))
+        self.count = 0  # 지금까지 닫힌 봉 수
+        self.late = 0
+        self._cur_ts = -1
+        self._cur = [0.0] * (4 * len(CANDLE_TYPES))
+        self._cur_ticks = 0
+
+    def update(self, ts_ms: int, spot: float, mark: float, basis: float) -> Candle | None:
+        """틱을 반영하고, 이 틱으로 직전 봉이 닫혔으면 그 봉을 반환합니다."""
+        bucket = ts_ms // 1000 // self.seconds * self.seconds
+        closed = None
+        if bucket != self._cur_ts:
+            if bucket < self._cur_ts:
+                self.late += 1
+                return None
+            if self._cur_ts >= 0:
+                closed = self._close()
+            self._cur_ts = bucket
+            self._cur_ticks = 0
+            c = self._cur
+            c[0] = c[1] = c[2] = c[3] = basis
+            c[4] = c[5] = c[6] = c[7] = spot
+            c[8] = c[9] = c[10] = c[11] = mark
+        else:
+            c = self._cur
+            for base, v in ((0, basis), (4, spot), (8, mark)):
+                if v > c[base + 1]:
+                    c[base + 1] = v
+                if v < c[base + 2]:
+                    c[base + 2] = v
+                c[base + 3] = v
+        self._cur_ticks += 1
+        return closed
+
+    def _close(self) -> Candle:
+        i = self.count % self.capacity
+        self.ts[i] = self._cur_ts
+        self.ticks[i] = self._cur_ticks
+        for col, v in zip(self.cols, self._cur):
+            col[i] = v
+        self.count += 1
+        return self._candle(self._cur_ts, self._cur, self._cur_ticks)
+
+    def _candle(self, ts_s: int, v, ticks: int) -> Candle:
+        return Candle(ts_s, self.seconds, tuple(v[0:4]), tuple(v[4:8]), tuple(v[8:12]), ticks)
+
+    def flush(self) -> Candle | None:
+        """진행 중인 봉을 강제로 닫습니다 (종료/내보내기 직전)."""
+        if self._cur_ts < 0:
+            return None
+        closed = self._close()
+        self._cur_ts = -1
+        return closed
+
+    @property
+    def current(self) -> Candle | None:
+        return self._candle(self._cur_ts, self._cur, self._cur_ticks) if self._cur_ts >= 0 else None
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def candles(self, last: int | None = None) -> Iterator[Candle]:
+        """링에 남아 있는 닫힌 봉을 오래된 것부터 (last가 있으면 최근 last개만)."""
+        n = len(self) if last is None else min(last, len(self))
+        for k in range(self.count - n, self.count):
+            i = k % self.capacity
+            yield self._candle(self.ts[i], [col[i] for col in self.cols], self.ticks[i])
+
+
+class CandleAggregator:
+    """한 심볼의 틱을 여러 주기(기본 1s/1m/1h) 봉으로 동시에 접습니다."""
+
+    def __init__(self, symbol: str, timeframes: Iterable[str] = ("1s", "1m", "1h"), capacity: int = 3600):
+        self.symbol = symbol.upper()
+        self.series = {tf: CandleSeries(TIMEFRAMES[tf], capacity) for tf in timeframes}
+
+    def update(self, ts_ms: int, spot: float, mark: float, basis: float) -> list[tuple[str, Candle]]:
+        """틱을 반영하고 이번에 닫힌 (주기, 봉) 목록을 반환합니다."""
+        closed = []
+        for tf, s in self.series.items():
+            c = s.update(ts_ms, spot, mark, basis)
+            if c is not None:
+                closed.append((tf, c))
+        return closed
+
+    def flush(self) -> list[tuple[str, Candle]]:
+        return [(tf, c) for tf, s in self.series.items() if (c := s.flush()) is not None]
+
+
+def candle_rows(symbol: str, candles: Iterable[Candle]) -> Iterator[tuple]:
+    """candles_1s 행 (symbol, ts_s, type, open, high, low, close). 봉 하나가 종류별 3행이 됩니다."""
+    for c in candles:
+        for kind in CANDLE_TYPES:
+            yield (symbol, c.ts_s, kind, *getattr(c, kind))
+
+
+def write_csv(rows: Iterable[tuple], out) -> int:
+    """CSV HEADER 형식으로 씁니다 (psql: \\copy candles_1s FROM 'file.csv' CSV HEADER). 쓴 행 수를 반환합니다."""
+    w = csv.writer(out)
+    w.writerow(CSV_HEADER)
+    n = 0
+    for r in rows:
+        w.writerow(r[:3] + tuple(map(repr, r[3:])))
+        n += 1
+    return n
+
+
+def candles_from_ticks(root: str, symbol: str, tf: str = "1s", start_ms: int | None = None, end_ms: int | None = None) -> list[Candle]:
+    """틱 레코더 세그먼트를 읽어 봉 목록으로 접습니다."""
+    cols = read_columns(root, symbol, start_ms, end_ms)
+    s = CandleSeries(TIMEFRAMES[tf], capacity=1)
+    out = []
+    for ts, sp, mk, bs in zip(cols["ts_ms"], cols["spot"], cols["mark"], cols["basis"]):
+        c = s.update(ts, sp, mk, bs)
+        if c is not None:
+            out.append(c)
+    last = s.flush()
+    if last is not None:
+        out.append(last)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="기록된 틱을 OHLC 봉(candles_1s 형식 CSV)으로 변환")
+    ap.add_argument("root", help="틱 레코더 디렉터리 (--record DIR)")
+    ap.add_argument("symbol")
+    ap.add_argument("--tf", choices=list(TIMEFRAMES), default="1s", help="봉 주기")
+    ap.add_argument("-o", "--output", help="출력 파일 (기본: stdout)")
+    ap.add_argument("--start-ms", type=int, help="시작 시각(ms, 포함)")
+    ap.add_argument("--end-ms", type=int, help="종료 시각(ms, 포함)")
+    args = ap.parse_args()
+
+    symbol = args.symbol.upper()
+    rows = candle_rows(symbol, candles_from_ticks(args.root, symbol, args.tf, args.start_ms, args.end_ms))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            n = write_csv(rows, f)
+    else:
+        n = write_csv(rows, sys.stdout)
+    print(f"exported {n} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+﻿from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from itertools import accumulate
+from operator import mul
+
+
+class BookCurve:
+    """
+    한쪽 호가(최우선부터 체결되는 순서)의 누적 수량/누적 명목가 곡선입니다.\n    prefix sum을 한 번 만들어 두면 임의 수량의 체결 명목가/VWAP은 bisect 한 번으로 계산됩니다.
+    """
+
+    __slots__ = ("prices", "cum_qty", "cum_notional")
+
+    def __init__(self, prices: array, qtys: array):
+        self.prices = prices
+        self.cum_qty = array("d", accumulate(qtys))
+        self.cum_notional = array("d", accumulate(map(mul, prices, qtys)))
+
+    @classmethod
+    def from_levels(cls, levels) -> "BookCurve":
+        """[[price, qty], ...] (최우선부터, 문자열/숫자 모두 허용)."""
+        prices = array("d", (float(p) for p, _ in levels))
+        qtys = array("d", (float(q) for _, q in levels))
+        return cls(prices, qtys)
+
+    @property
+    def total_qty(self) -> float:
+        return self.cum_qty[-1] if self.cum_qty else 0.0
+
+    def notional(self, qty: float) -> float | None:
+        """qty를 시장가로 체결할 때의 명목가. 호가 깊이가 부족하면 None."""
+        k = bisect_left(self.cum_qty, qty)
+        if k >= len(self.cum_qty):
+            return None
+        prev_q = self.cum_qty[k - 1] if k else 0.0
+        prev_n = self.cum_notional[k - 1] if k else 0.0
+        return prev_n + (qty - prev_q) * self.prices[k]
+
+    def vwap(self, qty: float) -> float | None:
+        if qty <= 0:
+            return self.prices[0] if self.prices else None
+        n = self.notional(qty)
+        return None if n is None else n / qty
+
+    def segment(self, qty: float) -> tuple[float, float, float]:
+        """qty가 속한 레벨의 (시작 누적수량, 시작 누적명목가, 한계 가격)."""
+        k = bisect_left(self.cum_qty, qty)
+        k = min(k, len(self.cum_qty) - 1)
+        return (self.cum_qty[k - 1] if k else 0.0), (self.cum_notional[k - 1] if k else 0.0), self.prices[k]
+
+
+def curves_from_depth(depth: dict) -> tuple[BookCurve, BookCurve]:
+    """get_order_book() / LocalOrderBook.snapshot() 결과를 (bids, asks) 곡선으로 변환합니다."""
+    return BookCurve.from_levels(depth.get("bids", [])), BookCurve.from_levels(depth.get("asks", []))
+
+
+@dataclass
+class SizingResult:
+    direction: str
+    qty: float  # entry 임계값을 만족하는 최대 수량 (0이면 진입 불가)
+    spot_vwap: float = 0.0
+    fut_vwap: float = 0.0
+    gross_bps: float = 0.0  # VWAP 기준 실행 가능 베이시스
+    net_bps: float = 0.0  # 수수료 차감 후 방향 기준 이득(bps), entry_bps와 비교하는 값
+    limited_by: str = ""  # "notional" | "depth" | "edge"
+
+    def describe(self) -> str:
+        return (
+            f"sizing {self.direction}: qty={self.qty:.8g} spot_vwap={self.spot_vwap:.2f} fut_vwap={self.fut_vwap:.2f} "
+            f"exec_basis={self.gross_bps:.2f}bps net={self.net_bps:.2f}bps limit={self.limited_by}"
+        )
+
+
+def _legs(direction: str, spot: tuple[BookCurve, BookCurve], fut: tuple[BookCurve, BookCurve]):
+    # carry: 스팟 매수(asks) + 선물 매도(bids) / reverse: 스팟 매도(bids) + 선물 매수(asks)
+    if direction == "carry":
+        return spot[1], fut[0], 1.0
+    return spot[0], fut[1], -1.0
+
+
+def edge_bps(direction: str, spot_notional: float, fut_notional: float, fee_bps: float) -> float:
+    """같은 수량의 양쪽 체결 명목가로 계산한 방향 기준 순이득(bps). carry는 basis, reverse는 -basis 에서 수수료 차감."""
+    sign = 1.0 if direction == "carry" else -1.0
+    return sign * (fut_notional - spot_notional) / spot_notional * 10000.0 - fee_bps
+
+
+def max_entry_size(
+    direction: str,
+    spot: tuple[BookCurve, BookCurve],
+    fut: tuple[BookCurve, BookCurve],
+    entry_bps: float,
+    fee_bps: float,
+    max_qty: float,
+) -> SizingResult:
+    """
+    두 호가를 함께 걸으며 순이득이 entry_bps 이상인 최대 수량을 찾습니다.\n\n    수량이 늘수록 VWAP은 나빠지므로 순이득은 단조 감소합니다. 양쪽 누적수량 경계점들에서 이분 탐색으로\n    임계값을 넘는 마지막 구간을 찾고, 그 구간 안에서는 두 한계 가격이 일정하므로 경계 수량을 닫힌 식으로 구합니다.
+    """
+    s_curve, f_curve, _ = _legs(direction, spot, fut)
+    res = SizingResult(direction, 0.0)
+    depth = min(s_curve.total_qty, f_curve.total_qty)
+    if depth <= 0 or max_qty <= 0:
+        res.limited_by = "depth"
+        return res
+
+    def net(q: float) -> float:
+        return edge_bps(direction, s_curve.notional(q), f_curve.notional(q), fee_bps)
+
+    # 최우선 호가에서도 조건을 못 맞추면 진입 불가
+    top = edge_bps(direction, s_curve.prices[0], f_curve.prices[0], fee_bps)
+    cap = min(depth, max_qty)
+    if top < entry_bps:
+        res.limited_by = "edge"
+        q = 0.0
+    elif net(cap) >= entry_bps:
+        res.limited_by = "notional" if max_qty <= depth else "depth"
+        q = cap
+    else:
+        points = sorted({x for x in s_curve.cum_qty if x < cap} | {x for x in f_curve.cum_qty if x < cap})
+        lo, hi = 0, len(points)  # points[:lo] 는 조건 충족
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if net(points[mid]) >= entry_bps:
+                lo = mid + 1
+            else:
+                hi = mid
+        q0 = points[lo - 1] if lo else 0.0
+        q1 = points[lo] if lo < len(points) else cap
+        # 구간 [q0, q1] 에서 S(q)=S0+ps*d, F(q)=F0+pf*d. 조건 sign*(F/S-1)*1e4 - fee >= entry 의 경계
+        r = 1.0 + (entry_bps + fee_bps) / 10000.0 * (1.0 if direction == "carry" else -1.0)
+        probe = (q0 + q1) / 2
+        sq0, sn0, ps = s_curve.segment(probe)
+        fq0, fn0, pf = f_curve.segment(probe)
+        S0 = sn0 + (q0 - sq0) * ps
+        F0 = fn0 + (q0 - fq0) * pf
+        denom = pf - r * ps
+        d = (r * S0 - F0) / denom if denom else 0.0
+        q = min(max(q0 + d, q0), q1)
+        res.limited_by = "edge"
+
+    res.qty = q
+    if q > 0:
+        sn, fn = s_curve.notional(q), f_curve.notional(q)
+        res.spot_vwap, res.fut_vwap = sn / q, fn / q
+        res.gross_bps = (fn - sn) / sn * 10000.0
+        res.net_bps = edge_bps(direction, sn, fn, fee_bps)
+    else:
+        res.spot_vwap, res.fut_vwap = s_curve.prices[0], f_curve.prices[0]
+        res.gross_bps = (res.fut_vwap - res.spot_vwap) / res.spot_vwap * 10000.0
+        res.net_bps = top
+    return res
+
+
+class DepthSizer:
+    """
+    진입 직전에 스팟/선물 호가를 읽어 max_entry_size()로 수량을 정합니다.\n    books=(spot_book, fut_book) 로컬 오더북이 동기화돼 있으면 그것을, 아니면 REST get_order_book(limit)을 씁니다.
+    """
+
+    def __init__(
+        self,
+        spot_client,
+        fut_client,
+        symbol: str,
+        books: tuple | None = None,
+        limit: int = 100,
+        spot_fee_bps: float = 10.0,
+        futures_fee_bps: float = 5.0,
+    ):
+        self.spot_client = spot_client
+        self.fut_client = fut_client
+        self.symbol = symbol
+        self.books = books
+        self.limit = int(limit)
+        self.fee_bps = float(spot_fee_bps) + float(futures_fee_bps)
+
+    def _depths(self) -> tuple[dict, dict]:
+        if self.books is not None and all(b.synced for b in self.books):
+            return self.books[0].snapshot(self.limit), self.books[1].snapshot(self.limit)
+        return (
+            self.spot_client.get_order_book(self.symbol, self.limit),
+            self.fut_client.get_order_book(self.symbol, self.limit),
+        )
+
+    def size(self, direction: str, max_qty: float, entry_bps: float) -> SizingResult:
+        spot_depth, fut_depth = self._depths()
+        return max_entry_size(
+            direction,
+            curves_from_depth(spot_depth),
+            curves_from_depth(fut_depth),
+            entry_bps,
+            self.fee_bps,
+            max_qty,
+        )
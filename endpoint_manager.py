@@ -0,0 +1,251 @@
+﻿import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from http_transport import HTTPResponse, HTTPTransport
+from metrics import ENDPOINT_RTT_MS, HEDGED_REQUESTS_TOTAL
+from rate_limit import PRIORITY_MARKET, RateLimiter
+
+# 같은 스팟 API를 제공하는 공식 호스트 (가중치 한도는 IP 단위라 호스트를 바꿔도 공유됨)
+SPOT_API_HOSTS = (
+    "https://api.binance.com",
+    "https://api-gcp.binance.com",
+    "https://api1.binance.com",
+    "https://api2.binance.com",
+    "https://api3.binance.com",
+    "https://api4.binance.com",
+)
+SPOT_PROBE_PATH = "/api/v3/ping"
+FUTURES_PROBE_PATH = "/fapi/v1/ping"
+
+HEDGE_MIN_SAMPLES = 20  # 이보다 표본이 적으면 p95를 믿지 않고 hedge_max_ms를 기한으로 사용
+
+
+def _base(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class _Endpoint:
+    __slots__ = ("base_url", "rtt_ms", "healthy", "failures", "samples", "_p95", "_dirty")
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.rtt_ms = float("inf")  # 프로브 RTT 지수 이동 평균
+        self.healthy = True
+        self.failures = 0
+        self.samples: deque[float] = deque(maxlen=256)  # 실제 요청 소요 시간(ms)
+        self._p95 = 0.0
+        self._dirty = 0
+
+    def observe(self, ms: float) -> None:
+        self.samples.append(ms)
+        self._dirty += 1
+
+    def p95(self) -> float:
+        # 정렬 비용을 줄이려고 새 표본 32개마다 다시 계산
+        if self._dirty >= 32 or (self._dirty and not self._p95):
+            s = sorted(self.samples)
+            self._p95 = s[min(len(s) - 1, int(len(s) * 0.95))]
+            self._dirty = 0
+        return self._p95
+
+
+class EndpointGroup:
+    """
+    같은 API를 제공하는 호스트 묶음입니다. 첫 번째가 기본 호스트이며, 프로브 RTT가 가장 낮은 정상 호스트로 요청을 보냅니다.\n    switch_margin: 현재 호스트보다 이 비율 이상 빨라야 바꿈 (잦은 전환 방지).
+    """
+
+    def __init__(self, base_urls: list[str] | tuple[str, ...], probe_path: str, switch_margin: float = 0.8):
+        self.endpoints = [_Endpoint(u) for u in base_urls]
+        self.probe_path = probe_path
+        self.switch_margin = float(switch_margin)
+        self.current = self.endpoints[0]
+        self._lock = threading.Lock()
+
+    def best(self) -> _Endpoint:
+        with self._lock:
+            cur = self.current
+            healthy = [e for e in self.endpoints if e.healthy] or self.endpoints
+            cand = min(healthy, key=lambda e: e.rtt_ms)
+            if cand is not cur and (not cur.healthy or cand.rtt_ms < cur.rtt_ms * self.switch_margin):
+                print(f"endpoint: {cur.base_url} -> {cand.base_url} (rtt {cand.rtt_ms:.1f}ms)")
+                self.current = cur = cand
+            return cur
+
+    def alternate(self, ep: _Endpoint) -> _Endpoint:
+        """ep 다음으로 빠른 정상 호스트. 호스트가 하나뿐이면 같은 호스트(다른 연결)."""
+        others = [e for e in self.endpoints if e is not ep and e.healthy]
+        return min(others, key=lambda e: e.rtt_ms) if others else ep
+
+    def mark_failed(self, ep: _Endpoint) -> None:
+        ep.failures += 1
+        ep.healthy = False
+
+    def mark_ok(self, ep: _Endpoint) -> None:
+        """실제 요청이 응답을 받으면 비정상 표시를 해제합니다 (프로브를 기다리지 않음)."""
+        if not ep.healthy:
+            ep.failures = 0
+            ep.healthy = True
+
+    def mark_probe(self, ep: _Endpoint, rtt_ms: float | None) -> None:
+        if rtt_ms is None:
+            self.mark_failed(ep)
+            return
+        ep.failures = 0
+        ep.healthy = True
+        ep.rtt_ms = rtt_ms if ep.rtt_ms == float("inf") else ep.rtt_ms * 0.7 + rtt_ms * 0.3
+        ENDPOINT_RTT_MS.labels(urlsplit(ep.base_url).hostname or ep.base_url).set(ep.rtt_ms)
+
+
+class EndpointTransport:
+    """
+    HTTPTransport를 감싸 호스트 선택과 중복(hedged) 요청을 더하는 전송 계층입니다. 클라이언트의 transport= 자리에 그대로 넣습니다.\n\n    - add_group()으로 등록한 호스트 묶음 중 하나로 가는 요청은 현재 가장 빠른 정상 호스트로 주소를 바꿔 보냄\n    - 백그라운드 스레드가 probe_interval 초마다 각 호스트의 ping(가중치 1)으로 RTT/정상 여부를 갱신\n    - hedge=True면 시세 GET(PRIORITY_MARKET)이 그 호스트 p95 안에 응답하지 않을 때 다른 호스트로 한 번 더 보내고 먼저 온 응답을 사용\n    - 시세 GET이 네트워크 오류로 실패하면 그 호스트를 비정상으로 표시하고 다른 호스트로 한 번 재시도 (주문/서명 요청은 재시도하지 않음)\n    - 가중치 한도는 IP 단위이므로 묶음 안의 모든 호스트가 같은 RateLimiter를 공유
+    """
+
+    def __init__(
+        self,
+        inner=None,
+        probe_interval: float = 10.0,
+        hedge: bool = False,
+        hedge_min_ms: float = 5.0,
+        hedge_max_ms: float = 1000.0,
+        max_workers: int = 8,
+    ):
+        self.inner = inner or HTTPTransport()
+        self.probe_interval = float(probe_interval)
+        self.hedge = bool(hedge)
+        self.hedge_min_ms = float(hedge_min_ms)
+        self.hedge_max_ms = float(hedge_max_ms)
+        self.groups: list[EndpointGroup] = []
+        self._by_base: dict[str, EndpointGroup] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge") if hedge else None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_group(self, base_urls: list[str] | tuple[str, ...], probe_path: str) -> EndpointGroup:
+        group = EndpointGroup(base_urls, probe_path)
+        self.groups.append(group)
+        for ep in group.endpoints:
+            self._by_base[ep.base_url] = group
+        return group
+
+    # ---------- 한도 (HTTPTransport와 같은 인터페이스) ----------
+    def register_limiter(self, base_url: str, limiter: RateLimiter) -> RateLimiter:
+        group = self._by_base.get(_base(base_url))
+        limiter = self.inner.register_limiter(base_url, limiter)
+        if group is not None:
+            for ep in group.endpoints:
+                self.inner.register_limiter(ep.base_url, limiter)
+        return limiter
+
+    def limiter_for(self, url: str) -> RateLimiter | None:
+        return self.inner.limiter_for(url)
+
+    # ---------- 요청 ----------
+    def _send(self, group: EndpointGroup, ep: _Endpoint, method: str, path: str, kw: dict) -> HTTPResponse:
+        t0 = time.perf_counter()
+        try:
+            resp = self.inner.request(method, ep.base_url + path, **kw)
+        except ConnectionError:
+            group.mark_failed(ep)
+            raise
+        group.mark_ok(ep)
+        ep.observe((time.perf_counter() - t0) * 1000.0)
+        return resp
+
+    def _hedged(self, group: EndpointGroup, ep: _Endpoint, method: str, path: str, kw: dict) -> HTTPResponse:
+        deadline = ep.p95() if len(ep.samples) >= HEDGE_MIN_SAMPLES else self.hedge_max_ms
+        deadline = min(self.hedge_max_ms, max(self.hedge_min_ms, deadline))
+        first = self._pool.submit(self._send, group, ep, method, path, kw)
+        done, _ = wait([first], timeout=deadline / 1000.0)
+        if done and first.exception() is None:
+            return first.result()
+        # 기한 초과 또는 원 요청 실패: 다른 호스트로 한 번 더
+        alt = group.alternate(ep)
+        HEDGED_REQUESTS_TOTAL.labels("sent").inc()
+        second = self._pool.submit(self._send, group, alt, method, path, kw)
+        pending = {first, second}
+        error: Exception | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    HEDGED_REQUESTS_TOTAL.labels("hedge" if f is second else "primary").inc()
+                    return f.result()
+                error = error or f.exception()
+        raise error  # 둘 다 네트워크 오류
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None = None,
+        headers: dict | None = None,
+        timeout: float = 10,
+        weight: int = 1,
+        priority: int = PRIORITY_MARKET,
+        is_order: bool = False,
+    ) -> HTTPResponse:
+        kw = {"body": body, "headers": headers, "timeout": timeout, "weight": weight, "priority": priority, "is_order": is_order}
+        base = _base(url)
+        group = self._by_base.get(base)
+        if group is None:
+            return self.inner.request(method, url, **kw)
+        path = url[len(base):]
+        ep = group.best()
+        market_get = method == "GET" and priority == PRIORITY_MARKET
+        if market_get and self._pool is not None:
+            return self._hedged(group, ep, method, path, kw)
+        try:
+            return self._send(group, ep, method, path, kw)
+        except ConnectionError:
+            alt = group.alternate(ep)
+            if not market_get or alt is ep:
+                raise
+            return self._send(group, alt, method, path, kw)
+
+    # ---------- 프로브 ----------
+    def probe(self) -> None:
+        for group in self.groups:
+            for ep in group.endpoints:
+                t0 = time.perf_counter()
+                try:
+                    resp = self.inner.request("GET", ep.base_url + group.probe_path, timeout=2.0)
+                    ok = resp.status < 400
+                except ConnectionError:
+                    ok = False
+                group.mark_probe(ep, (time.perf_counter() - t0) * 1000.0 if ok else None)
+
+    def start(self) -> "EndpointTransport":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._probe_loop, name="endpoint-probe", daemon=True)
+        self._thread.start()
+        return self
+
+    def _probe_loop(self) -> None:
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.probe_interval)
+
+    def describe(self) -> str:
+        parts = []
+        for group in self.groups:
+            cur = group.current
+            parts.append(
+                " ".join(
+                    f"{'*' if e is cur else ''}{urlsplit(e.base_url).netloc}={e.rtt_ms:.1f}ms{'' if e.healthy else '(down)'}"
+                    for e in group.endpoints
+                )
+            )
+        return "endpoints: " + " | ".join(parts)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self.inner.close()
@@ -0,0 +1,271 @@
+﻿import http.client
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
+
+from metrics import HTTP_PHASE_SECONDS, HTTP_REQUESTS_TOTAL
+from rate_limit import PRIORITY_MARKET, RateLimiter
+
+
+class HTTPResponse(NamedTuple):
+    status: int
+    headers: dict  # 헤더 이름은 소문자로 정규화
+    body: bytes
+
+
+# 재사용한 연결에서 이 예외가 나면 서버가 유휴 연결을 끊은 것(stale)으로 보고 새 연결로 한 번 재시도
+# (요청을 다 보낸 뒤라면 거래소가 이미 처리했을 수 있으므로 _RESEND_METHODS만 재시도)
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.ResponseNotReady,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+_RESEND_METHODS = ("GET", "HEAD")
+
+
+def _timed_create_connection(phases: dict):
+    """socket.create_connection 대체: DNS 조회와 TCP 연결 시간을 phases에 나눠 기록합니다."""
+
+    def create(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+        host, port = address
+        t0 = time.perf_counter()
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        t1 = time.perf_counter()
+        phases["dns"] = t1 - t0
+        err = None
+        for af, socktype, proto, _, sa in infos:
+            sock = socket.socket(af, socktype, proto)
+            try:
+                if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                    sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sa)
+                phases["connect"] = time.perf_counter() - t1
+                return sock
+            except OSError as e:
+                err = e
+                sock.close()
+        raise err or OSError(f"getaddrinfo returned no addresses for {host}")
+
+    return create
+
+
+class _HostPool:
+    """하나의 (scheme, host, port)에 대한 유휴 keep-alive 연결 풀."""
+
+    def __init__(self, scheme: str, host: str, port: int | None, size: int, idle_timeout: float, ssl_context):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.size = max(1, int(size))
+        self.idle_timeout = idle_timeout
+        self.ssl_context = ssl_context
+        self._idle: deque = deque()  # (conn, released_at)
+        self._lock = threading.Lock()
+
+    def _new_conn(self, timeout: float):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def acquire(self, timeout: float):
+        """(연결, 재사용 여부)를 반환합니다. 너무 오래 놀던 연결은 버립니다."""
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, released_at = self._idle.pop()  # LIFO: 가장 최근에 쓴 연결이 살아있을 확률이 높음
+                if now - released_at <= self.idle_timeout and conn.sock is not None:
+                    conn.timeout = timeout
+                    conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+        return self._new_conn(timeout), False
+
+    def release(self, conn) -> None:
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+
+def _record(path: str, status: int, phases: dict) -> None:
+    for phase, secs in phases.items():
+        HTTP_PHASE_SECONDS.labels(path, phase).observe(secs)
+    HTTP_REQUESTS_TOTAL.labels(path, status).inc()
+
+
+class _RateLimited:
+    """호스트별 RateLimiter를 보관하는 전송 계층 공통 부분. 같은 transport를 쓰는 클라이언트끼리 한도를 공유합니다."""
+
+    def _init_limiters(self) -> None:
+        self._limiters: dict[tuple, RateLimiter] = {}
+        self._limiters_lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url: str) -> tuple:
+        parts = urlsplit(url)
+        return parts.scheme, parts.hostname or "", parts.port
+
+    def register_limiter(self, base_url: str, limiter: RateLimiter) -> RateLimiter:
+        """base_url 호스트에 limiter를 등록합니다. 이미 등록돼 있으면 기존 것을 반환합니다."""
+        with self._limiters_lock:
+            return self._limiters.setdefault(self._host_key(base_url), limiter)
+
+    def limiter_for(self, url: str) -> RateLimiter | None:
+        return self._limiters.get(self._host_key(url))
+
+    def _acquire(self, url: str, weight: int, priority: int, is_order: bool) -> RateLimiter | None:
+        limiter = self.limiter_for(url)
+        if limiter is not None:
+            limiter.acquire(weight, priority, is_order)
+        return limiter
+
+
+class HTTPTransport(_RateLimited):
+    """
+    base URL(호스트)별로 HTTP/1.1 keep-alive 연결을 풀링하는 전송 계층입니다.\n\n    - pool_size: 호스트당 보관하는 유휴 연결 수 (동시 요청이 더 많으면 임시 연결을 추가로 엽니다)\n    - idle_timeout: 이보다 오래 놀던 연결은 재사용하지 않고 새로 엽니다\n    - 재사용 연결이 끊겨 있으면(stale) 새 연결로 한 번 재시도합니다\n    - register_limiter()로 등록한 호스트는 요청 전에 가중치 예산을 확보하고 응답 헤더로 사용량을 갱신합니다\n\n    네트워크 오류는 ConnectionError로 올립니다. HTTP 4xx/5xx는 예외 없이 HTTPResponse로 돌려줍니다.
+    """
+
+    def __init__(self, pool_size: int = 4, idle_timeout: float = 50.0, ssl_context=None):
+        self.pool_size = max(1, int(pool_size))
+        self.idle_timeout = float(idle_timeout)
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self._pools: dict[tuple, _HostPool] = {}
+        self._lock = threading.Lock()
+        self._init_limiters()
+
+    def _pool_for(self, scheme: str, host: str, port: int | None) -> _HostPool:
+        key = (scheme, host, port)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = _HostPool(scheme, host, port, self.pool_size, self.idle_timeout, self.ssl_context)
+                    self._pools[key] = pool
+        return pool
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None = None,
+        headers: dict | None = None,
+        timeout: float = 10,
+        weight: int = 1,
+        priority: int = PRIORITY_MARKET,
+        is_order: bool = False,
+    ) -> HTTPResponse:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        pool = self._pool_for(parts.scheme, parts.hostname or "", parts.port)
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+        t_start = time.perf_counter()
+        limiter = self._acquire(url, weight, priority, is_order)
+        phases = {"ratelimit": time.perf_counter() - t_start} if limiter is not None else {}
+
+        for attempt in (0, 1):
+            conn, reused = pool.acquire(timeout)
+            sent = False
+            try:
+                if not reused:
+                    conn._create_connection = _timed_create_connection(phases)
+                    t0 = time.perf_counter()
+                    conn.connect()
+                    if parts.scheme == "https":
+                        phases["tls"] = time.perf_counter() - t0 - phases.get("dns", 0.0) - phases.get("connect", 0.0)
+                    # 작은 요청/응답 위주라 Nagle 지연을 끔
+                    conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                t0 = time.perf_counter()
+                conn.request(method, target, body=body, headers=headers or {})
+                sent = True
+                resp = conn.getresponse()
+                t1 = time.perf_counter()
+                data = resp.read()
+                phases["ttfb"] = t1 - t0
+                phases["read"] = time.perf_counter() - t1
+            except _STALE_ERRORS as e:
+                conn.close()
+                if reused and attempt == 0 and (not sent or method.upper() in _RESEND_METHODS):
+                    continue
+                HTTP_REQUESTS_TOTAL.labels(parts.path, "error").inc()
+                raise ConnectionError(f"Network error: {e}") from e
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                HTTP_REQUESTS_TOTAL.labels(parts.path, "error").inc()
+                raise ConnectionError(f"Network error: {e}") from e
+
+            if resp.will_close:
+                conn.close()
+            else:
+                pool.release(conn)
+            result = HTTPResponse(resp.status, {k.lower(): v for k, v in resp.getheaders()}, data)
+            if limiter is not None:
+                limiter.update(result.status, result.headers)
+            phases["total"] = time.perf_counter() - t_start
+            _record(parts.path, result.status, phases)
+            return result
+        raise ConnectionError("Network error: connection pool exhausted retries")  # pragma: no cover
+
+    def close(self) -> None:
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close()
+
+
+class UrllibTransport(_RateLimited):
+    """요청마다 urlopen을 호출하는 기존 방식의 전송 계층 (프록시 환경 등 호환용)."""
+
+    def __init__(self):
+        self._init_limiters()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None = None,
+        headers: dict | None = None,
+        timeout: float = 10,
+        weight: int = 1,
+        priority: int = PRIORITY_MARKET,
+        is_order: bool = False,
+    ) -> HTTPResponse:
+        req = Request(url=url, data=body, method=method, headers=headers or {})
+        t_start = time.perf_counter()
+        limiter = self._acquire(url, weight, priority, is_order)
+        try:
+            with urlopen(req, timeout=timeout) as resp:
+                result = HTTPResponse(resp.status, {k.lower(): v for k, v in resp.getheaders()}, resp.read())
+        except HTTPError as e:
+            result = HTTPResponse(e.code, {k.lower(): v for k, v in e.headers.items()}, e.read())
+        except URLError as e:
+            HTTP_REQUESTS_TOTAL.labels(urlsplit(url).path, "error").inc()
+            raise ConnectionError(f"Network error: {e}")
+        if limiter is not None:
+            limiter.update(result.status, result.headers)
+        _record(urlsplit(url).path, result.status, {"total": time.perf_counter() - t_start})
+        return result
+
+    def close(self) -> None:
+        pass
@@ -1,8 +1,12 @@
 ﻿import os
+import time
 import argparse
 from pprint import pprint
 
 from binance_client import BinanceClient, BinanceAPIError
+from market_hub import HubClient, hub_addr
+from market_stream import SPOT_WS_URL, SPOT_WS_TESTNET_URL
+from order_book import LocalOrderBook
 
 
 def load_env_file(path: str | None) -> None:
@@ -48,6 +52,18 @@ def resolve_base_url(args) -> str:
     )
 
 
+def resolve_ws_url(args) -> str:
+    if getattr(args, "ws_base_url", None):
+        return args.ws_base_url
+    env_ws = os.getenv("BINANCE_WS_BASE_URL")
+    if env_ws:
+        return env_ws
+    use_testnet = getattr(args, "testnet", False) or truthy(
+        os.getenv("BINANCE_TESTNET")
+    )
+    return SPOT_WS_TESTNET_URL if use_testnet else SPOT_WS_URL
+
+
 def explain_api_error(e: BinanceAPIError, args) -> None:
     code = getattr(e, "code", None)
     base_url = resolve_base_url(args)
@@ -90,6 +106,17 @@ def build_client(args) -> BinanceClient:
 
 
 def cmd_price(args):
+    if args.hub is not None:
+        # Read the latest tick from a running market_hub.py instead of calling the exchange
+        hub = HubClient([args.symbol], hub_addr(args.hub or None)).start()
+        hub.wait(0, timeout=5.0)
+        snap = hub.snapshot()
+        hub.stop()
+        if snap is None:
+            print(f"No tick for {args.symbol} from market hub {hub.addr} within 5s")
+            raise SystemExit(1)
+        print(f"{args.symbol} price: {snap[0]}")
+        return
     client = build_client(args)
     try:
         price = client.get_price(args.symbol)
@@ -99,20 +126,45 @@ def cmd_price(args):
     print(f"{args.symbol} price: {price}")
 
 
+def print_order_book(symbol: str, ob: dict, limit: int) -> None:
+    print(f"Order book {symbol} (top {limit})")
+    print("BIDS:")
+    for p, q in ob.get("bids", [])[:limit]:
+        print(f"  {p} x {q}")
+    print("ASKS:")
+    for p, q in ob.get("asks", [])[:limit]:
+        print(f"  {p} x {q}")
+
+
 def cmd_orderbook(args):
     client = build_client(args)
+    if args.live:
+        watch_order_book(client, args)
+        return
     try:
         ob = client.get_order_book(args.symbol, args.limit)
     except BinanceAPIError as e:
         explain_api_error(e, args)
         raise SystemExit(1)
-    print(f"Order book {args.symbol} (top {args.limit})")
-    print("BIDS:")
-    for p, q in ob.get("bids", [])[: args.limit]:
-        print(f"  {p} x {q}")
-    print("ASKS:")
-    for p, q in ob.get("asks", [])[: args.limit]:
-        print(f"  {p} x {q}")
+    print_order_book(args.symbol, ob, args.limit)
+
+
+def watch_order_book(client: BinanceClient, args) -> None:
+    """스냅샷 1회 + 증분 스트림으로 로컬 오더북을 유지하며 주기적으로 출력합니다."""
+    book = LocalOrderBook(client, args.symbol, resolve_ws_url(args)).start()
+    try:
+        if not book.wait_synced(15):
+            raise SystemExit("Order book sync timed out (check WebSocket URL)")
+        while True:
+            print_order_book(args.symbol, book.snapshot(args.limit), args.limit)
+            bid_qty, ask_qty = book.depth_within_bps(10)
+            print(f"depth ±10bps: bids={bid_qty:.5f} asks={ask_qty:.5f} (update {book.last_update_id})")
+            print()
+            time.sleep(args.refresh)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        book.stop()
 
 
 def cmd_balances(args):
@@ -209,6 +261,11 @@ def main():
         help="Override Binance API base URL (takes precedence over --testnet)",
     )
 
+    parser.add_argument(
+        "--ws-base-url",
+        help="Override Binance WebSocket stream base URL (used by orderbook --live)",
+    )
+
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     # config
@@ -218,12 +275,27 @@ def main():
     # price
     p = sub.add_parser("price", help="Show latest price for symbol")
     p.add_argument("--symbol", default="BTCUSDT")
+    p.add_argument(
+        "--hub",
+        nargs="?",
+        const="",
+        metavar="ADDR",
+        help="Read the price from a running market_hub.py (optional socket path or host:port)",
+    )
     p.set_defaults(func=cmd_price)
 
     # orderbook
     ob = sub.add_parser("orderbook", help="Show order book for symbol")
     ob.add_argument("--symbol", default="BTCUSDT")
     ob.add_argument("--limit", type=int, default=10)
+    ob.add_argument(
+        "--live",
+        action="store_true",
+        help="Keep a local book synced from the @depth@100ms stream and print it",
+    )
+    ob.add_argument(
+        "--refresh", type=float, default=1.0, help="Print period in seconds for --live"
+    )
     ob.set_defaults(func=cmd_orderbook)
 
     # balances
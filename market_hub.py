@@ -0,0 +1,403 @@
+﻿import os
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+from typing import Callable
+
+from binance_client import BinanceClient, BinanceAPIError
+from binance_futures_client import BinanceFuturesClient, BinanceFuturesAPIError
+from market_stream import MarketStream, SPOT_WS_URL, SPOT_WS_TESTNET_URL, FUTURES_WS_URL, FUTURES_WS_TESTNET_URL
+
+# 유닉스 소켓이 없는 플랫폼(Windows 일부)에서는 루프백 TCP로 대체
+DEFAULT_HUB_ADDR = "/tmp/binance-market-hub.sock" if hasattr(socket, "AF_UNIX") else "127.0.0.1:8799"
+
+
+def hub_addr(addr: str | None = None) -> str:
+    return addr or os.getenv("BINANCE_HUB_ADDR") or DEFAULT_HUB_ADDR
+
+
+def parse_addr(addr: str) -> tuple[int, str | tuple[str, int]]:
+    """'/path/to.sock' → 유닉스 소켓, 'host:port' → TCP."""
+    if "/" not in addr and ":" in addr:
+        host, port = addr.rsplit(":", 1)
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, addr
+
+
+def compute_basis_bps(spot_price: float, futures_mark: float) -> float:
+    if spot_price <= 0:
+        return 0.0
+    return (futures_mark - spot_price) / spot_price * 10000.0
+
+
+def encode_tick(symbol: str, spot: float, mark: float, ts_ms: int) -> bytes:
+    msg = {"s": symbol, "spot": spot, "mark": mark, "basis": compute_basis_bps(spot, mark), "t": ts_ms}
+    return (json.dumps(msg, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class _Subscriber:
+    """
+    허브에 연결된 소비자 하나. 심볼별 최신 틱만 보관(conflation)하므로 느린 소비자가 발행을 막거나 메모리를 키우지 않습니다.
+    """
+
+    def __init__(self, sock: socket.socket, name: str):
+        self.sock = sock
+        self.name = name
+        self.symbols: set[str] | None = set()  # None이면 전체
+        self._pending: dict[str, bytes] = {}
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def wants(self, symbol: str) -> bool:
+        return self.symbols is None or symbol in self.symbols
+
+    def offer(self, symbol: str, line: bytes) -> None:
+        with self._cond:
+            self._pending[symbol] = line
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def write_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self.closed)
+                if self.closed:
+                    return
+                batch, self._pending = self._pending, {}
+            try:
+                self.sock.sendall(b"".join(batch.values()))
+            except OSError:
+                self.close()
+                return
+
+
+class MarketHub:
+    """
+    거래소 연결을 하나만 유지하며 스팟/마크/베이시스 틱을 로컬 소켓으로 발행하는 시세 허브입니다.\n\n    - 소스: rest(주기 폴링, 심볼이 여러 개면 전체 현재가 + 전체 premiumIndex 2회 요청) 또는 ws(심볼별 MarketStream)\n    - 프로토콜: 줄 단위 JSON. 소비자가 {"symbols": ["BTCUSDT"]} (또는 "*")를 보내면 마지막 틱을 즉시, 이후 갱신마다 {"s","spot","mark","basis","t"}를 받음\n    - 소비자가 늘어도 거래소 요청 수는 변하지 않음
+    """
+
+    def __init__(
+        self,
+        symbols: list[str],
+        addr: str,
+        spot: BinanceClient | None = None,
+        fut: BinanceFuturesClient | None = None,
+        source: str = "rest",
+        interval: float = 1.0,
+        spot_ws_url: str = SPOT_WS_URL,
+        futures_ws_url: str = FUTURES_WS_URL,
+    ):
+        self.symbols = [s.upper() for s in symbols]
+        self.addr = addr
+        self.spot = spot
+        self.fut = fut
+        self.source = source
+        self.interval = float(interval)
+        self.spot_ws_url = spot_ws_url
+        self.futures_ws_url = futures_ws_url
+        self.last: dict[str, bytes] = {}
+        self.published = 0
+        self._subs: list[_Subscriber] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server: socket.socket | None = None
+        self._streams: list[MarketStream] = []
+
+    # ---------- 발행 ----------
+    def publish(self, symbol: str, spot: float, mark: float, ts_ms: int) -> None:
+        line = encode_tick(symbol, spot, mark, ts_ms)
+        with self._lock:
+            self.last[symbol] = line
+            self.published += 1
+            subs = list(self._subs)
+        for sub in subs:
+            if sub.wants(symbol):
+                sub.offer(symbol, line)
+
+    def _poll_loop(self) -> None:
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                if len(self.symbols) == 1:
+                    sym = self.symbols[0]
+                    prices = {sym: self.spot.get_price(sym)}
+                    marks = {sym: self.fut.get_mark_price(sym)}
+                else:
+                    prices = self.spot.get_all_prices()
+                    marks = self.fut.get_all_mark_prices()
+                ts_ms = int(time.time() * 1000)
+                for sym in self.symbols:
+                    if sym in prices and sym in marks:
+                        self.publish(sym, prices[sym], marks[sym], ts_ms)
+            except (BinanceAPIError, BinanceFuturesAPIError, ConnectionError) as e:
+                print(f"hub data error: {e}")
+            next_at += self.interval
+            now = time.monotonic()
+            if next_at < now:
+                next_at = now
+            self._stop.wait(next_at - now)
+
+    # ---------- 소비자 ----------
+    def _accept_loop(self) -> None:
+        n = 0
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            n += 1
+            sub = _Subscriber(conn, f"sub-{n}")
+            threading.Thread(target=self._serve, args=(sub,), name=sub.name, daemon=True).start()
+
+    def _serve(self, sub: _Subscriber) -> None:
+        """구독 요청 줄을 읽어 등록하고, 연결이 끊길 때까지 추가 요청(구독 변경)을 처리합니다."""
+        threading.Thread(target=sub.write_loop, name=f"{sub.name}-writer", daemon=True).start()
+        with self._lock:
+            self._subs.append(sub)
+        try:
+            for raw in sub.sock.makefile("rb"):
+                try:
+                    req = json.loads(raw)
+                    want = req["symbols"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                with self._lock:
+                    # 잠금 안에서 넘겨야 동시에 발행된 더 새로운 틱을 옛 값으로 덮지 않음
+                    sub.symbols = None if want == "*" else {str(s).upper() for s in want}
+                    for s, line in self.last.items():
+                        if sub.wants(s):
+                            sub.offer(s, line)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                if sub in self._subs:
+                    self._subs.remove(sub)
+            sub.close()
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    # ---------- 수명 ----------
+    def start(self) -> "MarketHub":
+        family, address = parse_addr(self.addr)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.unlink(address)  # 이전 실행이 남긴 소켓 파일
+        srv = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        srv.bind(address)
+        srv.listen(64)
+        self._server = srv
+        threading.Thread(target=self._accept_loop, name="hub-accept", daemon=True).start()
+        if self.source == "ws":
+            for sym in self.symbols:
+                cb = lambda s, m, ts, sym=sym: self.publish(sym, s, m, ts)
+                self._streams.append(MarketStream(sym, self.spot_ws_url, self.futures_ws_url, on_update=cb).start())
+        else:
+            threading.Thread(target=self._poll_loop, name="hub-poll", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        for st in self._streams:
+            st.stop()
+        if self._server is not None:
+            self._server.close()
+        with self._lock:
+            subs, self._subs = self._subs, []
+        for sub in subs:
+            sub.close()
+        family, address = parse_addr(self.addr)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.unlink(address)
+
+
+class HubClient:
+    """
+    허브 구독자입니다. MarketStream과 같은 snapshot()/wait() 인터페이스라 --feed ws 자리에 그대로 쓸 수 있습니다.\n    on_update(symbol, spot, mark, ts_ms)는 틱마다 수신 스레드에서 호출됩니다.\n    허브가 재시작되면 지수 백오프로 다시 연결해 같은 심볼을 구독합니다.
+    """
+
+    def __init__(
+        self,
+        symbols: list[str],
+        addr: str,
+        backoff_min: float = 0.2,
+        backoff_max: float = 5.0,
+        on_update: Callable[[str, float, float, int], None] | None = None,
+    ):
+        self.symbols = [s.upper() for s in symbols]
+        self.on_update = on_update
+        self.symbol = self.symbols[0] if self.symbols else ""
+        self.addr = addr
+        self.backoff_min = float(backoff_min)
+        self.backoff_max = float(backoff_max)
+        self.connected = False
+        self.seq = 0
+        self.ticks: dict[str, tuple[float, float, int]] = {}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._sock: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "HubClient":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="hub-client", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _run(self) -> None:
+        delay = self.backoff_min
+        warned = False
+        while not self._stop.is_set():
+            family, address = parse_addr(self.addr)
+            try:
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                sock.connect(address)
+                self._sock = sock
+                req = {"symbols": self.symbols or "*"}
+                sock.sendall((json.dumps(req) + "\n").encode("utf-8"))
+                self.connected = True
+                delay, warned = self.backoff_min, False
+                for raw in sock.makefile("rb"):
+                    self._on_line(raw)
+            except OSError as e:
+                if not warned and not self._stop.is_set():
+                    print(f"warn: market hub {self.addr} unavailable: {e}")
+                    warned = True
+            finally:
+                self.connected = False
+                if self._sock is not None:
+                    self._sock.close()
+                    self._sock = None
+            self._stop.wait(delay * random.uniform(0.8, 1.2))
+            delay = min(self.backoff_max, delay * 2)
+
+    def _on_line(self, raw: bytes) -> None:
+        try:
+            d = json.loads(raw)
+            tick = (float(d["spot"]), float(d["mark"]), int(d["t"]))
+            sym = d["s"]
+        except (ValueError, KeyError, TypeError):
+            return
+        with self._cond:
+            self.ticks[sym] = tick
+            self.seq += 1
+            self._cond.notify_all()
+        if self.on_update:
+            self.on_update(sym, *tick)
+
+    def snapshot(self, max_age: float | None = None, symbol: str | None = None) -> tuple[float, float, int] | None:
+        """(spot, mark, ts_ms). 값이 없거나 max_age(초)보다 오래됐으면 None."""
+        with self._cond:
+            snap = self.ticks.get(symbol or self.symbol)
+        if snap and max_age is not None and time.time() * 1000 - snap[2] > max_age * 1000:
+            return None
+        return snap
+
+    def snapshot_all(self, max_age: float | None = None) -> dict[str, tuple[float, float, int]]:
+        with self._cond:
+            ticks = dict(self.ticks)
+        if max_age is None:
+            return ticks
+        cutoff = time.time() * 1000 - max_age * 1000
+        return {s: t for s, t in ticks.items() if t[2] >= cutoff}
+
+    def wait(self, last_seq: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > last_seq, timeout=timeout)
+            return self.seq
+
+
+def load_env_file(path: str | None) -> None:
+    if not path or not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            k, v = line.split("=", 1)
+            os.environ[k.strip()] = v.strip().strip('"').strip("'")
+
+
+def truthy(s: str | None) -> bool:
+    return bool(s) and s.strip().lower() in {"1", "true", "yes", "on", "y"}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="로컬 시세 허브: 한 번 받은 스팟/마크 시세를 여러 소비자(러너/플롯/CLI)에 발행")
+    ap.add_argument("--env", help=".env 파일 경로(기본: ./.env 자동 로드)")
+    ap.add_argument("--symbols", default="BTCUSDT", help="발행할 심볼 목록 (쉼표 구분)")
+    ap.add_argument("--feed", choices=["rest", "ws"], default="ws", help="거래소 시세 소스")
+    ap.add_argument("--interval", type=float, default=1.0, help="rest 폴링 간격(초)")
+    ap.add_argument("--addr", help=f"구독 주소: 소켓 경로 또는 host:port (기본: BINANCE_HUB_ADDR 또는 {DEFAULT_HUB_ADDR})")
+    ap.add_argument("--testnet", action="store_true", help="스팟 테스트넷 사용")
+    ap.add_argument("--futures-testnet", action="store_true", help="선물 테스트넷 사용")
+    ap.add_argument("--base-url", help="스팟 베이스 URL 수동 지정")
+    ap.add_argument("--futures-base-url", help="선물 베이스 URL 수동 지정")
+    ap.add_argument("--ws-base-url", help="스팟 WebSocket 베이스 URL 수동 지정")
+    ap.add_argument("--futures-ws-base-url", help="선물 WebSocket 베이스 URL 수동 지정")
+    args = ap.parse_args()
+    load_env_file(args.env or ".env")
+
+    testnet = args.testnet or truthy(os.getenv("BINANCE_TESTNET"))
+    f_testnet = args.futures_testnet or truthy(os.getenv("BINANCE_FUTURES_TESTNET"))
+    spot_url = args.base_url or os.getenv("BINANCE_BASE_URL") or (
+        "https://testnet.binance.vision" if testnet else "https://api.binance.com"
+    )
+    fut_url = args.futures_base_url or os.getenv("BINANCE_FUTURES_BASE_URL") or (
+        "https://testnet.binancefuture.com" if f_testnet else "https://fapi.binance.com"
+    )
+    spot_ws = args.ws_base_url or os.getenv("BINANCE_WS_BASE_URL") or (SPOT_WS_TESTNET_URL if testnet else SPOT_WS_URL)
+    fut_ws = args.futures_ws_base_url or os.getenv("BINANCE_FUTURES_WS_BASE_URL") or (
+        FUTURES_WS_TESTNET_URL if f_testnet else FUTURES_WS_URL
+    )
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    hub = MarketHub(
+        symbols,
+        hub_addr(args.addr),
+        BinanceClient(base_url=spot_url),
+        BinanceFuturesClient(base_url=fut_url),
+        source=args.feed,
+        interval=args.interval,
+        spot_ws_url=spot_ws,
+        futures_ws_url=fut_ws,
+    ).start()
+    print(f"market hub: {len(symbols)} symbols via {args.feed} on {hub.addr}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"hub: subscribers={hub.subscribers} published={hub.published}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+﻿import json
+import time
+import random
+import socket
+import threading
+from typing import Callable
+
+from ws_client import WebSocket, WebSocketClosed
+
+SPOT_WS_URL = "wss://stream.binance.com:9443"
+SPOT_WS_TESTNET_URL = "wss://testnet.binance.vision"
+FUTURES_WS_URL = "wss://fstream.binance.com"
+FUTURES_WS_TESTNET_URL = "wss://stream.binancefuture.com"
+
+
+class StreamConnection:
+    """
+    Binance combined stream(/stream?streams=a/b) 하나를 백그라운드 스레드에서 유지합니다.\n\n    - 연결이 끊기면 지수 백오프(+지터)로 재연결\n    - heartbeat 초 동안 수신이 없으면 ping, 그 두 배 동안 없으면 연결을 버리고 재연결\n    - 메시지는 on_message(stream, data) 콜백으로 전달 (수신 스레드에서 호출됨)
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        streams: list[str],
+        on_message: Callable[[str, dict], None],
+        heartbeat: float = 15.0,
+        backoff_min: float = 0.5,
+        backoff_max: float = 30.0,
+        name: str = "stream",
+        on_connect: Callable[[], None] | None = None,
+    ):
+        self.url = f"{base_url.rstrip('/')}/stream?streams={'/'.join(streams)}"
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.heartbeat = float(heartbeat)
+        self.backoff_min = float(backoff_min)
+        self.backoff_max = float(backoff_max)
+        self.name = name
+        self.connected = False
+        self.reconnects = 0
+        self._ws: WebSocket | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            ws.close()
+
+    def _run(self) -> None:
+        delay = self.backoff_min
+        while not self._stop.is_set():
+            try:
+                self._ws = WebSocket.connect(self.url, timeout=10)
+                self._ws.settimeout(self.heartbeat)
+                self.connected = True
+                delay = self.backoff_min
+                if self.on_connect:
+                    self.on_connect()
+                self._read_loop(self._ws)
+            except (WebSocketClosed, OSError) as e:
+                if self._stop.is_set():
+                    break
+                print(f"warn: {self.name} disconnected: {e}")
+            finally:
+                self.connected = False
+                if self._ws is not None:
+                    self._ws.close()
+                    self._ws = None
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            self._stop.wait(delay * random.uniform(0.8, 1.2))
+            delay = min(self.backoff_max, delay * 2)
+
+    def _read_loop(self, ws: WebSocket) -> None:
+        pinged = False
+        while not self._stop.is_set():
+            try:
+                raw = ws.recv()
+            except socket.timeout:
+                if pinged:
+                    raise WebSocketClosed(f"no data for {self.heartbeat * 2:.0f}s")
+                ws.send_ping()
+                pinged = True
+                continue
+            pinged = False
+            try:
+                msg = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(msg, dict) and "stream" in msg:
+                self.on_message(msg["stream"], msg.get("data") or {})
+
+
+class MarketStream:
+    """
+    스팟 bookTicker(중간가)와 선물 markPrice@1s를 구독해 최신 값을 유지하는 실시간 피드입니다.\n    snapshot()은 (spot_mid, mark, ts_ms)를 돌려주고, wait()로 다음 갱신을 기다릴 수 있습니다.\n    ts_ms는 두 레그 중 더 오래된 쪽의 수신 시각이라, 한쪽 스트림만 끊겨도 스냅샷이 오래된 것으로 판정됩니다.
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        spot_ws_url: str = SPOT_WS_URL,
+        futures_ws_url: str = FUTURES_WS_URL,
+        heartbeat: float = 15.0,
+        on_update: Callable[[float, float, int], None] | None = None,
+    ):
+        self.symbol = symbol.upper()
+        s = symbol.lower()
+        self.on_update = on_update
+        self.spot_bid = 0.0
+        self.spot_ask = 0.0
+        self.mark = 0.0
+        self.spot_ts_ms = 0  # 레그별 마지막 수신 시각
+        self.mark_ts_ms = 0
+        self.seq = 0
+        self._cond = threading.Condition()
+        self.spot_conn = StreamConnection(
+            spot_ws_url, [f"{s}@bookTicker"], self._on_spot, heartbeat, name=f"ws-spot-{s}"
+        )
+        self.futures_conn = StreamConnection(
+            futures_ws_url, [f"{s}@markPrice@1s"], self._on_futures, heartbeat, name=f"ws-fut-{s}"
+        )
+
+    @property
+    def spot_mid(self) -> float:
+        if self.spot_bid <= 0 or self.spot_ask <= 0:
+            return 0.0
+        return (self.spot_bid + self.spot_ask) / 2
+
+    @property
+    def ts_ms(self) -> int:
+        return min(self.spot_ts_ms, self.mark_ts_ms)
+
+    def start(self) -> "MarketStream":
+        self.spot_conn.start()
+        self.futures_conn.start()
+        return self
+
+    def stop(self) -> None:
+        self.spot_conn.stop()
+        self.futures_conn.stop()
+
+    def _on_spot(self, stream: str, d: dict) -> None:
+        try:
+            bid, ask = float(d["b"]), float(d["a"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._cond:
+            self.spot_bid, self.spot_ask = bid, ask
+            self.spot_ts_ms = int(time.time() * 1000)
+        self._publish()
+
+    def _on_futures(self, stream: str, d: dict) -> None:
+        p = d.get("p", d.get("markPrice"))
+        try:
+            mark = float(p)
+        except (TypeError, ValueError):
+            return
+        with self._cond:
+            self.mark = mark
+            self.mark_ts_ms = int(time.time() * 1000)
+        self._publish()
+
+    def _publish(self) -> None:
+        with self._cond:
+            self.seq += 1
+            self._cond.notify_all()
+            snap = self._snapshot_locked()
+        if snap and self.on_update:
+            self.on_update(*snap)
+
+    def _snapshot_locked(self) -> tuple[float, float, int] | None:
+        mid = self.spot_mid
+        if mid <= 0 or self.mark <= 0:
+            return None
+        return mid, self.mark, self.ts_ms
+
+    def snapshot(self, max_age: float | None = None) -> tuple[float, float, int] | None:
+        """양쪽 가격이 모두 있으면 (spot_mid, mark, ts_ms). 더 오래된 레그가 max_age(초)보다 오래됐으면 None."""
+        with self._cond:
+            snap = self._snapshot_locked()
+        if snap and max_age is not None and time.time() * 1000 - snap[2] > max_age * 1000:
+            return None
+        return snap
+
+    def wait(self, last_seq: int, timeout: float) -> int:
+        """seq가 last_seq보다 커질 때까지(또는 timeout) 기다린 뒤 현재 seq를 반환합니다."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > last_seq, timeout=timeout)
+            return self.seq
@@ -0,0 +1,222 @@
+﻿import time
+import threading
+from bisect import bisect_left
+from typing import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 지연 시간 히스토그램 기본 버킷(초): 0.25ms ~ 10s
+LATENCY_BUCKETS = (0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막 칸은 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, v: float) -> None:
+        i = bisect_left(self.buckets, v)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+
+class _Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1.0) -> None:
+        with self._lock:
+            self.value += n
+
+
+class _Gauge:
+    __slots__ = ("value", "fn")
+
+    def __init__(self):
+        self.value = 0.0
+        self.fn: Callable[[], float] | None = None
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """렌더링할 때마다 fn()을 호출해 값을 읽습니다."""
+        self.fn = fn
+
+    def get(self) -> float:
+        return float(self.fn()) if self.fn is not None else self.value
+
+
+class timed:
+    """with timed(HIST.labels(...)): 블록 실행 시간을 히스토그램에 기록합니다."""
+
+    __slots__ = ("child", "t0")
+
+    def __init__(self, child: _Histogram):
+        self.child = child
+
+    def __enter__(self) -> "timed":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.child.observe(time.perf_counter() - self.t0)
+
+
+class Family:
+    """이름/라벨 이름이 같은 시계열 묶음. labels(...)로 자식(시계열)을 얻어 기록합니다."""
+
+    def __init__(self, kind: str, name: str, help: str, labelnames: tuple, factory: Callable):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            if self.kind == "histogram":
+                with child._lock:
+                    counts, total, n = list(child.counts), child.sum, child.count
+                acc = 0
+                for le, c in zip(child.buckets + (float("inf"),), counts):
+                    acc += c
+                    le_label = 'le="' + _num(le) + '"'
+                    lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, key, le_label)} {acc}")
+                lines.append(f"{self.name}_sum{_labels_text(self.labelnames, key)} {_num(total)}")
+                lines.append(f"{self.name}_count{_labels_text(self.labelnames, key)} {n}")
+            elif self.kind == "counter":
+                lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {_num(child.value)}")
+            else:
+                try:
+                    v = child.get()
+                except Exception:
+                    continue
+                lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {_num(v)}")
+        return lines
+
+
+class Registry:
+    """
+    프로세스 내 메트릭 저장소입니다. 기록은 잠금 한 번 + 덧셈 정도라 상시 켜 두어도 부담이 없습니다.\n    render()는 Prometheus 텍스트 포맷(0.0.4)을 돌려줍니다.
+    """
+
+    def __init__(self):
+        self._families: dict[str, Family] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, kind: str, name: str, help: str, labelnames: tuple, factory: Callable) -> Family:
+        with self._lock:
+            fam = self._families.get(name)
+            if fam is None:
+                fam = Family(kind, name, help, labelnames, factory)
+                self._families[name] = fam
+            elif fam.kind != kind:
+                raise ValueError(f"metric {name} already registered as {fam.kind}")
+            return fam
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Family:
+        return self._family("histogram", name, help, labelnames, lambda: _Histogram(tuple(buckets)))
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Family:
+        return self._family("counter", name, help, labelnames, _Counter)
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Family:
+        return self._family("gauge", name, help, labelnames, _Gauge)
+
+    def render(self) -> str:
+        with self._lock:
+            fams = list(self._families.values())
+        lines = []
+        for fam in fams:
+            lines.extend(fam.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------- 공용 계측 항목 ----------
+# phase: ratelimit(한도 대기) dns connect tls ttfb(요청 전송~헤더 수신) read(본문) parse(JSON) total
+HTTP_PHASE_SECONDS = REGISTRY.histogram(
+    "binance_http_phase_seconds", "REST request latency by endpoint and phase", ("path", "phase")
+)
+HTTP_REQUESTS_TOTAL = REGISTRY.counter(
+    "binance_http_requests_total", "REST requests by endpoint and HTTP status", ("path", "status")
+)
+API_ERRORS_TOTAL = REGISTRY.counter(
+    "binance_api_errors_total", "Binance API errors by market and error code", ("market", "code")
+)
+# stage: fetch(시세 수집) decide(진입/청산 판단, 사이징 포함) execute(두 레그 주문) persist(상태 기록)
+LOOP_STAGE_SECONDS = REGISTRY.histogram("arb_loop_stage_seconds", "Runner loop stage timings", ("stage",))
+LEG_ACK_SECONDS = REGISTRY.histogram("arb_leg_ack_seconds", "Order leg send-to-ack latency", ("leg",))
+USED_WEIGHT = REGISTRY.gauge("binance_used_weight", "Request weight used in the current window", ("market",))
+CLOCK_OFFSET_MS = REGISTRY.gauge("binance_clock_offset_ms", "Estimated server minus local clock offset", ("market",))
+ENDPOINT_RTT_MS = REGISTRY.gauge("binance_endpoint_rtt_ms", "Smoothed probe round-trip time per API host", ("host",))
+# result: sent(중복 요청 발송) primary(원 요청이 먼저 응답) hedge(중복 요청이 먼저 응답)
+HEDGED_REQUESTS_TOTAL = REGISTRY.counter("binance_hedged_requests_total", "Hedged market-data GETs by outcome", ("result",))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """백그라운드 스레드에서 GET /metrics 를 제공합니다."""
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    srv = ThreadingHTTPServer((host, port), handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, name="metrics-http", daemon=True).start()
+    return srv
@@ -0,0 +1,257 @@
+﻿import threading
+from array import array
+from bisect import bisect_left
+from typing import Callable
+
+from market_stream import StreamConnection
+
+
+class BookSide:
+    """
+    한쪽 호가를 정렬된 array('d') 두 개(키, 수량)로 보관합니다.\n    키는 항상 오름차순이고 최우선 호가가 배열 끝에 오도록 bids는 가격, asks는 -가격을 키로 씁니다.\n    최우선 호가 조회/갱신은 O(1), 임의 레벨 갱신은 bisect + memmove 입니다.
+    """
+
+    __slots__ = ("is_bid", "keys", "qtys")
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.keys = array("d")
+        self.qtys = array("d")
+
+    def _key(self, price: float) -> float:
+        return price if self.is_bid else -price
+
+    def clear(self) -> None:
+        del self.keys[:]
+        del self.qtys[:]
+
+    def load(self, levels) -> None:
+        """[[price, qty], ...] 스냅샷으로 교체합니다 (순서 무관)."""
+        pairs = sorted((self._key(float(p)), float(q)) for p, q in levels if float(q) > 0)
+        self.keys = array("d", (k for k, _ in pairs))
+        self.qtys = array("d", (q for _, q in pairs))
+
+    def set(self, price: float, qty: float) -> None:
+        key = self._key(price)
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if qty > 0:
+                self.qtys[i] = qty
+            else:
+                del keys[i]
+                del self.qtys[i]
+        elif qty > 0:
+            keys.insert(i, key)
+            self.qtys.insert(i, qty)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def best(self) -> tuple[float, float] | None:
+        if not self.keys:
+            return None
+        k = self.keys[-1]
+        return (k if self.is_bid else -k), self.qtys[-1]
+
+    def levels(self, n: int) -> list[tuple[float, float]]:
+        """최우선부터 n개 레벨 [(price, qty), ...]."""
+        n = min(n, len(self.keys))
+        if n <= 0:
+            return []
+        sign = 1.0 if self.is_bid else -1.0
+        ks = self.keys[-n:]
+        qs = self.qtys[-n:]
+        return [(sign * ks[i], qs[i]) for i in range(n - 1, -1, -1)]
+
+    def qty_through(self, price: float) -> float:
+        """최우선부터 price(포함)까지의 누적 수량."""
+        i = bisect_left(self.keys, self._key(price))
+        return sum(self.qtys[i:])
+
+    def notional_through(self, price: float) -> float:
+        i = bisect_left(self.keys, self._key(price))
+        sign = 1.0 if self.is_bid else -1.0
+        return sign * sum(map(float.__mul__, self.keys[i:], self.qtys[i:]))
+
+
+class LocalOrderBook:
+    """
+    REST 스냅샷 + @depth@100ms 증분 스트림으로 로컬 오더북을 유지합니다.\n\n    Binance 동기화 규칙을 따르며(스팟: U/u 연속성, 선물: pu == 직전 u), 시퀀스 갭이나\n    재연결이 감지되면 스냅샷을 다시 받아 재동기화합니다. 조회는 REST 호출 없이 메모리에서 처리됩니다.
+    """
+
+    def __init__(
+        self,
+        client,
+        symbol: str,
+        ws_url: str,
+        futures: bool = False,
+        snapshot_limit: int = 1000,
+        on_update: Callable[["LocalOrderBook"], None] | None = None,
+    ):
+        self.client = client
+        self.symbol = symbol.upper()
+        self.futures = futures
+        self.snapshot_limit = snapshot_limit
+        self.on_update = on_update
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.last_update_id = 0
+        self.synced = False
+        self.resyncs = 0
+        self._fresh = True  # 스냅샷 직후: 첫 증분 이벤트 규칙 적용
+        self._synced_evt = threading.Event()
+        self._buffer: list[dict] = []
+        self._lock = threading.Lock()
+        self._need_sync = threading.Event()
+        self._stop = threading.Event()
+        self._sync_thread: threading.Thread | None = None
+        self.conn = StreamConnection(
+            ws_url,
+            [f"{symbol.lower()}@depth@100ms"],
+            self._on_message,
+            name=f"ws-depth-{'fut' if futures else 'spot'}-{symbol.lower()}",
+            on_connect=self._invalidate,
+        )
+
+    # ---------- 수명주기 ----------
+    def start(self) -> "LocalOrderBook":
+        self._stop.clear()
+        self._sync_thread = threading.Thread(target=self._sync_loop, name=f"book-sync-{self.symbol}", daemon=True)
+        self._sync_thread.start()
+        self.conn.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._need_sync.set()
+        self.conn.stop()
+
+    def wait_synced(self, timeout: float) -> bool:
+        return self._synced_evt.wait(timeout)
+
+    # ---------- 동기화 ----------
+    def _invalidate(self) -> None:
+        with self._lock:
+            self.synced = False
+            self._synced_evt.clear()
+            self._buffer.clear()
+        self._need_sync.set()
+
+    def _on_message(self, stream: str, ev: dict) -> None:
+        with self._lock:
+            if not self.synced:
+                self._buffer.append(ev)
+                return
+            if self._apply(ev):
+                changed = True
+            else:
+                print(f"warn: {self.symbol} depth sequence gap, resyncing")
+                self.synced = False
+                self._synced_evt.clear()
+                self._buffer = [ev]
+                self._need_sync.set()
+                changed = False
+        if changed and self.on_update:
+            self.on_update(self)
+
+    def _sync_loop(self) -> None:
+        while not self._stop.is_set():
+            self._need_sync.wait()
+            if self._stop.is_set():
+                return
+            self._need_sync.clear()
+            try:
+                snap = self.client.get_order_book(self.symbol, self.snapshot_limit)
+            except Exception as e:
+                print(f"warn: {self.symbol} depth snapshot failed: {e}")
+                self._stop.wait(1.0)
+                self._need_sync.set()
+                continue
+            with self._lock:
+                self.bids.load(snap.get("bids", []))
+                self.asks.load(snap.get("asks", []))
+                self.last_update_id = int(snap.get("lastUpdateId", 0))
+                self._fresh = True
+                pending, self._buffer = self._buffer, []
+                ok = self._replay(pending)
+                self.synced = ok
+                if ok:
+                    self.resyncs += 1
+                    self._synced_evt.set()
+                else:
+                    # 스냅샷이 버퍼보다 앞서거나 뒤처짐: 다시 시도
+                    self._need_sync.set()
+            if not ok:
+                self._stop.wait(0.2)
+
+    def _replay(self, pending: list[dict]) -> bool:
+        for ev in pending:
+            if not self._apply(ev):
+                return False
+        return True
+
+    def _apply(self, ev: dict) -> bool:
+        """연속성 검사 후 적용. 갭이면 False (적용하지 않음)."""
+        U, u = int(ev["U"]), int(ev["u"])
+        lid = self.last_update_id
+        if self._fresh:
+            if u < lid or (not self.futures and u == lid):
+                return True  # 스냅샷에 이미 반영된 이벤트
+            # 스냅샷 이후 첫 이벤트는 lastUpdateId를 걸치거나(선물은 pu로) 바로 이어져야 함
+            if self.futures:
+                ok = U <= lid <= u or int(ev.get("pu", -1)) == lid
+            else:
+                ok = U <= lid + 1 <= u
+            if not ok:
+                return False
+            self._fresh = False
+        elif self.futures:
+            if int(ev.get("pu", -1)) != lid:
+                return False
+        elif U != lid + 1:
+            return False
+        self._apply_levels(ev)
+        self.last_update_id = u
+        return True
+
+    def _apply_levels(self, ev: dict) -> None:
+        for p, q in ev.get("b", []):
+            self.bids.set(float(p), float(q))
+        for p, q in ev.get("a", []):
+            self.asks.set(float(p), float(q))
+
+    # ---------- 조회 ----------
+    def best_bid(self) -> tuple[float, float] | None:
+        with self._lock:
+            return self.bids.best()
+
+    def best_ask(self) -> tuple[float, float] | None:
+        with self._lock:
+            return self.asks.best()
+
+    def mid(self) -> float:
+        with self._lock:
+            b, a = self.bids.best(), self.asks.best()
+        if not b or not a:
+            return 0.0
+        return (b[0] + a[0]) / 2
+
+    def snapshot(self, limit: int = 10) -> dict:
+        """get_order_book()과 같은 형태({lastUpdateId, bids, asks})로 상위 limit 레벨을 반환합니다."""
+        with self._lock:
+            return {
+                "lastUpdateId": self.last_update_id,
+                "bids": [[p, q] for p, q in self.bids.levels(limit)],
+                "asks": [[p, q] for p, q in self.asks.levels(limit)],
+            }
+
+    def depth_within_bps(self, bps: float) -> tuple[float, float]:
+        """중간가 ±bps 이내 누적 수량 (bid_qty, ask_qty)."""
+        with self._lock:
+            b, a = self.bids.best(), self.asks.best()
+            if not b or not a:
+                return 0.0, 0.0
+            mid = (b[0] + a[0]) / 2
+            r = bps / 10000.0
+            return self.bids.qty_through(mid * (1 - r)), self.asks.qty_through(mid * (1 + r))
@@ -0,0 +1,261 @@
+﻿import json
+import time
+import random
+import socket
+import itertools
+import threading
+
+from binance_client import BinanceAPIError, BinanceClient
+from binance_futures_client import BinanceFuturesAPIError, BinanceFuturesClient
+from rate_limit import PRIORITY_ORDER
+from ws_client import WebSocket, WebSocketClosed
+
+SPOT_WS_API_URL = "wss://ws-api.binance.com:443/ws-api/v3"
+SPOT_WS_API_TESTNET_URL = "wss://ws-api.testnet.binance.vision/ws-api/v3"
+FUTURES_WS_API_URL = "wss://ws-fapi.binance.com/ws-fapi/v1"
+FUTURES_WS_API_TESTNET_URL = "wss://testnet.binancefuture.com/ws-fapi/v1"
+
+# WebSocket API rateLimits 항목 → RateLimiter.update() 헤더 이름
+_RATE_LIMIT_HEADERS = {
+    ("REQUEST_WEIGHT", "MINUTE", 1): "x-mbx-used-weight-1m",
+    ("ORDERS", "SECOND", 10): "x-mbx-order-count-10s",
+}
+
+
+def _param_value(v) -> str | int:
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    return v if type(v) is int else str(v)
+
+
+class _Pending:
+    __slots__ = ("event", "response")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response: dict | Exception | None = None
+
+
+class WsApiSession:
+    """
+    바이낸스 WebSocket API 연결 하나를 유지하며 요청/응답을 id로 짝지어 주는 세션입니다.\n\n    - 백그라운드 스레드가 연결/재연결(지수 백오프)과 수신을 담당하고, request()는 응답이 올 때까지 호출 스레드에서 대기\n    - Ed25519 키면 연결 직후 session.logon으로 인증하고 이후 요청은 apiKey/signature 없이 보냄. HMAC/RSA 키는 요청마다 서명\n    - 응답 대기 중 연결이 끊기면 결과를 알 수 없으므로 ConnectionError로 실패 처리 (REST 네트워크 오류와 같은 의미)\n    - 에러 응답은 REST 클라이언트와 같은 예외(BinanceAPIError / BinanceFuturesAPIError)로 올림
+    """
+
+    def __init__(
+        self,
+        url: str,
+        client: BinanceClient | BinanceFuturesClient,
+        error_cls: type = BinanceAPIError,
+        name: str = "ws-api",
+        timeout: float = 10.0,
+        heartbeat: float = 30.0,
+        backoff_min: float = 0.5,
+        backoff_max: float = 30.0,
+    ):
+        self.url = url
+        self.client = client
+        self.error_cls = error_cls
+        self.name = name
+        self.timeout = float(timeout)
+        self.heartbeat = float(heartbeat)
+        self.backoff_min = float(backoff_min)
+        self.backoff_max = float(backoff_max)
+        self.reconnects = 0
+        self.logged_on = False
+        self._ws: WebSocket | None = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._pending: dict[str, _Pending] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._prefix = f"{name}-{random.getrandbits(32):08x}-"
+        self._thread: threading.Thread | None = None
+
+    # ---------- 연결 ----------
+    def start(self) -> "WsApiSession":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def wait_ready(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    @property
+    def connected(self) -> bool:
+        return self._ready.is_set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            ws.close()
+
+    def _run(self) -> None:
+        delay = self.backoff_min
+        while not self._stop.is_set():
+            try:
+                ws = WebSocket.connect(self.url, timeout=10)
+                ws.settimeout(self.heartbeat)
+                self._ws = ws
+                # logon 응답도 수신 루프가 받아야 하므로 별도 스레드에서 보내고 기다림
+                threading.Thread(target=self._logon, args=(ws,), name=f"{self.name}-logon", daemon=True).start()
+                delay = self.backoff_min
+                self._read_loop(ws)
+            except (WebSocketClosed, OSError) as e:
+                if self._stop.is_set():
+                    break
+                print(f"warn: {self.name} disconnected: {e}")
+            finally:
+                self._ready.clear()
+                self.logged_on = False
+                if self._ws is not None:
+                    self._ws.close()
+                    self._ws = None
+                self._fail_pending(ConnectionError(f"{self.name}: connection lost before response"))
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            self._stop.wait(delay * random.uniform(0.8, 1.2))
+            delay = min(self.backoff_max, delay * 2)
+
+    def _logon(self, ws: WebSocket) -> None:
+        if getattr(self.client.signer, "kind", "") == "ed25519":
+            try:
+                self._call(ws, "session.logon", self._signed({}, include_key=True))
+                self.logged_on = True
+            except Exception as e:
+                # logon 실패 시에도 요청마다 서명하는 방식으로 계속 사용 가능
+                print(f"warn: {self.name} session.logon failed: {e}")
+        self._ready.set()
+
+    def _read_loop(self, ws: WebSocket) -> None:
+        pinged = False
+        while not self._stop.is_set():
+            try:
+                raw = ws.recv()
+            except socket.timeout:
+                if pinged:
+                    raise WebSocketClosed(f"no data for {self.heartbeat * 2:.0f}s")
+                ws.send_ping()
+                pinged = True
+                continue
+            pinged = False
+            try:
+                msg = json.loads(raw)
+            except ValueError:
+                continue
+            if not isinstance(msg, dict):
+                continue
+            self._sync_limits(msg.get("status", 200), msg.get("rateLimits"))
+            with self._lock:
+                pending = self._pending.pop(str(msg.get("id")), None)
+            if pending is not None:
+                pending.response = msg
+                pending.event.set()
+
+    def _fail_pending(self, exc: Exception) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for p in pending.values():
+            p.response = exc
+            p.event.set()
+
+    def _sync_limits(self, status: int, limits: list | None) -> None:
+        if not limits and status not in (418, 429):
+            return
+        headers = {}
+        for lim in limits or ():
+            key = _RATE_LIMIT_HEADERS.get((lim.get("rateLimitType"), lim.get("interval"), lim.get("intervalNum")))
+            if key and "count" in lim:
+                headers[key] = str(lim["count"])
+        self.client.limiter.update(status, headers)
+
+    # ---------- 요청 ----------
+    def _signed(self, params: dict, include_key: bool) -> dict:
+        c = self.client
+        if not c.api_key or c.signer is None:
+            raise ValueError("Signed endpoint requires api_key and api_secret (or a private key)")
+        ts = c.time_sync
+        params = {k: _param_value(v) for k, v in params.items() if v is not None}
+        params.setdefault("recvWindow", ts.recv_window(c.recv_window) if ts else c.recv_window)
+        params["timestamp"] = ts.now_ms() if ts else int(time.time() * 1000)
+        if include_key:
+            params["apiKey"] = c.api_key
+            # WebSocket API 서명 대상: signature를 뺀 파라미터를 이름순 정렬한 key=value&... (값은 인코딩하지 않음)
+            payload = "&".join(f"{k}={params[k]}" for k in sorted(params))
+            params["signature"] = c.signer.signature(payload)
+        return params
+
+    def _call(self, ws: WebSocket, method: str, params: dict) -> dict:
+        req_id = f"{self._prefix}{next(self._ids)}"
+        pending = _Pending()
+        with self._lock:
+            self._pending[req_id] = pending
+        try:
+            ws.send_text(json.dumps({"id": req_id, "method": method, "params": params}, separators=(",", ":")))
+        except WebSocketClosed as e:
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise ConnectionError(f"{self.name}: send failed: {e}") from e
+        if not pending.event.wait(self.timeout):
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise ConnectionError(f"{self.name}: no response to {method} within {self.timeout:.0f}s")
+        resp = pending.response
+        if isinstance(resp, Exception):
+            raise resp
+        status = int(resp.get("status", 200))
+        if status >= 400 or "error" in resp:
+            # status를 그대로 실어 보내 5xx는 pair_executor가 결과 미확정으로 분류
+            err = resp.get("error") or {}
+            raise self.error_cls(status, err.get("code", "unknown"), err.get("msg", f"WS API status {status}"))
+        return resp.get("result")
+
+    def request(self, method: str, params: dict, weight: int = 1, is_order: bool = False) -> dict:
+        """서명된 요청을 보내고 result를 반환합니다. 연결이 준비되지 않았으면 ConnectionError."""
+        ws = self._ws
+        if ws is None or not self._ready.wait(self.timeout):
+            raise ConnectionError(f"{self.name}: not connected")
+        self.client.limiter.acquire(weight, PRIORITY_ORDER, is_order)
+        return self._call(ws, method, self._signed(params, include_key=not self.logged_on))
+
+    def place_order(self, payload: dict) -> dict:
+        return self.request("order.place", payload, is_order=True)
+
+    def cancel_order(self, payload: dict) -> dict:
+        return self.request("order.cancel", payload)
+
+
+class OrderGateway:
+    """스팟/선물 WebSocket API 세션을 열고 각 클라이언트의 place_order/cancel_order가 그 세션을 쓰도록 연결합니다."""
+
+    def __init__(
+        self,
+        spot: BinanceClient,
+        fut: BinanceFuturesClient,
+        spot_url: str = SPOT_WS_API_URL,
+        futures_url: str = FUTURES_WS_API_URL,
+        timeout: float = 10.0,
+    ):
+        self.spot = WsApiSession(spot_url, spot, BinanceAPIError, name="ws-api-spot", timeout=timeout)
+        self.futures = WsApiSession(futures_url, fut, BinanceFuturesAPIError, name="ws-api-futures", timeout=timeout)
+        self._clients = (spot, fut)
+
+    def start(self, wait: float = 10.0) -> "OrderGateway":
+        for s in (self.spot, self.futures):
+            s.start()
+        for s in (self.spot, self.futures):
+            if not s.wait_ready(wait):
+                print(f"warn: {s.name} not connected yet; orders go over REST until it connects")
+        self._clients[0].ws_orders = self.spot
+        self._clients[1].ws_orders = self.futures
+        return self
+
+    def stop(self) -> None:
+        for c in self._clients:
+            c.ws_orders = None
+        for s in (self.spot, self.futures):
+            s.stop()
@@ -0,0 +1,204 @@
+﻿import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+from binance_client import BinanceAPIError
+from binance_futures_client import BinanceFuturesAPIError
+from metrics import LEG_ACK_SECONDS, LOOP_STAGE_SECONDS, timed
+
+# 거래소가 명시적으로 거절한 오류: 주문이 체결되지 않았음이 확실하므로 재전송/되돌리기 판단이 가능
+REJECTED_ERRORS = (BinanceAPIError, BinanceFuturesAPIError)
+# 위 오류 중 처리 여부를 알 수 없는 경우: HTTP/WS 5xx, -1006(예상치 못한 응답), -1007(백엔드 응답 시간 초과)
+UNKNOWN_OUTCOME_CODES = (-1006, -1007)
+ORDER_NOT_FOUND_CODE = -2013
+# 조회된 주문이 이 상태이거나 체결 수량이 있으면 전송된 것으로 봄
+PLACED_STATUSES = ("NEW", "PARTIALLY_FILLED", "FILLED")
+
+
+class OrderAbsent(Exception):
+    """조회 결과 주문이 없거나 체결 없이 끝남 (미체결 확정)."""
+
+
+class LegNotSent(OrderAbsent):
+    """순차 모드에서 앞 레그가 실패해 보내지 않은 레그."""
+
+
+def outcome_unknown(e: Exception | None) -> bool:
+    """주문이 거래소에서 처리됐는지 알 수 없는 오류인지. 네트워크 오류/타임아웃도 여기에 해당합니다."""
+    if e is None or isinstance(e, OrderAbsent):
+        return False
+    if isinstance(e, REJECTED_ERRORS):
+        status = e.status if isinstance(e.status, int) else 0
+        return status >= 500 or e.code in UNKNOWN_OUTCOME_CODES
+    return True
+
+
+def client_order_id(prefix: str = "arb") -> str:
+    """newClientOrderId (최대 36자). 결과를 알 수 없을 때 이 id로 주문을 조회합니다."""
+    return f"{prefix}{uuid.uuid4().hex[:24]}"
+
+
+@dataclass
+class Leg:
+    name: str  # actions 키 (예: "spot_buy")
+    send: Callable[[], dict | None]
+    unwind: Callable[[], dict | None] | None = None  # 이 레그를 되돌리는 반대 주문 (없으면 되돌리지 않음)
+    query: Callable[[], dict | None] | None = None  # 이 레그 주문 조회 (결과를 알 수 없을 때 확인용)
+
+
+@dataclass
+class LegResult:
+    name: str
+    response: dict | None = None
+    error: Exception | None = None
+    sent_ms: int = 0
+    ack_ms: int = 0
+    attempts: int = 0
+    unwound: dict | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def rejected(self) -> bool:
+        """거래소가 거절함(=미체결 확정). 네트워크 오류/타임아웃/5xx는 결과를 알 수 없으므로 False."""
+        return self.error is not None and not outcome_unknown(self.error)
+
+    def timing(self) -> dict:
+        return {
+            "sent_ms": self.sent_ms,
+            "ack_ms": self.ack_ms,
+            "attempts": self.attempts,
+            "error": str(self.error) if self.error else None,
+            "unwound": self.unwound is not None,
+        }
+
+
+class PairExecutionError(Exception):
+    """needs_review: 체결 여부를 알 수 없거나 되돌리기가 실패해 포지션을 자동으로 판단할 수 없음."""
+
+    def __init__(self, msg: str, actions: dict, needs_review: bool = False):
+        super().__init__(msg)
+        self.actions = actions
+        self.needs_review = needs_review
+
+
+def filled_legs(actions: dict) -> list[str]:
+    """actions["legs"]에서 체결된 채 남은(되돌리지 않은) 레그 이름."""
+    legs = actions.get("legs") or {}
+    return [name for name, t in legs.items() if t["attempts"] and t["error"] is None and not t["unwound"]]
+
+
+@dataclass
+class PairExecutor:
+    """
+    두 레그 주문을 동시에(또는 순서대로) 보내고 한쪽 실패 시 정책에 따라 처리합니다.\n\n    - 거절된 레그는 retries 회까지 즉시 재전송\n    - 순차 모드에서는 앞 레그를 확정(조회/재전송)한 뒤에도 실패하면 뒤 레그를 보내지 않음\n    - 그래도 실패하면 성공한 레그를 unwind 주문으로 되돌림 (unwind=True 이고 레그에 unwind가 있을 때)\n    - 결과를 알 수 없는 오류(네트워크/타임아웃/5xx/-1006/-1007)는 재전송/되돌리기 전에 레그의 query로 주문을 조회해 확정 (조회로도 모르면 중복 체결 위험 때문에 자동 처리하지 않음)\n    실패 시 PairExecutionError(actions 포함, 자동 판단이 불가능하면 needs_review=True)를 올립니다.
+    """
+
+    concurrent: bool = False
+    retries: int = 1
+    unwind: bool = True
+    reconcile_attempts: int = 3  # 결과를 알 수 없는 레그 조회 횟수 (주문이 조회에 늦게 보일 수 있음)
+    reconcile_delay: float = 0.5
+    _pool: ThreadPoolExecutor | None = field(default=None, init=False, repr=False)
+
+    def _send(self, leg: Leg, result: LegResult) -> LegResult:
+        result.attempts += 1
+        if not result.sent_ms:  # 재전송 시에도 최초 전송 시각을 유지
+            result.sent_ms = int(time.time() * 1000)
+        t0 = time.perf_counter()
+        try:
+            result.response = leg.send()
+            result.error = None
+        except Exception as e:
+            result.error = e
+        result.ack_ms = int(time.time() * 1000)
+        LEG_ACK_SECONDS.labels(leg.name).observe(time.perf_counter() - t0)
+        return result
+
+    def _reconcile(self, leg: Leg, result: LegResult) -> None:
+        """결과를 알 수 없는 레그를 조회해 체결(ok) 또는 미체결(OrderAbsent)로 확정합니다. 조회로도 모르면 그대로 둠."""
+        if leg.query is None or not outcome_unknown(result.error):
+            return
+        not_found = 0
+        for i in range(self.reconcile_attempts):
+            if i:
+                time.sleep(self.reconcile_delay)
+            try:
+                order = leg.query()
+            except REJECTED_ERRORS as e:
+                if e.code == ORDER_NOT_FOUND_CODE:
+                    not_found += 1
+                continue
+            except ConnectionError:
+                continue
+            if not order:
+                not_found += 1
+                continue
+            if order.get("status") in PLACED_STATUSES or float(order.get("executedQty") or 0) > 0:
+                print(f"warn: {leg.name} outcome unknown ({result.error}); order found ({order.get('status')})")
+                result.response, result.error = order, None
+            else:
+                result.error = OrderAbsent(f"{leg.name}: order {order.get('status')} without fills")
+            return
+        if not_found == self.reconcile_attempts:
+            result.error = OrderAbsent(f"{leg.name}: order not found after {not_found} queries ({result.error})")
+
+    def _settle(self, leg: Leg, result: LegResult) -> None:
+        """결과를 알 수 없는 레그는 조회로 확정한 뒤, 거절된 레그만 retries 회까지 즉시 재전송합니다."""
+        self._reconcile(leg, result)
+        while result.rejected and result.attempts <= self.retries:
+            print(f"warn: {leg.name} rejected ({result.error}); retry {result.attempts}/{self.retries}")
+            self._send(leg, result)
+            self._reconcile(leg, result)
+
+    def execute(self, *legs: Leg) -> dict:
+        """레그들을 실행합니다 (보통 두 개, 일부 레그만 다시 보낼 때는 하나)."""
+        with timed(LOOP_STAGE_SECONDS.labels("execute")):
+            return self._execute(legs)
+
+    def _execute(self, legs: tuple[Leg, ...]) -> dict:
+        results = [LegResult(leg.name) for leg in legs]
+        if self.concurrent and len(legs) > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="leg")
+            futs = [self._pool.submit(self._send, leg, r) for leg, r in zip(legs, results)]
+            for f in futs:
+                f.result()
+            for leg, r in zip(legs, results):
+                self._settle(leg, r)
+        else:
+            for k, (leg, r) in enumerate(zip(legs, results)):
+                self._send(leg, r)
+                self._settle(leg, r)
+                if not r.ok:
+                    # 앞 레그가 확정적으로 실패했거나 결과를 모르면 뒤 레그는 보내지 않음
+                    for rest in results[k + 1 :]:
+                        rest.error = LegNotSent(f"{rest.name}: not sent ({leg.name} failed)")
+                    break
+
+        actions = {r.name: r.response for r in results}
+        actions["legs"] = {r.name: r.timing() for r in results}
+        if all(r.ok for r in results):
+            return actions
+
+        failed = [r for r in results if not r.ok]
+        if any(not r.rejected for r in failed):
+            # 체결 여부를 알 수 없음: 자동 처리하지 않고 수동 확인 요청
+            names = ", ".join(r.name for r in failed if not r.rejected)
+            raise PairExecutionError(f"leg outcome unknown ({names}); check positions manually", actions, needs_review=True)
+
+        if self.unwind:
+            for leg, r in zip(legs, results):
+                if r.ok and leg.unwind is not None:
+                    try:
+                        r.unwound = leg.unwind()
+                        print(f"warn: unwound {leg.name} after other leg failed")
+                    except Exception as e:
+                        raise PairExecutionError(f"unwind of {leg.name} failed: {e}", actions, needs_review=True) from e
+            actions["legs"] = {r.name: r.timing() for r in results}
+        errs = "; ".join(f"{r.name}: {r.error}" for r in failed)
+        raise PairExecutionError(f"pair execution failed: {errs}", actions)
@@ -0,0 +1,132 @@
+﻿from array import array
+from collections import deque
+from typing import Iterator
+
+
+class RingBuffer:
+    """
+    고정 크기 float 링 버퍼입니다. 추가는 O(1)이며 리스트 슬라이싱 복사가 없습니다.\n    각 값은 추가된 순서대로 절대 인덱스(0, 1, 2, ...)를 가지며, 보관 중인 값은 [start, end) 범위입니다.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self._data = array("d", bytes(8 * self.capacity))
+        self.end = 0  # 지금까지 추가된 값의 수 = 다음 값의 절대 인덱스
+
+    def __len__(self) -> int:
+        return min(self.end, self.capacity)
+
+    @property
+    def start(self) -> int:
+        return self.end - len(self)
+
+    def append(self, v: float) -> int:
+        """값을 추가하고 그 절대 인덱스를 반환합니다."""
+        idx = self.end
+        self._data[idx % self.capacity] = v
+        self.end = idx + 1
+        return idx
+
+    def at(self, idx: int) -> float:
+        if not self.start <= idx < self.end:
+            raise IndexError(idx)
+        return self._data[idx % self.capacity]
+
+    def last(self) -> float:
+        return self.at(self.end - 1)
+
+    def values(self, start: int | None = None, end: int | None = None) -> Iterator[float]:
+        lo = self.start if start is None else max(start, self.start)
+        hi = self.end if end is None else min(end, self.end)
+        data, cap = self._data, self.capacity
+        for i in range(lo, hi):
+            yield data[i % cap]
+
+
+class MinMaxDecimator:
+    """
+    링 버퍼 내용을 화면 열 수에 맞춰 min/max 구간으로 줄입니다.\n\n    - 구간 크기 k는 len/columns 이상인 2의 거듭제곱. 구간은 절대 인덱스 기준(idx // k)으로 정렬되므로 새 값은 마지막 구간만 갱신\n    - k가 바뀔 때(버퍼가 차는 동안 log 횟수, 창 크기 변경)만 전체를 다시 집계\n    - 구간마다 최소/최대 두 점을 시간 순서로 내보내므로 스파이크가 사라지지 않고, 출력 점 수는 history와 무관하게 약 2*columns
+    """
+
+    def __init__(self, ring: RingBuffer, columns: int = 1):
+        self.ring = ring
+        self.columns = max(1, int(columns))
+        self.k = 1
+        # 각 항목: [bucket_id, lo, lo_idx, hi, hi_idx]
+        self.buckets: deque[list] = deque()
+
+    def _bucket_size(self, n: int) -> int:
+        k = 1
+        while n > k * self.columns:
+            k *= 2
+        return k
+
+    def set_columns(self, columns: int) -> None:
+        self.columns = max(1, int(columns))
+        if self._bucket_size(len(self.ring)) != self.k:
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        ring = self.ring
+        self.k = self._bucket_size(len(ring))
+        self.buckets.clear()
+        for idx, v in enumerate(ring.values(), ring.start):
+            self._add(idx, v)
+
+    def _add(self, idx: int, v: float) -> None:
+        bid = idx // self.k
+        b = self.buckets[-1] if self.buckets else None
+        if b is None or b[0] != bid:
+            self.buckets.append([bid, v, idx, v, idx])
+            return
+        if v < b[1]:
+            b[1], b[2] = v, idx
+        if v > b[3]:
+            b[3], b[4] = v, idx
+
+    def push(self, idx: int, v: float) -> None:
+        """ring.append() 직후 호출합니다."""
+        if self._bucket_size(len(self.ring)) != self.k:
+            self.rebuild()
+            return
+        self._add(idx, v)
+        self._trim()
+
+    def _trim(self) -> None:
+        start, k = self.ring.start, self.k
+        buckets = self.buckets
+        while buckets and (buckets[0][0] + 1) * k <= start:
+            buckets.popleft()
+        if not buckets:
+            return
+        b = buckets[0]
+        if b[2] < start or b[4] < start:
+            # 맨 앞 구간의 극값이 버퍼에서 밀려났으면 남은 값(최대 k개)으로 다시 집계
+            bid = b[0]
+            buckets.popleft()
+            for idx, v in enumerate(self.ring.values(start, (bid + 1) * k), start):
+                if buckets and buckets[0][0] == bid:
+                    b = buckets[0]
+                    if v < b[1]:
+                        b[1], b[2] = v, idx
+                    if v > b[3]:
+                        b[3], b[4] = v, idx
+                else:
+                    buckets.appendleft([bid, v, idx, v, idx])
+
+    def bounds(self) -> tuple[float, float] | None:
+        if not self.buckets:
+            return None
+        return min(b[1] for b in self.buckets), max(b[3] for b in self.buckets)
+
+    def points(self) -> Iterator[tuple[int, float]]:
+        """(절대 인덱스, 값)을 시간 순서로 내보냅니다."""
+        for _, lo, lo_i, hi, hi_i in self.buckets:
+            if lo_i == hi_i:
+                yield lo_i, lo
+            elif lo_i < hi_i:
+                yield lo_i, lo
+                yield hi_i, hi
+            else:
+                yield hi_i, hi
+                yield lo_i, lo
@@ -0,0 +1,174 @@
+﻿import heapq
+import itertools
+import threading
+import time
+
+# 요청 우선순위 (작을수록 먼저): 주문 > 계정/설정 > 시세
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_MARKET = 2
+
+
+def _depth_weight_spot(limit: int) -> int:
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+def _depth_weight_futures(limit: int) -> int:
+    if limit <= 50:
+        return 2
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 10
+    return 20
+
+
+def spot_weight(method: str, path: str, params: dict | None) -> int:
+    """스팟 엔드포인트 요청 가중치 (Binance 문서 기준, 모르는 경로는 1)."""
+    params = params or {}
+    if path == "/api/v3/ticker/price":
+        return 2 if "symbol" in params else 4
+    if path == "/api/v3/depth":
+        return _depth_weight_spot(int(params.get("limit", 100)))
+    if path == "/api/v3/exchangeInfo":
+        return 20
+    if path == "/api/v3/account":
+        return 20
+    if path == "/api/v3/order" and method.upper() == "GET":
+        return 4
+    if path in ("/api/v3/order", "/api/v3/order/test"):
+        return 1
+    if path == "/api/v3/userDataStream":
+        return 2
+    return 1
+
+
+def futures_weight(method: str, path: str, params: dict | None) -> int:
+    """USDT-M 선물 엔드포인트 요청 가중치 (Binance 문서 기준, 모르는 경로는 1)."""
+    params = params or {}
+    if path == "/fapi/v1/ticker/price":
+        return 1 if "symbol" in params else 2
+    if path == "/fapi/v1/premiumIndex":
+        return 1 if "symbol" in params else 10
+    if path == "/fapi/v1/depth":
+        return _depth_weight_futures(int(params.get("limit", 500)))
+    if path in ("/fapi/v2/account", "/fapi/v2/balance"):
+        return 5
+    return 1
+
+
+class RateLimiter:
+    """
+    한 API 호스트(IP 단위 한도)의 요청 가중치/주문 수를 추적하는 관리자입니다.\n\n    - 응답 헤더 X-MBX-USED-WEIGHT-1M / X-MBX-ORDER-COUNT-10S 로 서버 측 사용량과 동기화\n    - 한도(safety 비율 적용)를 넘을 요청은 다음 윈도우까지 대기시키고, 대기열은 우선순위(주문 먼저) 순으로 처리\n    - 429/418 응답의 Retry-After 동안 모든 요청을 보류
+    """
+
+    def __init__(
+        self,
+        weight_limit: int = 6000,
+        order_limit_10s: int = 100,
+        safety: float = 0.9,
+        weight_window: float = 60.0,
+    ):
+        self.weight_limit = int(weight_limit * safety)
+        self.order_limit = int(order_limit_10s * safety)
+        self.weight_window = weight_window
+        self.used_weight = 0
+        self.order_count = 0
+        self.blocked_until = 0.0
+        self._weight_epoch = self._epoch(time.time(), weight_window)
+        self._order_epoch = self._epoch(time.time(), 10.0)
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []  # (priority, ticket)
+        self._tickets = itertools.count()
+
+    @staticmethod
+    def _epoch(now: float, window: float) -> int:
+        # Binance 윈도우는 분/10초 경계에 맞춰 초기화됨
+        return int(now // window)
+
+    def _roll(self, now: float) -> None:
+        e = self._epoch(now, self.weight_window)
+        if e != self._weight_epoch:
+            self._weight_epoch, self.used_weight = e, 0
+        e = self._epoch(now, 10.0)
+        if e != self._order_epoch:
+            self._order_epoch, self.order_count = e, 0
+
+    def _wait_time(self, now: float, weight: int, is_order: bool) -> float:
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.used_weight + weight > self.weight_limit:
+            return (self._weight_epoch + 1) * self.weight_window - now
+        if is_order and self.order_count + 1 > self.order_limit:
+            return (self._order_epoch + 1) * 10.0 - now
+        return 0.0
+
+    def acquire(self, weight: int = 1, priority: int = PRIORITY_MARKET, is_order: bool = False) -> float:
+        """예산이 생길 때까지 대기한 뒤 사용량을 선점합니다. 대기한 시간(초)을 반환합니다."""
+        ticket = (priority, next(self._tickets))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = time.time()
+                    self._roll(now)
+                    if self._queue[0] == ticket:
+                        wait = self._wait_time(now, weight, is_order)
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None  # 앞선(우선순위 높은) 요청이 나갈 때까지
+                    self._cond.wait(wait)
+                self.used_weight += weight
+                if is_order:
+                    self.order_count += 1
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+        return time.monotonic() - start
+
+    def update(self, status: int, headers: dict) -> None:
+        """응답 헤더로 서버 측 사용량을 반영합니다 (헤더 키는 소문자)."""
+        now = time.time()
+        with self._cond:
+            self._roll(now)
+            used = headers.get("x-mbx-used-weight-1m")
+            if used is not None:
+                try:
+                    self.used_weight = max(self.used_weight, int(used))
+                except ValueError:
+                    pass
+            orders = headers.get("x-mbx-order-count-10s")
+            if orders is not None:
+                try:
+                    self.order_count = max(self.order_count, int(orders))
+                except ValueError:
+                    pass
+            if status in (418, 429):
+                try:
+                    retry_after = float(headers.get("retry-after", 0))
+                except ValueError:
+                    retry_after = 0.0
+                # Retry-After 가 없으면 현재 윈도우 끝까지 보류
+                retry_after = retry_after or ((self._weight_epoch + 1) * self.weight_window - now)
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                print(f"warn: HTTP {status} rate limited; pausing requests for {retry_after:.1f}s")
+            self._cond.notify_all()
+
+    def min_interval(self, weight_per_tick: int) -> float:
+        """틱마다 weight_per_tick을 쓸 때 한도를 넘지 않고 고르게 분산되는 최소 간격(초)."""
+        return self.weight_window * weight_per_tick / max(1, self.weight_limit)
+
+    def headroom(self) -> int:
+        """현재 윈도우에서 남은 가중치."""
+        with self._cond:
+            self._roll(time.time())
+            return max(0, self.weight_limit - self.used_weight)
@@ -0,0 +1,97 @@
+﻿import hmac
+import base64
+import hashlib
+from urllib.parse import quote, quote_plus
+
+
+def encode_query(params: dict) -> str:
+    """
+    urlencode(params)와 같은 결과를 한 번에 만듭니다. 서명 대상과 실제 전송 문자열로 함께 쓰입니다.\n    바이낸스 파라미터는 스칼라 값뿐이라 doseq 처리는 하지 않습니다. int는 인용이 필요 없어 바로 문자열로 바꿉니다.
+    """
+    return "&".join(
+        f"{quote_plus(k)}={v}" if type(v) is int else f"{quote_plus(k)}={quote_plus(str(v))}"
+        for k, v in params.items()
+    )
+
+
+class HmacSigner:
+    """HMAC SHA256 서명. 키를 한 번만 적재한 HMAC 객체를 복사해 쓰므로 호출마다 키 패딩/해시 초기화를 반복하지 않습니다."""
+
+    kind = "hmac"
+
+    def __init__(self, secret: str):
+        self._mac = hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+    def sign(self, payload: str) -> str:
+        m = self._mac.copy()
+        m.update(payload.encode("utf-8"))
+        return m.hexdigest()
+
+    # hex는 인코딩이 필요 없으므로 쿼리용/원본(WebSocket API JSON용) 서명이 같음
+    signature = sign
+
+
+class _KeySigner:
+    """PEM 개인키 서명(Ed25519/RSA) 공통부. 결과는 base64이며 쿼리에 붙일 수 있게 퍼센트 인코딩해서 반환합니다."""
+
+    kind = ""
+
+    def __init__(self, key):
+        self._key = key
+
+    def _raw_sign(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def signature(self, payload: str) -> str:
+        """인코딩하지 않은 base64 서명 (WebSocket API JSON params용)."""
+        return base64.b64encode(self._raw_sign(payload.encode("ascii"))).decode("ascii")
+
+    def sign(self, payload: str) -> str:
+        return quote(self.signature(payload), safe="")
+
+
+class Ed25519Signer(_KeySigner):
+    kind = "ed25519"
+
+    def _raw_sign(self, data: bytes) -> bytes:
+        return self._key.sign(data)
+
+
+class RsaSigner(_KeySigner):
+    kind = "rsa"
+
+    def __init__(self, key):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        super().__init__(key)
+        self._padding = padding.PKCS1v15()
+        self._hash = hashes.SHA256()
+
+    def _raw_sign(self, data: bytes) -> bytes:
+        return self._key.sign(data, self._padding, self._hash)
+
+
+def load_private_key_signer(path: str, password: str | None = None) -> Ed25519Signer | RsaSigner:
+    """PEM 개인키 파일로 Ed25519/RSA 서명기를 만듭니다. cryptography 패키지가 필요합니다."""
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+        from cryptography.hazmat.primitives.serialization import load_pem_private_key
+    except ImportError as e:
+        raise RuntimeError("Ed25519/RSA API keys require the 'cryptography' package (pip install cryptography)") from e
+    with open(path, "rb") as f:
+        key = load_pem_private_key(f.read(), password=password.encode("utf-8") if password else None)
+    if isinstance(key, ed25519.Ed25519PrivateKey):
+        return Ed25519Signer(key)
+    if isinstance(key, rsa.RSAPrivateKey):
+        return RsaSigner(key)
+    raise ValueError(f"{path}: unsupported private key type {type(key).__name__} (expected Ed25519 or RSA)")
+
+
+def build_signer(api_secret: str | None = None, private_key_path: str | None = None, private_key_password: str | None = None):
+    """개인키 경로가 있으면 Ed25519/RSA, 아니면 api_secret으로 HMAC 서명기. 둘 다 없으면 None."""
+    if private_key_path:
+        return load_private_key_signer(private_key_path, private_key_password)
+    if api_secret:
+        return HmacSigner(api_secret)
+    return None
@@ -0,0 +1,192 @@
+﻿import os
+import json
+import time
+import zlib
+import threading
+
+JOURNAL_SUFFIX = ".journal"
+SNAPSHOT_SUFFIX = ".snapshot"
+
+
+def _fsync_dir(path: str) -> None:
+    # rename 결과를 디스크에 확정 (디렉터리 fsync를 지원하지 않는 플랫폼은 무시)
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def encode_record(rec: dict) -> bytes:
+    """한 줄 레코드: '<crc32 8자리 hex> <json>\\n' (crc는 json 바이트 기준)."""
+    body = json.dumps(rec, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return b"%08x " % zlib.crc32(body) + body + b"\n"
+
+
+def decode_records(data: bytes) -> tuple[list[dict], int]:
+    """손상되지 않은 앞부분 레코드와 그 끝 오프셋을 반환합니다. 잘린/체크섬 불일치 줄에서 멈춥니다."""
+    out = []
+    pos = 0
+    n = len(data)
+    while pos < n:
+        end = data.find(b"\n", pos)
+        if end < 0:
+            break  # 마지막 줄이 잘림 (쓰기 도중 종료)
+        line = data[pos:end]
+        if len(line) < 10 or line[8:9] != b" ":
+            break
+        body = line[9:]
+        try:
+            if int(line[:8], 16) != zlib.crc32(body):
+                break
+            out.append(json.loads(body))
+        except ValueError:
+            break
+        pos = end + 1
+    return out, pos
+
+
+class StateJournal:
+    """
+    여러 심볼의 상태를 하나의 추가 전용(append-only) 저널 파일에 기록하는 저장소입니다.\n\n    - put(): 레코드 한 줄(crc32 + JSON)을 write 한 번으로 추가 — 전체 파일을 다시 쓰지 않음\n    - fsync는 fsync_interval 초 단위로 묶어서 수행 (sync=True 면 즉시). write가 끝난 데이터는 kill -9 후에도 남음\n    - compact_every 레코드마다 전체 상태를 스냅샷으로 저장(임시 파일 + fsync + 원자적 rename) 후 저널을 비움\n    - 시작 시 스냅샷 + 이후 저널 레코드를 재생. 끝의 잘린/손상된 레코드는 버리고 그 지점부터 이어 씀
+    """
+
+    def __init__(self, path: str, fsync_interval: float = 0.2, compact_every: int = 1000):
+        base = path[: -len(JOURNAL_SUFFIX)] if path.endswith(JOURNAL_SUFFIX) else path
+        self.journal_path = base + JOURNAL_SUFFIX
+        self.snapshot_path = base + SNAPSHOT_SUFFIX
+        self.fsync_interval = float(fsync_interval)
+        self.compact_every = int(compact_every)
+        self.seq = 0
+        self.records = 0  # 마지막 스냅샷 이후 저널 레코드 수
+        self._states: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        self._replay()
+        self._fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._closed = threading.Event()
+        if self.fsync_interval > 0:
+            threading.Thread(target=self._sync_loop, name="state-journal-fsync", daemon=True).start()
+
+    # ---------- 복구 ----------
+    def _replay(self) -> None:
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snap = json.load(f)  # rename으로만 교체되므로 항상 완전한 파일
+            self.seq = int(snap.get("seq", 0))
+            self._states = snap.get("states", {})
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "rb") as f:
+            data = f.read()
+        recs, good = decode_records(data)
+        for rec in recs:
+            if rec["seq"] <= self.seq:
+                continue  # 스냅샷에 이미 포함 (압축 도중 종료된 경우)
+            self._apply(rec)
+            self.records += 1
+        if good < len(data):
+            print(f"warn: state journal: dropped {len(data) - good} trailing bytes of a torn record")
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _apply(self, rec: dict) -> None:
+        self.seq = rec["seq"]
+        if rec.get("state") is None:
+            self._states.pop(rec["key"], None)
+        else:
+            self._states[rec["key"]] = rec["state"]
+
+    # ---------- 조회/기록 ----------
+    def get(self, key: str) -> dict:
+        with self._lock:
+            return dict(self._states.get(key, {}))
+
+    def states(self) -> dict[str, dict]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._states.items()}
+
+    def put(self, key: str, state: dict | None, sync: bool = False) -> None:
+        """key의 상태를 통째로 기록합니다 (None 이면 삭제)."""
+        with self._lock:
+            rec = {"seq": self.seq + 1, "key": key, "state": dict(state) if state is not None else None}
+            os.write(self._fd, encode_record(rec))
+            self._apply(rec)
+            self.records += 1
+            self._dirty = True
+            if sync or self.fsync_interval <= 0 or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync_locked()
+            if self.compact_every and self.records >= self.compact_every:
+                self._compact_locked()
+
+    def _sync_locked(self) -> None:
+        if self._dirty:
+            os.fsync(self._fd)
+            self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def _sync_loop(self) -> None:
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                if self._dirty and not self._closed.is_set():
+                    self._sync_locked()
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"seq": self.seq, "states": self._states}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        _fsync_dir(self.snapshot_path)
+        # 스냅샷이 확정된 뒤에만 저널을 비움: 그 전에 죽어도 재생 시 seq로 중복을 건너뜀
+        os.ftruncate(self._fd, 0)
+        os.fsync(self._fd)
+        self._dirty = False
+        self.records = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._closed.set()
+            self._sync_locked()
+            os.close(self._fd)
+
+
+def migrate_legacy_json(journal: StateJournal, single_path: str, multi_path: str, default_key: str) -> bool:
+    """저널이 비어 있으면 기존 arb_state.json / arb_state_multi.json 내용을 가져옵니다. 가져왔으면 True."""
+    if journal.seq > 0:
+        return False
+    imported: dict[str, dict] = {}
+    for path, multi in ((multi_path, True), (single_path, False)):
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"warn: could not migrate {path}: {e}")
+            continue
+        if multi:
+            imported.update({k: v for k, v in data.items() if isinstance(v, dict)})
+        elif data:
+            imported[data.get("symbol") or default_key] = data
+    for key, st in imported.items():
+        journal.put(key, st)
+    if imported:
+        journal.compact()
+        print(f"migrated {len(imported)} state(s) from legacy JSON into {journal.journal_path}")
+    return bool(imported)
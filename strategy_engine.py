@@ -0,0 +1,91 @@
+﻿import time
+import threading
+from typing import Callable
+
+from metrics import LOOP_STAGE_SECONDS
+
+STAGE_REACT = LOOP_STAGE_SECONDS.labels("react")  # 데이터 도착(submit)부터 판단 시작까지
+
+
+class StrategyEngine:
+    """
+    시세 갱신마다 판단을 실행하는 이벤트 구동 엔진입니다. 고정 주기 sleep 대신 데이터 도착이 반응 시간을 정합니다.\n\n    - 피드 스레드가 submit(spot, mark, ts_ms)를 호출하면 on_tick(틱마다, 가벼운 처리)을 거쳐 최신 값만 남기고 판단 스레드를 깨움\n    - run()은 호출한 스레드에서 handler를 실행. 판단/주문 중에 도착한 갱신은 최신 하나로 합쳐짐(conflation)\n    - debounce 초 안에 handler를 두 번 부르지 않음: 첫 갱신은 바로, 그 안에 온 갱신은 창이 끝날 때 최신 값으로 한 번\n    - 판단 직전에 원 틱의 ts_ms가 stale_after 초보다 오래됐으면 handler를 부르지 않고 버림 (폴링 루프의 WS_STALE_SEC 검사와 같음)\n    - stale_after 초 동안 갱신이 없으면 경고를 출력
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[float, float, int], None],
+        on_tick: Callable[[float, float, int], tuple[float, float, int] | None] | None = None,
+        debounce: float = 0.0,
+        stale_after: float = 5.0,
+        name: str = "engine",
+    ):
+        self.handler = handler
+        self.on_tick = on_tick
+        self.debounce = max(0.0, float(debounce))
+        self.stale_after = float(stale_after)
+        self.name = name
+        self.submitted = 0
+        self.evaluated = 0
+        self.dropped = 0  # 오래돼서 버린 틱 수
+        self._pending: tuple[tuple[float, float, int], float, int] | None = None
+        self._last_eval = float("-inf")
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def submit(self, spot: float, mark: float, ts_ms: int) -> None:
+        """피드 콜백. 어느 스레드에서 불러도 되며 블로킹되지 않습니다."""
+        with self._lock:
+            tick = (spot, mark, ts_ms) if self.on_tick is None else self.on_tick(spot, mark, ts_ms)
+            if tick is None:
+                return
+            self.submitted += 1
+            # 먼저 온 갱신의 도착 시각을 유지해 합쳐진 갱신의 대기 시간도 반응 시간에 포함
+            t = self._pending[1] if self._pending is not None else time.monotonic()
+            self._pending = (tick, t, ts_ms)
+        self._wake.set()
+
+    def _take(self) -> tuple[tuple[float, float, int], float, int] | None:
+        with self._lock:
+            item, self._pending = self._pending, None
+            self._wake.clear()
+            return item
+
+    def run(self) -> None:
+        """stop()까지 갱신을 기다리며 handler를 실행합니다. handler의 예외는 그대로 전파됩니다."""
+        idle_warned = stale_warned = False
+        while not self._stop.is_set():
+            if not self._wake.wait(self.stale_after):
+                if not idle_warned:
+                    print(f"data error: {self.name}: no updates for {self.stale_after:.0f}s")
+                    idle_warned = True
+                continue
+            idle_warned = False
+            wait_s = self._last_eval + self.debounce - time.monotonic()
+            if wait_s > 0 and self._stop.wait(wait_s):
+                break
+            item = self._take()
+            if item is None:
+                continue
+            tick, arrived, src_ts_ms = item
+            # 봉 모드에서도 봉을 닫은 원 틱의 시각으로 판정
+            age = time.time() - src_ts_ms / 1000.0
+            if age > self.stale_after:
+                self.dropped += 1
+                if not stale_warned:
+                    print(f"data error: {self.name}: stale tick ({age:.1f}s old), skipping")
+                    stale_warned = True
+                continue
+            stale_warned = False
+            self._last_eval = now = time.monotonic()
+            STAGE_REACT.observe(now - arrived)
+            self.evaluated += 1
+            self.handler(*tick)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def describe(self) -> str:
+        return f"{self.name}: submitted={self.submitted} evaluated={self.evaluated} dropped={self.dropped} debounce={self.debounce * 1000:.0f}ms"
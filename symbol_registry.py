@@ -0,0 +1,140 @@
+﻿import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+
+def _scale_of(value) -> int:
+    """'0.00100000' 같은 필터 값을 정수로 만드는 10의 거듭제곱. 예: 1000"""
+    d = Decimal(str(value or "0")).normalize()
+    exp = d.as_tuple().exponent
+    return 10 ** -exp if d > 0 and exp < 0 else 1
+
+
+@dataclass(frozen=True)
+class SymbolFilters:
+    """
+    exchangeInfo 필터를 정수 그리드로 미리 계산해 둔 값입니다.\n    수량/가격은 scale을 곱한 정수 단위로 비교하므로 float 반올림 오차가 누적되지 않습니다.
+    """
+
+    symbol: str
+    qty_scale: int = 1
+    qty_step: int = 0
+    min_qty: int = 0
+    max_qty: int = 0  # 0 = 제한 없음
+    price_scale: int = 1
+    tick: int = 0
+    min_price: int = 0
+    max_price: int = 0
+    min_notional: float = 0.0
+    raw: dict = field(default_factory=dict)  # filterType -> 원본 필터 (get_symbol_filters 호환)
+
+    @classmethod
+    def from_symbol_info(cls, info: dict) -> "SymbolFilters":
+        raw = {f["filterType"]: f for f in info.get("filters", [])}
+        lot = raw.get("LOT_SIZE") or {}
+        price = raw.get("PRICE_FILTER") or {}
+        # 스팟은 NOTIONAL(구 MIN_NOTIONAL.minNotional), 선물은 MIN_NOTIONAL.notional
+        notional = raw.get("NOTIONAL") or raw.get("MIN_NOTIONAL") or {}
+
+        # minQty/maxQty 가 stepSize 보다 자릿수가 많을 수 있으므로 가장 세밀한 scale로 맞춤
+        qty_scale = max(_scale_of(lot.get(k)) for k in ("stepSize", "minQty", "maxQty"))
+        price_scale = max(_scale_of(price.get(k)) for k in ("tickSize", "minPrice", "maxPrice"))
+
+        def units(v, scale):
+            return int(Decimal(str(v or "0")) * scale)
+
+        return cls(
+            symbol=info.get("symbol", ""),
+            qty_scale=qty_scale,
+            qty_step=units(lot.get("stepSize"), qty_scale),
+            min_qty=units(lot.get("minQty"), qty_scale),
+            max_qty=units(lot.get("maxQty"), qty_scale),
+            price_scale=price_scale,
+            tick=units(price.get("tickSize"), price_scale),
+            min_price=units(price.get("minPrice"), price_scale),
+            max_price=units(price.get("maxPrice"), price_scale),
+            min_notional=float(notional.get("minNotional", notional.get("notional", 0)) or 0),
+            raw=raw,
+        )
+
+    def clamp_quantity(self, qty: float) -> float:
+        units = int(qty * self.qty_scale + 1e-9)
+        if self.qty_step > 0:
+            units -= units % self.qty_step
+        if self.max_qty > 0:
+            units = min(units, self.max_qty)
+        units = max(self.min_qty, units)
+        return units / self.qty_scale
+
+    def round_price(self, price: float) -> float:
+        units = int(round(price * self.price_scale))
+        if self.tick > 0:
+            units -= units % self.tick
+        return units / self.price_scale
+
+    def check(self, qty: float, price: float | None = None) -> str | None:
+        """주문 전 검증. 문제가 있으면 사유 문자열, 없으면 None."""
+        units = int(qty * self.qty_scale + 1e-9)
+        if units <= 0:
+            return "quantity is 0"
+        if units < self.min_qty:
+            return f"quantity {qty} < minQty {self.min_qty / self.qty_scale}"
+        if self.max_qty > 0 and units > self.max_qty:
+            return f"quantity {qty} > maxQty {self.max_qty / self.qty_scale}"
+        if self.qty_step > 0 and units % self.qty_step:
+            return f"quantity {qty} not on stepSize {self.qty_step / self.qty_scale}"
+        if price is not None and self.min_notional > 0 and qty * price < self.min_notional:
+            return f"notional {qty * price:.4f} < minNotional {self.min_notional}"
+        return None
+
+
+class SymbolRegistry:
+    """
+    exchangeInfo를 한 번에(전체 심볼) 받아 SymbolFilters로 캐시하는 레지스트리입니다.\n    ttl 초마다 백그라운드 스레드가 갱신하며, 갱신 실패 시 기존 값을 유지합니다.
+    """
+
+    def __init__(self, client, ttl: float = 3600.0):
+        self.client = client
+        self.ttl = float(ttl)
+        self.loaded_at = 0.0
+        self._filters: dict[str, SymbolFilters] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def load(self) -> None:
+        info = self.client.get_exchange_info()
+        filters = {
+            s["symbol"]: SymbolFilters.from_symbol_info(s) for s in info.get("symbols", [])
+        }
+        with self._lock:
+            self._filters = filters
+            self.loaded_at = time.time()
+
+    def get(self, symbol: str) -> SymbolFilters | None:
+        if not self.loaded_at:
+            self.load()
+        return self._filters.get(symbol)
+
+    def symbols(self) -> list[str]:
+        if not self.loaded_at:
+            self.load()
+        return list(self._filters)
+
+    def start_refresh(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="symbol-registry", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.ttl):
+            try:
+                self.load()
+            except Exception as e:  # 네트워크/API 오류 시 기존 캐시 유지
+                print(f"warn: exchangeInfo refresh failed: {e}")
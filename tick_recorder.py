@@ -0,0 +1,243 @@
+﻿import os
+import csv
+import sys
+import mmap
+import struct
+import argparse
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+# 세그먼트 파일 레이아웃 (리틀엔디언, 고정 폭):
+#   [헤더 64바이트] magic(8) version(u32) ncols(u32) capacity(u64) count(u64) 나머지 0
+#   [ts_ms int64 x capacity][spot f64 x capacity][mark f64 x capacity][basis f64 x capacity]
+# 열마다 연속 배치되어 있어 numpy.memmap(path, dtype, offset=column_offset(...), shape=(count,))로
+# 복사 없이 읽을 수 있습니다.
+MAGIC = b"ARBTICK1"
+VERSION = 1
+HEADER_SIZE = 64
+COLUMNS = (("ts_ms", "q"), ("spot", "d"), ("mark", "d"), ("basis", "d"))
+SEGMENT_SUFFIX = ".ticks"
+DEFAULT_CAPACITY = 1 << 20  # 세그먼트당 행 수 (약 32MB)
+
+_HEADER = struct.Struct("<8sIIQQ")
+_COUNT_OFFSET = 24
+
+
+def _check_byteorder() -> None:
+    # memoryview.cast는 네이티브 엔디언을 쓰므로 리틀엔디언 환경에서만 쓰기/읽기를 허용
+    if sys.byteorder != "little":
+        raise RuntimeError("tick segments require a little-endian host")
+
+
+def column_offset(name: str, capacity: int) -> int:
+    """열 name의 파일 내 바이트 오프셋 (numpy.memmap offset 인자용)."""
+    for i, (col, _) in enumerate(COLUMNS):
+        if col == name:
+            return HEADER_SIZE + i * capacity * 8
+    raise KeyError(name)
+
+
+def segment_size(capacity: int) -> int:
+    return HEADER_SIZE + len(COLUMNS) * capacity * 8
+
+
+class _SegmentWriter:
+    """세그먼트 파일 하나에 행을 추가합니다. 행 데이터를 먼저 쓰고 헤더 count를 나중에 올리므로 읽는 쪽은 항상 완전한 행만 봅니다."""
+
+    def __init__(self, path: str, capacity: int):
+        exists = os.path.exists(path)
+        self.path = path
+        self._f = open(path, "r+b" if exists else "w+b")
+        if exists:
+            magic, _, ncols, capacity, count = _HEADER.unpack(self._f.read(_HEADER.size))
+            if magic != MAGIC or ncols != len(COLUMNS):
+                self._f.close()
+                raise ValueError(f"{path}: not a tick segment")
+        else:
+            count = 0
+            self._f.truncate(segment_size(capacity))  # 희소 파일: 실제 디스크는 쓴 만큼만 사용
+        self.capacity = capacity
+        self.count = count
+        self._mm = mmap.mmap(self._f.fileno(), segment_size(capacity))
+        if not exists:
+            _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, len(COLUMNS), capacity, 0)
+        self._cols = [
+            memoryview(self._mm)[column_offset(name, capacity) : column_offset(name, capacity) + capacity * 8].cast(code)
+            for name, code in COLUMNS
+        ]
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def append(self, row: tuple) -> None:
+        i = self.count
+        for col, v in zip(self._cols, row):
+            col[i] = v
+        self.count = i + 1
+        struct.pack_into("<Q", self._mm, _COUNT_OFFSET, self.count)
+
+    def flush(self) -> None:
+        self._mm.flush()
+
+    def close(self) -> None:
+        for col in self._cols:
+            col.release()
+        self._cols = []
+        self._mm.flush()
+        self._mm.close()
+        self._f.close()
+
+
+class TickRecorder:
+    """
+    심볼별 (ts_ms, spot, mark, basis) 샘플을 고정 폭 열 지향 세그먼트 파일에 추가합니다.\n\n    파일 위치: <root>/<SYMBOL>/<SYMBOL>-<첫 ts_ms>.ticks\n    세그먼트가 capacity 행으로 차면 새 파일로 넘어갑니다. 재시작하면 마지막 세그먼트에 이어서 씁니다.
+    """
+
+    def __init__(self, root: str, capacity: int = DEFAULT_CAPACITY, flush_every: int = 0):
+        _check_byteorder()
+        self.root = root
+        self.capacity = int(capacity)
+        self.flush_every = int(flush_every)  # N행마다 msync (0이면 OS에 맡김)
+        self._writers: dict[str, _SegmentWriter] = {}
+        self._lock = threading.Lock()
+
+    def _writer(self, symbol: str, ts_ms: int) -> _SegmentWriter:
+        w = self._writers.get(symbol)
+        if w is None:
+            paths = segment_paths(self.root, symbol)
+            if paths:
+                w = _SegmentWriter(paths[-1], self.capacity)  # 재시작 시 마지막 세그먼트에 이어 쓰기
+        if w is not None and w.full:
+            w.close()
+            w = None
+        if w is None:
+            d = os.path.join(self.root, symbol)
+            os.makedirs(d, exist_ok=True)
+            w = _SegmentWriter(os.path.join(d, f"{symbol}-{int(ts_ms)}{SEGMENT_SUFFIX}"), self.capacity)
+        self._writers[symbol] = w
+        return w
+
+    def append(self, symbol: str, ts_ms: int, spot: float, mark: float, basis: float) -> None:
+        symbol = symbol.upper()
+        with self._lock:
+            w = self._writer(symbol, ts_ms)
+            w.append((int(ts_ms), float(spot), float(mark), float(basis)))
+            if self.flush_every and w.count % self.flush_every == 0:
+                w.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            for w in self._writers.values():
+                w.close()
+            self._writers.clear()
+
+
+class TickSegment:
+    """
+    세그먼트 파일을 읽기 전용 mmap으로 열고 열을 memoryview로 복사 없이 제공합니다.\n    with 블록을 벗어나기 전에 column()으로 얻은 memoryview를 모두 놓아야 합니다.
+    """
+
+    def __init__(self, path: str):
+        _check_byteorder()
+        self.path = path
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, ncols, self.capacity, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or ncols != len(COLUMNS):
+            self.close()
+            raise ValueError(f"{path}: not a tick segment")
+
+    def column(self, name: str) -> memoryview:
+        """열 name의 앞 count개 값 (ts_ms는 'q', 나머지는 'd' 형식)."""
+        code = dict(COLUMNS)[name]
+        off = column_offset(name, self.capacity)
+        return memoryview(self._mm)[off : off + self.count * 8].cast(code)
+
+    def numpy_spec(self, name: str) -> dict:
+        """numpy.memmap(path, **spec) 인자: 같은 열을 NumPy 배열로 복사 없이 열 때 사용."""
+        dtype = "<i8" if name == "ts_ms" else "<f8"
+        return {"dtype": dtype, "mode": "r", "offset": column_offset(name, self.capacity), "shape": (self.count,)}
+
+    def close(self) -> None:
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self) -> "TickSegment":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def segment_paths(root: str, symbol: str) -> list[str]:
+    """심볼의 세그먼트 파일 목록 (시작 시각 순)."""
+    d = os.path.join(root, symbol.upper())
+    if not os.path.isdir(d):
+        return []
+    names = [n for n in os.listdir(d) if n.endswith(SEGMENT_SUFFIX)]
+    names.sort(key=lambda n: int(n[: -len(SEGMENT_SUFFIX)].rsplit("-", 1)[1]))
+    return [os.path.join(d, n) for n in names]
+
+
+def read_columns(root: str, symbol: str, start_ms: int | None = None, end_ms: int | None = None) -> dict[str, array]:
+    """모든 세그먼트를 이어 붙인 열 배열 {ts_ms, spot, mark, basis} (구간 [start_ms, end_ms])."""
+    out = {name: array(code) for name, code in COLUMNS}
+    for path in segment_paths(root, symbol):
+        with TickSegment(path) as seg:
+            ts = seg.column("ts_ms")
+            lo = bisect_left(ts, start_ms) if start_ms is not None else 0
+            hi = bisect_right(ts, end_ms) if end_ms is not None else seg.count
+            ts.release()
+            for name, _ in COLUMNS:
+                col = seg.column(name)
+                out[name].frombytes(col[lo:hi].tobytes())
+                col.release()
+    return out
+
+
+def export_csv(root: str, symbol: str, out, start_ms: int | None = None, end_ms: int | None = None) -> int:
+    """ts_ms,spot,mark,basis CSV로 내보냅니다 (backtest.py 입력 형식과 호환). 쓴 행 수를 반환합니다."""
+    cols = read_columns(root, symbol, start_ms, end_ms)
+    w = csv.writer(out)
+    w.writerow([name for name, _ in COLUMNS])
+    w.writerows(zip(cols["ts_ms"], map(repr, cols["spot"]), map(repr, cols["mark"]), map(repr, cols["basis"])))
+    return len(cols["ts_ms"])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="틱 레코더 세그먼트 조회/내보내기")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_info = sub.add_parser("info", help="세그먼트 목록과 행 수")
+    p_info.add_argument("root")
+    p_info.add_argument("symbol")
+    p_exp = sub.add_parser("export", help="CSV로 내보내기")
+    p_exp.add_argument("root")
+    p_exp.add_argument("symbol")
+    p_exp.add_argument("-o", "--output", help="출력 파일 (기본: stdout)")
+    p_exp.add_argument("--start-ms", type=int, help="시작 시각(ms, 포함)")
+    p_exp.add_argument("--end-ms", type=int, help="종료 시각(ms, 포함)")
+    args = ap.parse_args()
+
+    if args.cmd == "info":
+        total = 0
+        for path in segment_paths(args.root, args.symbol):
+            with TickSegment(path) as seg:
+                ts = seg.column("ts_ms")
+                span = f"{ts[0]}..{ts[-1]}" if seg.count else "-"
+                ts.release()
+                print(f"{path} rows={seg.count}/{seg.capacity} ts={span}")
+                total += seg.count
+        print(f"total rows={total}")
+    else:
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as f:
+                n = export_csv(args.root, args.symbol, f, args.start_ms, args.end_ms)
+        else:
+            n = export_csv(args.root, args.symbol, sys.stdout, args.start_ms, args.end_ms)
+        print(f"exported {n} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
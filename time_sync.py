@@ -0,0 +1,103 @@
+﻿import time
+import threading
+from collections import deque
+from typing import Callable
+
+
+class TimeSync:
+    """
+    서버 시계 오프셋을 추정해 서명 요청의 timestamp를 보정합니다.\n\n    - 표본: 요청 직전/직후 로컬 시각 t0, t1과 서버 시각 S로 offset = S - (t0+t1)/2, rtt = t1 - t0\n    - 필터: 최근 window개 표본 중 RTT가 가장 작은 표본의 오프셋을 사용 (큐잉 지연이 섞인 표본 배제), 오차 한계는 그 RTT/2\n    - 백그라운드 스레드가 interval 초마다 burst개 표본을 추가. invalidate()는 즉시 재동기화를 요청\n    동기화 품질이 좋으면(오차 한계 <= good_error_ms, 최근 동기화) recv_window()가 tight_recv_window를 돌려줍니다.
+    """
+
+    def __init__(
+        self,
+        fetch_server_time: Callable[[], int],
+        interval: float = 60.0,
+        burst: int = 4,
+        window: int = 16,
+        good_error_ms: float = 50.0,
+        tight_recv_window: int = 1500,
+        name: str = "",
+    ):
+        self.fetch_server_time = fetch_server_time
+        self.interval = float(interval)
+        self.burst = int(burst)
+        self.good_error_ms = float(good_error_ms)
+        self.tight_recv_window = int(tight_recv_window)
+        self.name = name
+        self.offset_ms = 0.0
+        self.error_ms = float("inf")  # 오프셋 오차 한계 (최소 RTT/2)
+        self.synced_at = 0.0
+        self._samples: deque[tuple[float, float, float]] = deque(maxlen=int(window))  # (rtt_ms, offset_ms, at)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # ---------- 표본/추정 ----------
+    def sample(self) -> tuple[float, float]:
+        """서버 시각을 한 번 조회해 (offset_ms, rtt_ms) 표본을 추가합니다."""
+        t0 = time.time()
+        server_ms = self.fetch_server_time()
+        t1 = time.time()
+        rtt_ms = (t1 - t0) * 1000.0
+        offset_ms = server_ms - (t0 + t1) * 500.0
+        with self._lock:
+            self._samples.append((rtt_ms, offset_ms, t1))
+            best_rtt, best_offset, _ = min(self._samples)
+            self.offset_ms = best_offset
+            self.error_ms = best_rtt / 2.0
+            self.synced_at = t1
+        return offset_ms, rtt_ms
+
+    def sync(self) -> None:
+        for _ in range(self.burst):
+            self.sample()
+
+    # ---------- 사용 ----------
+    def now_ms(self) -> int:
+        """서버 시계 기준 현재 시각(ms). 서명 요청의 timestamp로 사용합니다."""
+        return int(time.time() * 1000.0 + self.offset_ms)
+
+    @property
+    def good(self) -> bool:
+        # 동기화가 interval의 3배 이상 끊기면 드리프트를 알 수 없으므로 품질 낮음으로 취급
+        return self.error_ms <= self.good_error_ms and time.time() - self.synced_at <= max(3 * self.interval, 60.0)
+
+    def recv_window(self, default: int) -> int:
+        """동기화 품질이 좋으면 min(default, tight_recv_window), 아니면 default."""
+        return min(default, self.tight_recv_window) if self.good else default
+
+    def describe(self) -> str:
+        return f"time sync{' ' + self.name if self.name else ''}: offset={self.offset_ms:+.1f}ms error<={self.error_ms:.1f}ms"
+
+    # ---------- 백그라운드 ----------
+    def invalidate(self) -> None:
+        """-1021(timestamp 범위 밖) 응답 등으로 오프셋이 틀렸을 때: 표본을 버리고 즉시 재동기화."""
+        with self._lock:
+            self._samples.clear()
+            self.error_ms = float("inf")
+        self._wake.set()
+
+    def start(self) -> "TimeSync":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"time-sync-{self.name or 'api'}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.sync()
+            except Exception as e:  # 네트워크/API 오류 시 기존 추정 유지
+                print(f"warn: {self.name or 'server'} time sync failed: {e}")
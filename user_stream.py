@@ -0,0 +1,234 @@
+﻿import threading
+from collections import OrderedDict
+from typing import Callable
+
+from binance_client import BinanceAPIError
+from binance_futures_client import BinanceFuturesAPIError
+from market_stream import StreamConnection
+
+MAX_ORDERS = 1000  # 주문 상태 캐시에 남겨 둘 최근 주문 수
+
+
+def _f(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class AccountCache:
+    """
+    user data stream 이벤트로 갱신되는 메모리 내 계정 상태입니다. 잔고/포지션은 항목별 갱신 시각을 기록해 오래된 이벤트를 무시합니다.\n    잔고: asset -> 스팟은 {"free", "locked"}, 선물은 {"walletBalance", "crossWalletBalance"}\n    포지션: (symbol, positionSide) -> REST /fapi/v2/account positions 항목과 같은 키의 dict\n    주문: orderId -> 마지막 실행 보고(정규화된 dict), 최근 MAX_ORDERS개
+    """
+
+    def __init__(self):
+        self.balances: dict[str, dict] = {}
+        self.positions: dict[tuple[str, str], dict] = {}
+        self.orders: OrderedDict[int, dict] = OrderedDict()
+        self._stamps: dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, key: tuple, t: int) -> bool:
+        # 호출자가 잠금을 잡고 있어야 함
+        if t < self._stamps.get(key, 0):
+            return False
+        self._stamps[key] = t
+        return True
+
+    def set_balance(self, asset: str, t: int, **fields) -> None:
+        with self._lock:
+            if self._fresh(("B", asset), t):
+                self.balances.setdefault(asset, {"free": 0.0, "locked": 0.0}).update(fields)
+
+    def set_position(self, symbol: str, side: str, t: int, pos: dict) -> None:
+        with self._lock:
+            if self._fresh(("P", symbol, side), t):
+                self.positions[(symbol, side)] = pos
+
+    def record_order(self, order: dict) -> None:
+        with self._lock:
+            self.orders[order["orderId"]] = order
+            self.orders.move_to_end(order["orderId"])
+            while len(self.orders) > MAX_ORDERS:
+                self.orders.popitem(last=False)
+
+    def balance(self, asset: str) -> dict:
+        with self._lock:
+            return dict(self.balances.get(asset, {"free": 0.0, "locked": 0.0}))
+
+    def position(self, symbol: str) -> dict:
+        """단방향(BOTH) 포지션을, 없으면 그 심볼의 첫 포지션을 반환합니다 (REST get_position과 같은 형태)."""
+        with self._lock:
+            pos = self.positions.get((symbol, "BOTH"))
+            if pos is None:
+                pos = next((p for (s, _), p in self.positions.items() if s == symbol), None)
+            return dict(pos) if pos else {}
+
+    def order(self, order_id: int) -> dict | None:
+        with self._lock:
+            o = self.orders.get(order_id)
+            return dict(o) if o else None
+
+
+class UserDataStream:
+    """
+    listenKey 기반 user data stream을 유지하며 AccountCache를 최신으로 유지합니다.\n\n    - 시작/재연결 시 REST 계정 스냅샷을 한 번 읽고, 이후에는 스트림 이벤트만으로 갱신\n    - keepalive_interval 초마다 listenKey 연장. 키가 만료/무효화되면 새 키를 발급받아 다시 연결\n    - 연결돼 있고 스냅샷이 적재된 동안(ready) 클라이언트의 get_balance/get_position이 이 캐시를 읽음
+    """
+
+    def __init__(
+        self,
+        client,
+        ws_base_url: str,
+        futures: bool = False,
+        keepalive_interval: float = 1800.0,
+        on_order: Callable[[dict], None] | None = None,
+    ):
+        self.client = client
+        self.ws_base_url = ws_base_url
+        self.futures = futures
+        self.keepalive_interval = float(keepalive_interval)
+        self.on_order = on_order
+        self.cache = AccountCache()
+        self.name = "user-futures" if futures else "user-spot"
+        self.listen_key = ""
+        self.loaded = False
+        self._conn: StreamConnection | None = None
+        self._stop = threading.Event()
+        self._renew_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        conn = self._conn
+        return self.loaded and conn is not None and conn.connected
+
+    # ---------- 수명 ----------
+    def start(self) -> "UserDataStream":
+        self._stop.clear()
+        self._connect(self.client.create_listen_key())
+        self._thread = threading.Thread(target=self._keepalive_loop, name=f"{self.name}-keepalive", daemon=True)
+        self._thread.start()
+        self.client.user_stream = self
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self.client.user_stream is self:
+            self.client.user_stream = None
+        if self._conn is not None:
+            self._conn.stop()
+        try:
+            self.client.close_listen_key(self.listen_key)
+        except (BinanceAPIError, BinanceFuturesAPIError, ConnectionError):
+            pass
+
+    def _connect(self, listen_key: str) -> None:
+        old = self._conn
+        self.loaded = False
+        self.listen_key = listen_key
+        self._conn = StreamConnection(
+            self.ws_base_url, [listen_key], self._on_message, heartbeat=60.0, name=self.name, on_connect=self._snapshot
+        )
+        self._conn.start()
+        if old is not None:
+            old.stop()
+
+    def _renew(self, reason: str) -> None:
+        with self._renew_lock:
+            print(f"warn: {self.name}: {reason}; creating a new listenKey")
+            try:
+                self._connect(self.client.create_listen_key())
+            except (BinanceAPIError, BinanceFuturesAPIError, ConnectionError) as e:
+                self.loaded = False
+                print(f"warn: {self.name}: listenKey renewal failed: {e}")
+
+    def _keepalive_loop(self) -> None:
+        while not self._stop.wait(self.keepalive_interval):
+            try:
+                self.client.keepalive_listen_key(self.listen_key)
+            except (BinanceAPIError, BinanceFuturesAPIError) as e:
+                self._renew(f"keepalive rejected ({e})")
+            except ConnectionError as e:
+                print(f"warn: {self.name} keepalive failed: {e}")
+
+    # ---------- 스냅샷 ----------
+    def _snapshot(self) -> None:
+        """(재)연결 직후 REST로 현재 계정 상태를 읽습니다. 이 사이에 온 이벤트는 갱신 시각 비교로 정리됩니다."""
+        self.loaded = False
+        try:
+            if self.futures:
+                self._load_futures(self.client.get_account())
+            else:
+                self._load_spot(self.client.get_account())
+        except (BinanceAPIError, BinanceFuturesAPIError, ConnectionError) as e:
+            print(f"warn: {self.name} account snapshot failed: {e}")
+            return
+        self.loaded = True
+
+    def _load_spot(self, acc: dict) -> None:
+        t = int(acc.get("updateTime", 0))
+        for b in acc.get("balances", []):
+            self.cache.set_balance(b["asset"], t, free=_f(b.get("free")), locked=_f(b.get("locked")))
+
+    def _load_futures(self, acc: dict) -> None:
+        for a in acc.get("assets", []):
+            self.cache.set_balance(
+                a["asset"],
+                int(a.get("updateTime", 0)),
+                walletBalance=_f(a.get("walletBalance")),
+                crossWalletBalance=_f(a.get("crossWalletBalance")),
+            )
+        for p in acc.get("positions", []):
+            self.cache.set_position(p["symbol"], p.get("positionSide", "BOTH"), int(p.get("updateTime", 0)), dict(p))
+
+    # ---------- 이벤트 ----------
+    def _on_message(self, stream: str, d: dict) -> None:
+        e = d.get("e")
+        t = int(d.get("E", 0))
+        if e == "listenKeyExpired":
+            threading.Thread(target=self._renew, args=("listenKey expired",), daemon=True).start()
+        elif e == "outboundAccountPosition":
+            for b in d.get("B", []):
+                self.cache.set_balance(b["a"], t, free=_f(b.get("f")), locked=_f(b.get("l")))
+        # balanceUpdate(입출금 증감)는 뒤따르는 outboundAccountPosition에 절대값으로 반영되므로 따로 더하지 않음
+        elif e == "ACCOUNT_UPDATE":
+            a = d.get("a", {})
+            for b in a.get("B", []):
+                self.cache.set_balance(b["a"], t, walletBalance=_f(b.get("wb")), crossWalletBalance=_f(b.get("cw")))
+            for p in a.get("P", []):
+                side = p.get("ps", "BOTH")
+                self.cache.set_position(
+                    p["s"],
+                    side,
+                    t,
+                    {
+                        "symbol": p["s"],
+                        "positionAmt": p.get("pa", "0"),
+                        "entryPrice": p.get("ep", "0"),
+                        "unrealizedProfit": p.get("up", "0"),
+                        "marginType": p.get("mt", ""),
+                        "isolatedWallet": p.get("iw", "0"),
+                        "positionSide": side,
+                        "updateTime": t,
+                    },
+                )
+        elif e in ("executionReport", "ORDER_TRADE_UPDATE"):
+            o = d.get("o", d)  # 선물은 주문 필드가 "o" 안에 있음
+            order = {
+                "symbol": o.get("s"),
+                "orderId": int(o.get("i", 0)),
+                "clientOrderId": o.get("c"),
+                "side": o.get("S"),
+                "type": o.get("o"),
+                "execType": o.get("x"),
+                "status": o.get("X"),
+                "lastQty": _f(o.get("l")),
+                "cumQty": _f(o.get("z")),
+                "lastPrice": _f(o.get("L")),
+                "commission": _f(o.get("n")),
+                "commissionAsset": o.get("N"),
+                "time": int(o.get("T", t)),
+            }
+            self.cache.record_order(order)
+            if self.on_order:
+                self.on_order(order)
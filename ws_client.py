@@ -0,0 +1,237 @@
+﻿import os
+import ssl
+import time
+import base64
+import socket
+import struct
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+# RFC 6455 opcodes
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class WebSocketClosed(ConnectionError):
+    pass
+
+
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + _GUID).encode("ascii")).digest()).decode("ascii")
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool) -> bytes:
+    """단일(FIN) 프레임을 만듭니다. 클라이언트→서버는 mask=True 여야 합니다."""
+    n = len(payload)
+    head = bytearray([0x80 | opcode])
+    mbit = 0x80 if mask else 0
+    if n < 126:
+        head.append(mbit | n)
+    elif n < 1 << 16:
+        head.append(mbit | 126)
+        head += struct.pack("!H", n)
+    else:
+        head.append(mbit | 127)
+        head += struct.pack("!Q", n)
+    if not mask:
+        return bytes(head) + payload
+    key = os.urandom(4)
+    head += key
+    return bytes(head) + _apply_mask(payload, key)
+
+
+def _apply_mask(payload: bytes, key: bytes) -> bytes:
+    n = len(payload)
+    if not n:
+        return b""
+    k = int.from_bytes((key * (n // 4 + 1))[:n], "big")
+    return (int.from_bytes(payload, "big") ^ k).to_bytes(n, "big")
+
+
+def parse_frame(buf: bytearray):
+    """버퍼 앞부분에서 프레임 하나를 파싱합니다. 부족하면 None, 아니면 (fin, opcode, payload, 소비 바이트)."""
+    if len(buf) < 2:
+        return None
+    b0, b1 = buf[0], buf[1]
+    n = b1 & 0x7F
+    pos = 2
+    if n == 126:
+        if len(buf) < 4:
+            return None
+        n = struct.unpack_from("!H", buf, 2)[0]
+        pos = 4
+    elif n == 127:
+        if len(buf) < 10:
+            return None
+        n = struct.unpack_from("!Q", buf, 2)[0]
+        pos = 10
+    key = None
+    if b1 & 0x80:
+        if len(buf) < pos + 4:
+            return None
+        key = bytes(buf[pos : pos + 4])
+        pos += 4
+    if len(buf) < pos + n:
+        return None
+    payload = bytes(buf[pos : pos + n])
+    if key:
+        payload = _apply_mask(payload, key)
+    return bool(b0 & 0x80), b0 & 0x0F, payload, pos + n
+
+
+class WebSocket:
+    """
+    외부 의존성 없는 최소 WebSocket(RFC 6455) 연결입니다.\n    recv()는 ping에 자동으로 pong을 보내고, 조각난(fragmented) 메시지를 합쳐서 돌려줍니다.\n    타임아웃이 나도 버퍼가 유지되므로 같은 연결에서 다시 recv()할 수 있습니다.
+    """
+
+    def __init__(self, sock: socket.socket, is_client: bool = True, initial: bytes = b""):
+        self.sock = sock
+        self.is_client = is_client
+        self._buf = bytearray(initial)
+        self._frags: list[bytes] = []
+        self._frag_op = OP_TEXT
+        self.last_recv = time.monotonic()
+        self.closed = False
+        self._send_lock = threading.Lock()  # 수신 스레드와 다른 스레드(ping/주문)가 동시에 보낼 수 있음
+
+    @classmethod
+    def connect(cls, url: str, timeout: float = 10, headers: dict | None = None) -> "WebSocket":
+        parts = urlsplit(url)
+        secure = parts.scheme == "wss"
+        host = parts.hostname or ""
+        port = parts.port or (443 if secure else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        sock = socket.create_connection((host, port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        host_hdr = host if parts.port is None else f"{host}:{port}"
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {host_hdr}",
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            f"Sec-WebSocket-Key: {key}",
+            "Sec-WebSocket-Version: 13",
+        ]
+        for k, v in (headers or {}).items():
+            lines.append(f"{k}: {v}")
+        sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode("ascii"))
+
+        raw = b""
+        while b"\r\n\r\n" not in raw:
+            chunk = sock.recv(4096)
+            if not chunk:
+                sock.close()
+                raise WebSocketClosed("handshake: connection closed")
+            raw += chunk
+            if len(raw) > 65536:
+                sock.close()
+                raise WebSocketClosed("handshake: response too large")
+        head, rest = raw.split(b"\r\n\r\n", 1)
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        if " 101 " not in f"{status_line} ":
+            sock.close()
+            raise WebSocketClosed(f"handshake failed: {status_line}")
+        resp_headers = {}
+        for line in header_lines:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                resp_headers[k.strip().lower()] = v.strip()
+        if resp_headers.get("sec-websocket-accept") != accept_key(key):
+            sock.close()
+            raise WebSocketClosed("handshake failed: bad Sec-WebSocket-Accept")
+        return cls(sock, is_client=True, initial=rest)
+
+    def settimeout(self, timeout: float | None) -> None:
+        self.sock.settimeout(timeout)
+
+    def _send(self, opcode: int, payload: bytes) -> None:
+        if self.closed:
+            raise WebSocketClosed("send on closed websocket")
+        frame = encode_frame(opcode, payload, mask=self.is_client)
+        try:
+            with self._send_lock:
+                self.sock.sendall(frame)
+        except OSError as e:
+            self.closed = True
+            raise WebSocketClosed(f"send failed: {e}") from e
+
+    def send_text(self, text: str) -> None:
+        self._send(OP_TEXT, text.encode("utf-8"))
+
+    def send_ping(self, payload: bytes = b"") -> None:
+        self._send(OP_PING, payload)
+
+    def recv(self) -> str | bytes:
+        """다음 데이터 메시지를 반환합니다. socket.timeout은 그대로 전파됩니다."""
+        while True:
+            frame = parse_frame(self._buf)
+            if frame is None:
+                try:
+                    chunk = self.sock.recv(65536)
+                except socket.timeout:
+                    raise
+                except OSError as e:
+                    self.closed = True
+                    raise WebSocketClosed(f"recv failed: {e}") from e
+                if not chunk:
+                    self.closed = True
+                    raise WebSocketClosed("connection closed by peer")
+                self._buf += chunk
+                continue
+
+            fin, opcode, payload, used = frame
+            del self._buf[:used]
+            self.last_recv = time.monotonic()
+
+            if opcode == OP_PING:
+                self._send(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                try:
+                    self._send(OP_CLOSE, payload[:2])
+                except WebSocketClosed:
+                    pass
+                self.closed = True
+                self.sock.close()
+                code = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else 1005
+                raise WebSocketClosed(f"closed by peer (code {code})")
+
+            if opcode in (OP_TEXT, OP_BINARY):
+                self._frag_op = opcode
+                self._frags = [payload]
+            elif opcode == OP_CONT:
+                self._frags.append(payload)
+            if not fin:
+                continue
+            data = b"".join(self._frags)
+            self._frags = []
+            return data.decode("utf-8") if self._frag_op == OP_TEXT else data
+
+    def close(self, code: int = 1000) -> None:
+        if self.closed:
+            return
+        try:
+            self._send(OP_CLOSE, struct.pack("!H", code))
+        except WebSocketClosed:
+            pass
+        self.closed = True
+        try:
+            self.sock.close()
+        except OSError:
+            pass
@@ -0,0 +1,360 @@
+﻿import json
+import time
+import queue
+import random
+import socket
+import argparse
+import threading
+import socketserver
+from urllib.parse import urlsplit, parse_qs
+
+from ws_client import WebSocket, WebSocketClosed, accept_key
+
+
+class SyntheticMarket:
+    """
+    심볼별 스팟 중간가/베이시스 랜덤워크와 그 주변의 가짜 호가창을 만듭니다.\n    호가창은 step()마다 바뀐 레벨만 depthUpdate 형태(U/u/pu)로 돌려주므로 증분 동기화 테스트에 쓸 수 있습니다.
+    """
+
+    def __init__(
+        self,
+        start_price: float = 60000.0,
+        basis_bps: float = 2.0,
+        vol_bps: float = 0.5,
+        tick: float = 1.0,
+        levels: int = 50,
+    ):
+        self.start_price = start_price
+        self.basis0 = basis_bps
+        self.vol = vol_bps / 10000.0
+        self.tick = tick
+        self.levels = levels
+        self._sym: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, symbol: str) -> dict:
+        st = self._sym.get(symbol)
+        if st is None:
+            st = {"spot": self.start_price, "basis": self.basis0, "bids": {}, "asks": {}, "u": 1000}
+            self._sym[symbol] = st
+            self._rebuild(st)
+        return st
+
+    def _rebuild(self, st: dict) -> tuple[list, list]:
+        """중간가 주변으로 호가를 다시 깔고 바뀐 레벨 [(price, qty)] 를 반환합니다."""
+        tick = self.tick
+        top_bid = int(st["spot"] / tick) * tick
+        changes = []
+        for side, prices in (
+            ("bids", [round(top_bid - i * tick, 8) for i in range(self.levels)]),
+            ("asks", [round(top_bid + (i + 1) * tick, 8) for i in range(self.levels)]),
+        ):
+            book = st[side]
+            diff = []
+            keep = set(prices)
+            for p in list(book):
+                if p not in keep:
+                    del book[p]
+                    diff.append([f"{p:.2f}", "0.00000"])
+            for p in prices:
+                if p not in book or random.random() < 0.1:
+                    q = round(random.uniform(0.01, 2.0), 5)
+                    book[p] = q
+                    diff.append([f"{p:.2f}", f"{q:.5f}"])
+            changes.append(diff)
+        return changes[0], changes[1]
+
+    def step(self, symbol: str) -> dict:
+        """한 걸음 진행하고 {spot, mark, bid, ask, depth} 이벤트 재료를 반환합니다."""
+        with self._lock:
+            st = self._state(symbol)
+            st["spot"] *= 1 + random.gauss(0, self.vol)
+            st["basis"] += random.gauss(0, 0.3) - 0.05 * (st["basis"] - self.basis0)
+            bids, asks = self._rebuild(st)
+            pu = st["u"]
+            U = pu + 1
+            st["u"] = U + random.randint(0, 2)
+            best_bid = max(st["bids"])
+            best_ask = min(st["asks"])
+            return {
+                "spot": (best_bid + best_ask) / 2,
+                "mark": st["spot"] * (1 + st["basis"] / 10000.0),
+                "bid": (best_bid, st["bids"][best_bid]),
+                "ask": (best_ask, st["asks"][best_ask]),
+                "depth": {"U": U, "u": st["u"], "pu": pu, "b": bids, "a": asks},
+            }
+
+    def snapshot(self, symbol: str, limit: int) -> dict:
+        with self._lock:
+            st = self._state(symbol)
+            bids = sorted(st["bids"].items(), reverse=True)[:limit]
+            asks = sorted(st["asks"].items())[:limit]
+            return {
+                "lastUpdateId": st["u"],
+                "bids": [[f"{p:.2f}", f"{q:.5f}"] for p, q in bids],
+                "asks": [[f"{p:.2f}", f"{q:.5f}"] for p, q in asks],
+            }
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "StandinServer"
+
+    def handle(self) -> None:
+        sock: socket.socket = self.request
+        raw = b""
+        while b"\r\n\r\n" not in raw:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return
+            raw += chunk
+        head, rest = raw.split(b"\r\n\r\n", 1)
+        request_line, *lines = head.decode("latin-1").split("\r\n")
+        headers = {}
+        for line in lines:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        path = request_line.split(" ")[1]
+        key = headers.get("sec-websocket-key")
+        if not key:
+            self._http(sock, path)
+            return
+        sock.sendall(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n"
+            ).encode("ascii")
+        )
+        ws = WebSocket(sock, is_client=False, initial=rest)
+        if "/ws-api/" in path or "/ws-fapi/" in path:
+            try:
+                self.server.serve_api(ws)
+            except (WebSocketClosed, OSError):
+                pass
+            finally:
+                ws.close()
+            return
+        streams = parse_qs(urlsplit(path).query).get("streams", [""])[0].split("/")
+        ws.settimeout(0.005)
+        try:
+            self.server.serve_streams(ws, [s for s in streams if s])
+        except (WebSocketClosed, OSError):
+            pass
+        finally:
+            ws.close()
+
+    def _http(self, sock: socket.socket, path: str) -> None:
+        """REST 스냅샷 대역: GET /api/v3/depth, /fapi/v1/depth (증분 스트림과 같은 호가창)."""
+        parts = urlsplit(path)
+        q = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if parts.path.endswith("/depth") and "symbol" in q:
+            body = json.dumps(self.server.market.snapshot(q["symbol"].upper(), int(q.get("limit", 100))))
+            status = "200 OK"
+        else:
+            body = json.dumps({"code": -1, "msg": f"stand-in does not serve {parts.path}"})
+            status = "404 Not Found"
+        data = body.encode("utf-8")
+        sock.sendall(
+            (
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n"
+            ).encode("ascii")
+            + data
+        )
+
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    """
+    Binance combined stream을 흉내 내는 로컬 WebSocket 서버입니다(테스트용).\n    지원 스트림: <symbol>@bookTicker, <symbol>@markPrice[@1s], <symbol>@depth[@100ms]\n    같은 포트에서 GET /api/v3/depth, /fapi/v1/depth 스냅샷과 WebSocket API(/ws-api/v3, /ws-fapi/v1의 order.place/order.cancel/session.logon)도 제공합니다.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        addr: tuple[str, int],
+        rate: float = 10.0,
+        mark_interval: float | None = None,
+        ping_interval: float = 20.0,
+        drop_every: float = 0.0,
+        market: SyntheticMarket | None = None,
+    ):
+        super().__init__(addr, _Handler)
+        self.rate = max(0.1, float(rate))
+        self.mark_interval = mark_interval
+        self.ping_interval = ping_interval
+        self.drop_every = drop_every
+        self.market = market or SyntheticMarket()
+        self._subs: dict[int, tuple[set, queue.Queue]] = {}
+        self._subs_lock = threading.Lock()
+        self._order_id = 0
+        self._order_lock = threading.Lock()
+        threading.Thread(target=self._clock, name="standin-clock", daemon=True).start()
+
+    def _clock(self) -> None:
+        """모든 연결이 같은 시세/시퀀스를 보도록 한 곳에서 이벤트를 만들어 배포합니다."""
+        next_mark: dict[str, float] = {}
+        while True:
+            time.sleep(1.0 / self.rate)
+            with self._subs_lock:
+                subs = list(self._subs.values())
+            wanted = {s for streams, _ in subs for s in streams}
+            symbols = {s.split("@", 1)[0] for s in wanted}
+            now = time.monotonic()
+            ts = int(time.time() * 1000)
+            for sym in symbols:
+                ev = self.market.step(sym.upper())
+                out = {
+                    f"{sym}@bookTicker": {
+                        "u": ev["depth"]["u"],
+                        "s": sym.upper(),
+                        "b": f"{ev['bid'][0]:.2f}",
+                        "B": f"{ev['bid'][1]:.5f}",
+                        "a": f"{ev['ask'][0]:.2f}",
+                        "A": f"{ev['ask'][1]:.5f}",
+                    },
+                }
+                depth = {"e": "depthUpdate", "E": ts, "s": sym.upper(), **ev["depth"]}
+                out[f"{sym}@depth"] = depth
+                out[f"{sym}@depth@100ms"] = depth
+                for name, interval in ((f"{sym}@markPrice", 3.0), (f"{sym}@markPrice@1s", 1.0)):
+                    if name in wanted and now >= next_mark.get(name, 0.0):
+                        next_mark[name] = now + (self.mark_interval or interval)
+                        out[name] = {
+                            "e": "markPriceUpdate",
+                            "E": ts,
+                            "s": sym.upper(),
+                            "p": f"{ev['mark']:.2f}",
+                            "i": f"{ev['spot']:.2f}",
+                            "P": f"{ev['mark']:.2f}",
+                            "r": "0.00010000",
+                            "T": (ts // 28_800_000 + 1) * 28_800_000,
+                        }
+                for streams, q in subs:
+                    for name in streams:
+                        if name in out:
+                            q.put(json.dumps({"stream": name, "data": out[name]}))
+
+    def serve_streams(self, ws: WebSocket, streams: list[str]) -> None:
+        q: queue.Queue = queue.Queue()
+        key = id(q)
+        with self._subs_lock:
+            self._subs[key] = (set(streams), q)
+        try:
+            started = time.monotonic()
+            last_ping = started
+            while True:
+                now = time.monotonic()
+                if self.drop_every and now - started > self.drop_every:
+                    return  # 재연결 테스트용 강제 종료
+                if now - last_ping > self.ping_interval:
+                    ws.send_ping(b"standin")
+                    last_ping = now
+                try:
+                    while True:
+                        ws.send_text(q.get_nowait())
+                except queue.Empty:
+                    pass
+                # 클라이언트 ping/close 처리 (데이터 메시지는 무시)
+                try:
+                    ws.recv()
+                except socket.timeout:
+                    pass
+        finally:
+            with self._subs_lock:
+                self._subs.pop(key, None)
+
+
+    def api_result(self, method: str, params: dict) -> tuple[int, dict]:
+        """WebSocket API 요청 하나의 (status, result|error). 주문은 현재 호가 중간가로 즉시 체결된 것으로 응답합니다."""
+        now = int(time.time() * 1000)
+        if method == "session.logon":
+            return 200, {"apiKey": params.get("apiKey"), "authorizedSince": now, "serverTime": now}
+        if method in ("order.place", "order.cancel"):
+            if "signature" not in params and not params.get("_logged_on"):
+                return 401, {"code": -1002, "msg": "You are not authorized to execute this request."}
+            sym = str(params.get("symbol", "")).upper()
+            qty = str(params.get("quantity", "0"))
+            with self.market._lock:
+                st = self.market._state(sym)
+                price = st["spot"]
+            with self._order_lock:
+                self._order_id += 1
+                oid = self._order_id
+            return 200, {
+                "symbol": sym,
+                "orderId": int(params.get("orderId") or oid),
+                "clientOrderId": params.get("newClientOrderId", f"standin-{oid}"),
+                "transactTime": now,
+                "side": params.get("side"),
+                "type": params.get("type"),
+                "status": "FILLED" if method == "order.place" else "CANCELED",
+                "origQty": qty,
+                "executedQty": qty,
+                "avgPrice": f"{price:.2f}",
+            }
+        return 400, {"code": -1100, "msg": f"unknown method {method}"}
+
+    def serve_api(self, ws: WebSocket) -> None:
+        """WebSocket API 대역: {"id", "method", "params"} 요청마다 같은 id로 응답합니다."""
+        ws.settimeout(self.ping_interval)
+        logged_on = False
+        while True:
+            try:
+                raw = ws.recv()
+            except socket.timeout:
+                ws.send_ping(b"standin")
+                continue
+            try:
+                req = json.loads(raw)
+            except ValueError:
+                continue
+            params = dict(req.get("params") or {})
+            params["_logged_on"] = logged_on
+            status, body = self.api_result(req.get("method", ""), params)
+            if status == 200 and req.get("method") == "session.logon":
+                logged_on = True
+            msg = {"id": req.get("id"), "status": status}
+            msg["result" if status == 200 else "error"] = body
+            msg["rateLimits"] = [
+                {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 6000, "count": 1}
+            ]
+            ws.send_text(json.dumps(msg))
+
+
+def start_standin(host: str = "127.0.0.1", port: int = 0, **kwargs) -> StandinServer:
+    """백그라운드 스레드에서 서버를 띄우고 반환합니다. 주소는 server.server_address."""
+    srv = StandinServer((host, port), **kwargs)
+    threading.Thread(target=srv.serve_forever, name="ws-standin", daemon=True).start()
+    return srv
+
+
+def main():
+    ap = argparse.ArgumentParser(description="로컬 Binance WebSocket 스트림 대역 서버 (테스트용)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--rate", type=float, default=10.0, help="초당 시세 갱신 횟수 (bookTicker/depth)")
+    ap.add_argument("--mark-interval", type=float, help="markPrice 발송 간격(초), 기본: 스트림 이름에 따름")
+    ap.add_argument("--price", type=float, default=60000.0, help="시작 가격")
+    ap.add_argument("--basis-bps", type=float, default=2.0, help="평균 베이시스(bps)")
+    ap.add_argument("--drop-every", type=float, default=0.0, help="N초마다 연결 강제 종료(재연결 테스트)")
+    args = ap.parse_args()
+
+    srv = StandinServer(
+        (args.host, args.port),
+        rate=args.rate,
+        mark_interval=args.mark_interval,
+        drop_every=args.drop_every,
+        market=SyntheticMarket(args.price, args.basis_bps),
+    )
+    print(f"ws stand-in listening on ws://{args.host}:{args.port}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()